@@ -1,9 +1,174 @@
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Dict, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.api.chat import ai_service
+from app.models.database import async_engine, engine, get_async_session
+from app.services import analytics_service
+from app.services.ai_service import PromptBuilder
+from app.services.config_service import config_service
+from app.services.context_cache import context_cache
+from app.services.metrics import CounterCallback, GaugeCallback, registry
+from app.services.response_contract import parse_stats
 
 
 
 router = APIRouter()
 
+
+# =========== RUNTIME METRICS (read at scrape time) ===========
+def _caches() -> Dict[str, object]:
+    """Counters with hits/misses, by cache name."""
+    return {
+        "config": config_service,
+        "prompt": PromptBuilder._static_cache,
+        "context": context_cache.stats,
+        "memory_index": ai_service.memory.stats,
+    }
+
+
+def _cache_ratio() -> Dict[Tuple[str], float]:
+    ratios = {}
+    for name, cache in _caches().items():
+        total = cache.hits + cache.misses
+        ratios[(name,)] = cache.hits / total if total else 0.0
+    return ratios
+
+
+def _pool_connections() -> Dict[Tuple[str, str], float]:
+    values = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        # NullPool/StaticPool have no counters
+        if hasattr(pool, "checkedout"):
+            values[(name, "checked_out")] = pool.checkedout()
+            values[(name, "idle")] = pool.checkedin()
+            values[(name, "overflow")] = max(0, pool.overflow())
+            values[(name, "size")] = pool.size()
+    return values
+
+
+def _scheduler() -> Dict[Tuple[str], float]:
+    scheduler = ai_service.scheduler
+    return {
+        ("running",): scheduler.running - scheduler.background_running,
+        ("background",): scheduler.background_running,
+        ("queued",): scheduler.queued,
+    }
+
+
+registry.register(GaugeCallback("eve_generations", "Generations running, running in the background lane, and waiting for a slot.", _scheduler, ("state",)))
+registry.register(GaugeCallback("eve_generation_slots", "Generations allowed to run at once.", lambda: {(): ai_service.scheduler.max_concurrent}))
+registry.register(CounterCallback("eve_generations_rejected_total", "Generations rejected with 429 (queue full) or 503 (waited too long).", lambda: {("queue_full",): ai_service.scheduler.rejected, ("timeout",): ai_service.scheduler.timed_out}, ("reason",)))
+registry.register(GaugeCallback("eve_db_pool_connections", "Database pool connections by state.", _pool_connections, ("engine", "state")))
+registry.register(CounterCallback("eve_cache_hits_total", "Cache hits.", lambda: {(name,): cache.hits for name, cache in _caches().items()}, ("cache",)))
+registry.register(CounterCallback("eve_cache_misses_total", "Cache misses.", lambda: {(name,): cache.misses for name, cache in _caches().items()}, ("cache",)))
+registry.register(GaugeCallback("eve_cache_hit_ratio", "Cache hit ratio since start.", _cache_ratio, ("cache",)))
+registry.register(GaugeCallback("eve_write_behind_queued", "Turns waiting for the write-behind flush.", lambda: {(): ai_service.writer.stats()["queued"]}))
+
 @router.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/generation")
+async def generation_stats():
+    """
+    Generation scheduler state: running and queued generations, admission
+    counters, and wait/run time percentiles of recent generations.
+    """
+    return ai_service.scheduler.stats()
+
+@router.get("/context")
+async def context_stats():
+    """
+    Prompt packing: context window, how often history had to be cut to fit
+    the token budget, and the size of the last packed prompt.
+    """
+    return ai_service.packer.stats()
+
+@router.get("/summaries")
+async def summary_stats():
+    """Background summarizer: whether it runs, queued conversations and counters."""
+    return ai_service.summarizer.stats()
+
+@router.get("/write-behind")
+async def write_behind_stats():
+    """Write-behind of memory notes and activity timestamps: queue depth and flush counters."""
+    return ai_service.writer.stats()
+
+@router.get("/latency")
+async def latency_stats():
+    """
+    Chat turn latency per stage as p50/p95/p99 over recent turns: turn and
+    queue waits, context load, memory retrieval, prompt build, LLM (with
+    Ollama's prompt eval vs eval split), parse and commit.
+    """
+    return ai_service.tracer.stats()
+
+@router.get("/responses")
+async def response_stats():
+    """Model replies by parse outcome: valid, salvaged (repaired JSON, partial or plain text) and failed."""
+    return parse_stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics in the Prometheus text format: request rate and latency per
+    route, turn stage latency, LLM tokens/s, generation queue, DB pool and
+    cache hit ratios.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# =========== ROLLUP STATS ===========
+# Read from the hourly rollups, never from `message`. Ranges are rounded down
+# to whole UTC hours, the last 7 days by default. Turns still waiting in the
+# write-behind queue show up after its next flush.
+def _range(since: Optional[datetime], until: Optional[datetime]) -> Tuple[datetime, datetime]:
+    since, until = analytics_service.default_range(since, until)
+    if since > until:
+        raise HTTPException(status_code=400, detail="since must not be after until")
+    return since, until
+
+@router.get("/stats/latency")
+async def rollup_latency_stats(
+    group_by: Literal["character", "model"] = Query("character", description="Group by character or model"),
+    since: Optional[datetime] = Query(None, description="Range start, default 7 days before until"),
+    until: Optional[datetime] = Query(None, description="Range end, default now"),
+    character_id: Optional[int] = Query(None, description="Only this character"),
+    model_name: Optional[str] = Query(None, description="Only this model"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Generation time per character or model: average, p50/p95/p99 (estimated
+    from histogram buckets) and tokens/s.
+    """
+    since, until = _range(since, until)
+    groups = await analytics_service.latency_stats(session, since, until, group_by, character_id, model_name)
+    return {"since": since, "until": until, "group_by": group_by, "groups": groups}
+
+@router.get("/stats/emotions")
+async def rollup_emotion_stats(
+    role: Literal["assistant", "user"] = Query("assistant", description="Whose emotions"),
+    since: Optional[datetime] = Query(None, description="Range start, default 7 days before until"),
+    until: Optional[datetime] = Query(None, description="Range end, default now"),
+    character_id: Optional[int] = Query(None, description="Only this character"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Emotion distribution: count, share and average intensity per emotion."""
+    since, until = _range(since, until)
+    emotions = await analytics_service.emotion_distribution(session, since, until, role, character_id)
+    return {"since": since, "until": until, "role": role, "emotions": emotions}
+
+@router.get("/stats/activity")
+async def rollup_activity_stats(
+    interval: Literal["hour", "day"] = Query("hour", description="Period length"),
+    since: Optional[datetime] = Query(None, description="Range start, default 7 days before until"),
+    until: Optional[datetime] = Query(None, description="Range end, default now"),
+    character_id: Optional[int] = Query(None, description="Only this character"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Generated messages and their average generation time per hour or day."""
+    since, until = _range(since, until)
+    periods = await analytics_service.activity(session, since, until, interval, character_id)
+    return {"since": since, "until": until, "interval": interval, "periods": periods}
@@ -1,9 +1,12 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from pydantic import BaseModel, ConfigDict
-from sqlmodel import Session, desc, select
-from app.models.database import get_session
+from sqlmodel import desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.database import get_async_session
 from app.models.schemas import Character, Conversation
+from app.services.search_service import search_memory_notes, search_messages
 router = APIRouter()
 
 class FetchCharactersRequest(BaseModel):
@@ -60,24 +63,45 @@ class CharacterFullResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class SearchHit(BaseModel):
+    id: int
+    conversation_id: int
+    created_at: datetime
+    # Matched words wrapped in <mark></mark>, the text around them cut with …
+    snippet: str
+    # Relevance, higher is better - not computed when sorted by recent
+    score: Optional[float] = None
+    # Messages only
+    role: Optional[str] = None
+    emotion: Optional[str] = None
+    # Memory notes only
+    importance_score: Optional[float] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    has_more: bool
+    hits: List[SearchHit]
+
 @router.get("", response_model=List[CharacterResponse])
 async def get_characters(
     limit: Optional[int] = Query(default=None), 
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     statement = select(Character)
     
     if limit is not None:
         statement = statement.limit(limit)
         
-    characters = session.exec(statement).all()
+    characters = (await session.exec(statement)).all()
     return characters
 
 @router.get("/default", response_model=CharacterResponse)
-async def get_default_character(session: Session = Depends(get_session)):
+async def get_default_character(session: AsyncSession = Depends(get_async_session)):
     
     statement = select(Character).where(Character.is_default == True)
-    character = session.exec(statement).one_or_none()
+    character = (await session.exec(statement)).one_or_none()
     
     if character is None:
         raise HTTPException(status_code=404, detail="Character not found")
@@ -85,9 +109,9 @@ async def get_default_character(session: Session = Depends(get_session)):
 
 
 @router.get("/{character_id}", response_model=CharacterResponse)
-async def get_character(character_id: int, session: Session = Depends(get_session)):
+async def get_character(character_id: int, session: AsyncSession = Depends(get_async_session)):
     statement = select(Character).where(Character.id == character_id)
-    character = session.exec(statement).one_or_none()
+    character = (await session.exec(statement)).one_or_none()
     
     if character is None:
         raise HTTPException(status_code=404, detail="Character not found")
@@ -96,7 +120,7 @@ async def get_character(character_id: int, session: Session = Depends(get_sessio
 @router.get("/{character_id}/conversations_list", response_model=List[Conversation])
 async def get_conversations_list(
     character_id: int = Path(..., description="Character ID"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Returns a list of conversations for a character, ordered by last activity (newest first).
@@ -107,5 +131,44 @@ async def get_conversations_list(
         .order_by(desc(Conversation.last_activity))
     )
     
-    conversations = session.exec(query).all()
-    return conversations
\ No newline at end of file
+    conversations = (await session.exec(query)).all()
+    return conversations
+
+@router.get("/{character_id}/search", response_model=SearchResponse, response_model_exclude_none=True)
+async def search(
+    character_id: int = Path(..., description="Character ID"),
+    q: str = Query(..., min_length=1, max_length=200, description='Words and "quoted phrases" that must all match, word* matches a prefix'),
+    kind: Literal["messages", "memory_notes"] = Query("messages", description="What to search"),
+    conversation_id: Optional[int] = Query(None, description="Only this conversation"),
+    role: Optional[Literal["user", "assistant"]] = Query(None, description="Only messages of this role"),
+    sort: Literal["relevance", "recent"] = Query("relevance", description="Best matches or newest first - recent stays fast on very common words"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000, description="Ranked results are paged by offset, deep pages cost more"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Full-text search over a character's conversation history, best matches
+    or newest first.
+    
+    Uses the FTS5 indexes (message_fts, memorynote_fts) - only the hits of
+    the requested page are read from the tables.
+    """
+    if await session.get(Character, character_id) is None:
+        raise HTTPException(status_code=404, detail="Character not found")
+    if conversation_id is not None:
+        # The conversation scope alone is searched, it must be this character's
+        conversation = await session.get(Conversation, conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        if conversation.character_id != character_id:
+            raise HTTPException(status_code=404, detail="Conversation does not belong to this character")
+    
+    try:
+        if kind == "messages":
+            hits, has_more = await search_messages(session, q, character_id, conversation_id, role, limit, offset, sort)
+        else:
+            hits, has_more = await search_memory_notes(session, q, character_id, conversation_id, limit, offset, sort)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    
+    return SearchResponse(query=q, limit=limit, offset=offset, has_more=has_more, hits=hits)
@@ -1,19 +1,28 @@
 from datetime import datetime
-from typing import List, Optional
+import json
+from typing import Any, AsyncIterator, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import func
-from sqlmodel import Session, asc, desc, select
+from sqlalchemy import func, tuple_
+from sqlmodel import asc, desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models.database import get_session
+from app.core.log import get_logger
+from app.models.database import get_async_session
 from app.models.schemas import Conversation, Message
-from app.services.ai_service import AI_Service
+from app.services.ai_service import AI_Service, conversation_participants
+from app.services.context_cache import context_cache
+from app.services.generation_scheduler import GenerationRejected
+
+logger = get_logger("chat")
 
 router = APIRouter()
 
 class MessageCreateRequest(BaseModel):
     """Model dla nowej wiadomości wysyłanej przez użytkownika"""
     content: str = Field(..., min_length=1, description="Treść wiadomości użytkownika")
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=128, description="Client key - a retry with the same key returns the same turn instead of generating again")
 
 class MessageResponse(BaseModel):
     """Standardized response model for a Message object"""
@@ -35,14 +44,22 @@ class PaginatedHistoryResponse(BaseModel):
     limit: int
     offset: int
     messages: List[MessageResponse]
+    # Cursors for keyset pagination - pass as before_id / after_id to get the next page
+    next_before_id: Optional[int] = None
+    next_after_id: Optional[int] = None
+    has_more: Optional[bool] = None
 
-def get_valid_conversation(
-    character_id: int, conversation_id: int, session: Session
+async def get_valid_conversation(
+    character_id: int, conversation_id: int, session: AsyncSession, with_participants: bool = False
 ) -> Conversation:
     """
     Helper function to validate if a conversation belongs to a character
+    
+    with_participants loads character and user in the same query, so a chat
+    turn can reuse the conversation instead of loading it again.
     """
-    conversation = session.get(Conversation, conversation_id)
+    options = conversation_participants() if with_participants else None
+    conversation = await session.get(Conversation, conversation_id, options=options)
     
     if not conversation:
         raise HTTPException(
@@ -61,33 +78,109 @@ async def send_message(
     message_data: MessageCreateRequest,
     character_id: int = Path(..., description="Character ID"),
     conversation_id: int = Path(..., description="Conversation ID"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Send a new message to a specific conversation for a character
     Generate a response from the AI service
     Save the response to the database
+    
+    Messages to one conversation are answered one at a time. Sends with the
+    same idempotency_key share one generation and return the same message.
     """
-    get_valid_conversation(character_id, conversation_id, session)
+    conversation = await get_valid_conversation(character_id, conversation_id, session, with_participants=True)
 
     try:
 
-        ai_message_model, generation_time_s = ai_service.generate_response(
+        ai_message_model, generation_time_s = await ai_service.generate_response(
             message_text=message_data.content,
             conversation_id=conversation_id,
-            session=session
+            session=session,
+            idempotency_key=message_data.idempotency_key,
+            conversation=conversation
         )
         
         return ai_message_model
 
+    except GenerationRejected as gr:
+        raise HTTPException(status_code=gr.status_code, detail=str(gr), headers={"Retry-After": str(gr.retry_after)})
+
     except ValueError as ve:
-        print(f"Business logic error in generate_response: {ve}")
+        logger.info("Send rejected", extra={"conversation_id": conversation_id, "error": str(ve)})
         raise HTTPException(status_code=400, detail=str(ve))
     
     except Exception as e:
-        print(f"Critical error in send_message endpoint: {e}")
+        logger.exception("Send failed", extra={"conversation_id": conversation_id})
         raise HTTPException(status_code=500, detail="Internal server error during message generation.")
 
+def format_sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/{character_id}/{conversation_id}/stream")
+async def stream_message(
+    message_data: MessageCreateRequest,
+    character_id: int = Path(..., description="Character ID"),
+    conversation_id: int = Path(..., description="Conversation ID"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Send a new message and stream the response as Server-Sent Events
+    
+    Events:
+        token: {"text": "..."} - next piece of the response text
+        done: saved AI message with emotion and memory note fields
+        error: {"detail": "..."} - generation failed, nothing was saved
+    
+    Rejected with 429 and Retry-After before the stream starts if the
+    generation queue is already full.
+    """
+    conversation = await get_valid_conversation(character_id, conversation_id, session, with_participants=True)
+    
+    try:
+        ai_service.scheduler.check_admission()
+    except GenerationRejected as gr:
+        raise HTTPException(status_code=gr.status_code, detail=str(gr), headers={"Retry-After": str(gr.retry_after)})
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event, payload in ai_service.stream_response(
+                message_text=message_data.content,
+                conversation_id=conversation_id,
+                session=session,
+                idempotency_key=message_data.idempotency_key,
+                conversation=conversation
+            ):
+                if event == "token":
+                    yield format_sse("token", {"text": payload})
+                    continue
+                
+                ai_message_model, parsed = payload
+                done = MessageResponse.model_validate(ai_message_model).model_dump(mode="json")
+                done.update({
+                    "user_emotion": parsed["user_emotion"],
+                    "memory_note": parsed["memory_note"],
+                    "memory_note_importance": parsed["memory_note_importance"],
+                })
+                yield format_sse("done", done)
+
+        except GenerationRejected as gr:
+            yield format_sse("error", {"detail": str(gr), "status_code": gr.status_code, "retry_after": gr.retry_after})
+
+        except ValueError as ve:
+            logger.info("Stream rejected", extra={"conversation_id": conversation_id, "error": str(ve)})
+            yield format_sse("error", {"detail": str(ve)})
+        
+        except Exception as e:
+            logger.exception("Stream failed", extra={"conversation_id": conversation_id})
+            yield format_sse("error", {"detail": "Internal server error during message generation."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{character_id}/{conversation_id}/messages",response_model=PaginatedHistoryResponse)
 async def get_chat_history(
     character_id: int = Path(..., description="Character ID"),
@@ -95,30 +188,72 @@ async def get_chat_history(
     limit: int = Query(50, ge=1, le=200, description="Number of messages to return"),
     offset: int = Query(0, ge=0, description="Number of messages to skip"),
     sort_desc: bool = Query(False, description="Sort messages in descending order, default is ascending"),
-    session: Session = Depends(get_session)
+    before_id: Optional[int] = Query(None, description="Cursor: return messages older than this message"),
+    after_id: Optional[int] = Query(None, description="Cursor: return messages newer than this message"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Downloads history of a conversation for a character
+    
+    Two pagination modes:
+        offset: limit/offset, total is counted
+        cursor: before_id or after_id, seeks on the (conversation_id, created_at, id)
+                index instead of scanning skipped rows, total comes from conversation.message_count
     """
-    get_valid_conversation(character_id, conversation_id, session)
+    conversation = await get_valid_conversation(character_id, conversation_id, session)
+    
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id, not both")
 
     query = select(Message).where(Message.conversation_id == conversation_id)
+    
+    if before_id is not None or after_id is not None:
+        anchor = await session.get(Message, before_id if before_id is not None else after_id)
+        if anchor is None or anchor.conversation_id != conversation_id:
+            raise HTTPException(status_code=404, detail="Cursor message not found in this conversation")
+        
+        key = tuple_(Message.created_at, Message.id)
+        anchor_key = tuple_(anchor.created_at, anchor.id)
+        if before_id is not None:
+            query = query.where(key < anchor_key).order_by(desc(Message.created_at), desc(Message.id))
+        else:
+            query = query.where(key > anchor_key).order_by(asc(Message.created_at), asc(Message.id))
+        
+        # One extra row tells if there is another page
+        messages = list((await session.exec(query.limit(limit + 1))).all())
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        
+        # Page is fetched walking away from the cursor, return it in requested order
+        walked_desc = before_id is not None
+        if walked_desc != sort_desc:
+            messages.reverse()
+        
+        total_messages = conversation.message_count
+        offset = 0
+    else:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_messages = (await session.exec(count_query)).one()
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_messages = session.exec(count_query).one()
+        if sort_desc:
+            query = query.order_by(desc(Message.created_at), desc(Message.id))
+        else:
+            query = query.order_by(asc(Message.created_at), asc(Message.id))
 
-    if sort_desc:
-        query = query.order_by(desc(Message.created_at))
-    else:
-        query = query.order_by(asc(Message.created_at))
+        messages = (await session.exec(query.offset(offset).limit(limit))).all()
+        has_more = offset + len(messages) < total_messages
 
-    messages = session.exec(query.offset(offset).limit(limit)).all()
+    oldest = min(messages, key=lambda m: (m.created_at, m.id), default=None)
+    newest = max(messages, key=lambda m: (m.created_at, m.id), default=None)
 
     return {
         "total": total_messages,
         "limit": limit,
         "offset": offset,
-        "messages": messages
+        "messages": messages,
+        "next_before_id": oldest.id if oldest else None,
+        "next_after_id": newest.id if newest else None,
+        "has_more": has_more
     }
     
     
@@ -126,19 +261,21 @@ async def get_chat_history(
 async def delete_conversation(
     character_id: int = Path(..., description="ID postaci"),
     conversation_id: int = Path(..., description="ID konwersacji do usunięcia"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Deletes a conversation
     """
-    conversation = get_valid_conversation(character_id, conversation_id, session)
+    conversation = await get_valid_conversation(character_id, conversation_id, session)
 
     try:
-        session.delete(conversation)
-        session.commit()
+        await session.delete(conversation)
+        await session.commit()
+        context_cache.invalidate(conversation_id)
+        ai_service.memory.forget(conversation_id)
     except Exception as e:
-        session.rollback()
-        print(f"Failed to delete conversation {conversation_id}: {e}")
+        await session.rollback()
+        logger.exception("Failed to delete conversation", extra={"conversation_id": conversation_id})
         raise HTTPException(status_code=500, detail="Failed to delete conversation due to database error.")
 
     return None
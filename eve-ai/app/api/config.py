@@ -1,10 +1,10 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
-from sqlmodel import Session
-from app.models.database import get_session
-from app.models.schemas import AIMode, Config
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.database import get_async_session
+from app.services.config_service import config_service
 
 router = APIRouter()
 
@@ -40,25 +40,26 @@ class ConfigUpdateRequest(BaseModel):
     emotion_confidence_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
 
 @router.get("",response_model=ConfigResponse)
-async def get_config(session: Session=Depends(get_session)):
-    
-    config = session.get(Config,1)
-    
-    if not config: 
+async def get_config():
+    """
+    Returns current config snapshot (no database access)
+    """
+    try:
+        return config_service.get_runtime_config()
+    except RuntimeError:
         raise HTTPException(status_code=404, detail="Config not found")
-    
-    return config
 
 
 @router.patch(f"",response_model=ConfigResponse)
-def update_config(
+async def update_config(
     update_data: ConfigUpdateRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Update config in database
     
     At least one property must be provided in the request body.
+    Goes through ConfigService, so the runtime snapshot is refreshed together with the row.
     
     Args:
         mode: str
@@ -78,67 +79,42 @@ def update_config(
             detail="At least one field must be provided for update"
         )
     
-    config = session.get(Config, 1)
+    # Aktualizujemy tylko podane pola
+    update_dict = update_data.model_dump(exclude_unset=True)
     
-    if not config:
+    try:
+        return await session.run_sync(config_service.update_runtime_config, **update_dict)
+    except (LookupError, RuntimeError):
         raise HTTPException(
             status_code=404,
             detail="Configuration not found"
         )
-    
-    # Aktualizujemy tylko podane pola
-    update_dict = update_data.model_dump(exclude_unset=True)
-    for key, value in update_dict.items():
-        setattr(config, key, value)
-    
-    config.updated_at = datetime.now(timezone.utc)
-    
-    try:
-        session.commit()
-        session.refresh(config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to update configuration: {str(e)}"
         )
-    
-    return config   
 
 
 
 @router.post(f"",response_model=ConfigResponse)
-def reset_config(
-    session: Session = Depends(get_session)
+async def reset_config(
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Reset config in database
     """
-    config = session.get(Config, 1)
-    
-    if not config:
+    try:
+        return await session.run_sync(config_service.reset_runtime_config)
+    except (LookupError, RuntimeError):
         raise HTTPException(
             status_code=404,
             detail="Configuration not found"
         )
-        
-    config.mode = AIMode.LOCAL
-    config.model_name = "gemma3:latest"
-    config.gpu_layers = 60
-    config.temperature = 0.7
-    config.max_tokens = 4096
-    config.conversation_memory_length = 10
-    config.emotion_confidence_threshold = 0.6
-    config.updated_at = datetime.now(timezone.utc)    
-    
-    try:
-        session.commit()
-        session.refresh(config)
     except Exception as e:
-        session.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to reset configuration: {str(e)}"
         )
-    
-    return config
\ No newline at end of file
@@ -0,0 +1,82 @@
+import tempfile
+from typing import AsyncIterator, Iterator, List, Optional
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine
+from starlette.types import Receive, Scope, Send
+from app.models.database import get_engine
+from app.services.transfer_service import ImportResult, export_ndjson, import_ndjson
+
+router = APIRouter()
+
+# Request bodies above this are spooled to a temporary file instead of memory
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body when the response ends, also when
+    the client went away mid-stream - otherwise a suspended body generator
+    is only closed whenever it is garbage-collected.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+async def iterate_closing(chunks: Iterator[str]) -> AsyncIterator[str]:
+    """
+    Pull a sync generator in the threadpool and close it when done, so its
+    connection and read transaction are released right away - an open
+    reader holds back WAL checkpoints.
+    """
+    try:
+        while True:
+            # A cancelled await still waits for the thread, close() never races next()
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await run_in_threadpool(chunks.close)
+
+
+@router.get("/export")
+async def export_conversations(
+    conversation_id: Optional[List[int]] = Query(None, description="Only these conversations, repeatable"),
+    character_id: Optional[int] = Query(None, description="Only conversations of this character"),
+    engine: Engine = Depends(get_engine),
+):
+    """
+    Conversations with their messages and memory notes as NDJSON, streamed
+    while it is read - memory use does not depend on the dump size.
+    """
+    return ClosingStreamingResponse(
+        iterate_closing(export_ndjson(engine, conversation_id, character_id)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.ndjson"'},
+    )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_conversations(request: Request, engine: Engine = Depends(get_engine)):
+    """
+    Import an NDJSON dump from /export as new conversations, all or nothing.
+
+    The body is spooled as it arrives and inserted in batches in a worker
+    thread, the event loop is not blocked by a large import.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        try:
+            return await run_in_threadpool(import_ndjson, engine, body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
@@ -1 +1,101 @@
-API_VERSION: str = "v1"
\ No newline at end of file
+import os
+from pathlib import Path
+
+API_VERSION: str = "v1"
+
+# =========== OLLAMA ===========
+# How long Ollama keeps the model loaded after a request ("30m", "1h", -1 = forever)
+OLLAMA_KEEP_ALIVE: str = os.getenv("EVE_OLLAMA_KEEP_ALIVE", "30m")
+
+# How chat context is laid out for the model:
+#   "stable_prefix" - persona-only system prompt first, history as chat messages,
+#                     per-turn context right before the new user message, so the
+#                     model can reuse its prompt cache across turns
+#   "summary"       - legacy layout, recent events summary embedded in the system prompt
+PROMPT_MODE: str = os.getenv("EVE_PROMPT_MODE", "stable_prefix")
+
+# =========== LLM PROVIDERS ===========
+# OpenAI-compatible endpoint used in "remote" mode
+REMOTE_API_BASE_URL: str = os.getenv("EVE_REMOTE_API_BASE_URL", "https://api.openai.com/v1")
+
+# Timeouts in seconds - local models can take long to load and generate
+LLM_CONNECT_TIMEOUT_S: float = float(os.getenv("EVE_LLM_CONNECT_TIMEOUT_S", "5"))
+LOCAL_LLM_TIMEOUT_S: float = float(os.getenv("EVE_LOCAL_LLM_TIMEOUT_S", "300"))
+REMOTE_LLM_TIMEOUT_S: float = float(os.getenv("EVE_REMOTE_LLM_TIMEOUT_S", "120"))
+
+# Retries for connection errors, 429 and 5xx responses, with jittered exponential backoff
+LLM_MAX_RETRIES: int = int(os.getenv("EVE_LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY_S: float = float(os.getenv("EVE_LLM_RETRY_BASE_DELAY_S", "0.5"))
+
+# Keep-alive connection pool shared by all requests of a provider
+LLM_MAX_CONNECTIONS: int = int(os.getenv("EVE_LLM_MAX_CONNECTIONS", "32"))
+
+# =========== GENERATION SCHEDULER ===========
+# Generations running at once - one local GPU gets slower for everyone past this
+LLM_MAX_CONCURRENCY: int = int(os.getenv("EVE_LLM_MAX_CONCURRENCY", "2"))
+# Generations allowed to wait for a slot, more are rejected with 429
+LLM_MAX_QUEUE: int = int(os.getenv("EVE_LLM_MAX_QUEUE", "16"))
+# Longest wait for a slot before giving up with 503
+LLM_QUEUE_TIMEOUT_S: float = float(os.getenv("EVE_LLM_QUEUE_TIMEOUT_S", "60"))
+
+# =========== DATABASE ===========
+# Wait this long for a lock held by another connection before "database is locked"
+DB_BUSY_TIMEOUT_MS: int = int(os.getenv("EVE_DB_BUSY_TIMEOUT_MS", "5000"))
+# Page cache per connection and memory-mapped I/O size
+DB_CACHE_SIZE_KB: int = int(os.getenv("EVE_DB_CACHE_SIZE_KB", "65536"))
+DB_MMAP_SIZE_MB: int = int(os.getenv("EVE_DB_MMAP_SIZE_MB", "256"))
+# Connections kept open - matches the default threadpool size (40), so sync
+# endpoints and run_in_threadpool work never wait for a connection
+DB_POOL_SIZE: int = int(os.getenv("EVE_DB_POOL_SIZE", "40"))
+DB_MAX_OVERFLOW: int = int(os.getenv("EVE_DB_MAX_OVERFLOW", "10"))
+
+# =========== MEMORY RETRIEVAL ===========
+# "hashing" - local deterministic embedder (no model needed), "ollama" - embeddings
+# from EMBEDDING_MODEL. Opt-in: on a single-GPU host every turn's query embedding
+# competes with the chat model for VRAM and can evict it between turns.
+EMBEDDING_BACKEND: str = os.getenv("EVE_EMBEDDING_BACKEND", "hashing")
+EMBEDDING_MODEL: str = os.getenv("EVE_EMBEDDING_MODEL", "nomic-embed-text")
+# Where per-conversation vector indexes are saved
+MEMORY_INDEX_DIR: str = os.getenv("EVE_MEMORY_INDEX_DIR", str(Path(__file__).parent.parent / "models" / "memory_index"))
+# Note score = similarity * w_sim + importance * w_imp + recency * w_rec
+MEMORY_SIMILARITY_WEIGHT: float = float(os.getenv("EVE_MEMORY_SIMILARITY_WEIGHT", "0.6"))
+MEMORY_IMPORTANCE_WEIGHT: float = float(os.getenv("EVE_MEMORY_IMPORTANCE_WEIGHT", "0.3"))
+MEMORY_RECENCY_WEIGHT: float = float(os.getenv("EVE_MEMORY_RECENCY_WEIGHT", "0.1"))
+# Recency of a note halves every this many days
+MEMORY_RECENCY_HALF_LIFE_DAYS: float = float(os.getenv("EVE_MEMORY_RECENCY_HALF_LIFE_DAYS", "30"))
+
+# =========== CONTEXT PACKING ===========
+# Model context window in tokens (sent to Ollama as num_ctx). The prompt gets
+# what is left after reserving Config.max_tokens for the reply.
+LLM_CONTEXT_WINDOW: int = int(os.getenv("EVE_LLM_CONTEXT_WINDOW", "8192"))
+# Most of the prompt budget memory notes may take, the rest is for history
+CONTEXT_MEMORY_SHARE: float = float(os.getenv("EVE_CONTEXT_MEMORY_SHARE", "0.25"))
+# Candidates the packer chooses from - messages kept per cached conversation
+# and memory notes retrieved per turn
+CONTEXT_MAX_MESSAGES: int = int(os.getenv("EVE_CONTEXT_MAX_MESSAGES", "100"))
+CONTEXT_MAX_MEMORY_NOTES: int = int(os.getenv("EVE_CONTEXT_MAX_MEMORY_NOTES", "20"))
+
+# =========== SUMMARIES ===========
+# Messages older than the last Config.conversation_memory_length are folded
+# into a rolling summary in the background, at least this many at a time
+SUMMARY_BATCH_MESSAGES: int = int(os.getenv("EVE_SUMMARY_BATCH_MESSAGES", "10"))
+# Most messages folded by one LLM call - a long backlog (imported or legacy
+# history) is worked off in several passes, each also kept to the prompt budget
+SUMMARY_PASS_MESSAGES: int = int(os.getenv("EVE_SUMMARY_PASS_MESSAGES", "200"))
+# Summary length the model is asked to keep to
+SUMMARY_MAX_WORDS: int = int(os.getenv("EVE_SUMMARY_MAX_WORDS", "250"))
+
+# =========== WRITE-BEHIND ===========
+# Secondary turn writes (memory notes, activity timestamps) are committed
+# together at most this long after the reply, at most this many turns at once
+WRITE_BEHIND_FLUSH_MS: int = int(os.getenv("EVE_WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_MAX_BATCH: int = int(os.getenv("EVE_WRITE_BEHIND_MAX_BATCH", "100"))
+
+# =========== LOGGING & TRACING ===========
+LOG_LEVEL: str = os.getenv("EVE_LOG_LEVEL", "INFO")
+# "json" - one structured object per line, "text" - human readable
+LOG_FORMAT: str = os.getenv("EVE_LOG_FORMAT", "json")
+# Share of turns whose stage timings are logged (all turns go to the histograms)
+TRACE_SAMPLE_RATE: float = float(os.getenv("EVE_TRACE_SAMPLE_RATE", "0.1"))
+# Turns slower than this are always logged
+TRACE_SLOW_TURN_MS: float = float(os.getenv("EVE_TRACE_SLOW_TURN_MS", "20000"))
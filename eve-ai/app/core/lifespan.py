@@ -1,12 +1,16 @@
 from contextlib import asynccontextmanager
 from app.services.config_service import config_service
 from sqlmodel import Session
-from app.models.database import engine
+from app.models.database import async_engine, engine
+from app.core.log import get_logger
+from app.api import chat
+
+logger = get_logger("app")
 
 @asynccontextmanager
 async def lifespan(app):
     
-    print("-> Starting EVE AI...")
+    logger.info("Starting EVE AI")
     # =========== STARTUP ===========
     
     with Session(engine) as session:
@@ -14,8 +18,17 @@ async def lifespan(app):
     
     # Register config service
     app.state.config_service = config_service
+    
+    # Load model before the first message arrives
+    await chat.ai_service.warm_up()
+    # Background summaries of old history
+    chat.ai_service.summarizer.start()
+    # Write-behind of memory notes and activity timestamps
+    chat.ai_service.writer.start()
     yield
 
     # =========== SHUTDOWN ===========
     
-    print("Shutting down EVE AI...")
\ No newline at end of file
+    await chat.ai_service.aclose()
+    await async_engine.dispose()
+    logger.info("EVE AI stopped")
\ No newline at end of file
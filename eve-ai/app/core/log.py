@@ -0,0 +1,46 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict
+from app.core.config import LOG_FORMAT, LOG_LEVEL
+
+# Attributes every LogRecord has - anything else came from `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """
+    Configure the "eve" logger tree, writing to stdout.
+
+    args:
+        level: minimum level name, e.g. "INFO"
+        fmt: "json" for structured lines, "text" for a human readable format
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("eve")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "eve" tree, e.g. get_logger("chat") -> "eve.chat"."""
+    return logging.getLogger(f"eve.{name}")
@@ -0,0 +1,45 @@
+import time
+from app.services.metrics import http_request_duration, http_requests
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route, e.g. /api/v1/chat/{character_id}/{conversation_id}."""
+    # Newer FastAPI keeps included routers nested - scope["route"] then has
+    # the path without the router prefix, the full one is in the route context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Counts HTTP requests and their duration per route template.
+
+    Pure ASGI, so streaming responses are timed until their last chunk and
+    nothing is buffered. Paths that match no route share one label, which
+    keeps the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = route_template(scope)
+            http_requests.inc(labels=(scope["method"], path, str(status)))
+            http_request_duration.observe(time.perf_counter() - start, (scope["method"], path))
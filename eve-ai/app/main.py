@@ -2,11 +2,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 # from app.core.config import settings
 from app.core.lifespan import lifespan
+from app.core.middleware import MetricsMiddleware
 from app.core.config import API_VERSION
-from app.api import chat, config, analytics, characters
+from app.core.log import get_logger, setup_logging
+from app.api import chat, config, analytics, characters, conversations
 from fastapi.routing import APIRoute
 
 
+setup_logging()
+logger = get_logger("app")
+
 app = FastAPI(title="EVE AI", version="1.0.0",lifespan=lifespan)
 
 app.add_middleware(
@@ -16,20 +21,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(analytics.router, prefix=f"/api/{API_VERSION}/analytics", tags=["analytics"])
 app.include_router(config.router,   prefix=f"/api/{API_VERSION}/config",   tags=["config"])
 app.include_router(chat.router,     prefix=f"/api/{API_VERSION}/chat",     tags=["chat"])
 app.include_router(characters.router,prefix=f"/api/{API_VERSION}/characters",tags=["characters"])
+app.include_router(conversations.router,prefix=f"/api/{API_VERSION}/conversations",tags=["conversations"])
 
-print("\n" + "="*60)
-print(f"{'METHOD':<10} {'PATH':<40} {'NAME'}")
-print("="*60)
-
-found_config = False
+# Routes at startup, only with EVE_LOG_LEVEL=DEBUG
 for route in app.routes:
-    if isinstance(route, APIRoute):    
-        methods = ",".join(route.methods)
-        print(f"{methods:<10} {route.path:<40} {route.name}")
-
-print("="*60 + "\n")
\ No newline at end of file
+    if isinstance(route, APIRoute):
+        logger.debug("Route", extra={"methods": sorted(route.methods), "path": route.path, "route_name": route.name})
@@ -1,27 +1,121 @@
+from typing import AsyncIterator, Dict, Optional
 from sqlmodel import Session, create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pathlib import Path
 from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+from app.core.config import DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MAX_OVERFLOW, DB_MMAP_SIZE_MB, DB_POOL_SIZE
 # Ścieżka do bazy danych w folderze models
 db_path = Path(__file__).parent / "database.db"
 DATABASE_URL = f"sqlite:///{db_path}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{db_path}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, echo=False)
+# Applied to every new connection, in this order
+SQLITE_PRAGMAS: Dict[str, str] = {
+    "foreign_keys": "ON",
+    # Readers do not block the writer and the writer does not block readers
+    "journal_mode": "WAL",
+    # Safe with WAL - a power loss can drop the last commits, never corrupt the file
+    "synchronous": "NORMAL",
+    "busy_timeout": str(DB_BUSY_TIMEOUT_MS),
+    # Negative value is in KiB
+    "cache_size": str(-DB_CACHE_SIZE_KB),
+    "mmap_size": str(DB_MMAP_SIZE_MB * 1024 * 1024),
+    "temp_store": "MEMORY",
+}
 
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+
+def make_engine(url: str = DATABASE_URL, pragmas: Optional[Dict[str, str]] = None, **kwargs) -> Engine:
+    """
+    Create a SQLite engine with pragmas set on each of its connections.
+
+    The connect listener is registered on this engine only, so other
+    engines in the process (tests, benchmarks, Alembic) keep their settings.
+
+    args:
+        url: SQLite database URL
+        pragmas: pragmas to set, defaults to SQLITE_PRAGMAS
+        **kwargs: passed to create_engine
+
+    returns:
+        Engine
+    """
+    if "poolclass" not in kwargs:
+        kwargs.update(poolclass=QueuePool, pool_size=kwargs.get("pool_size", DB_POOL_SIZE), max_overflow=kwargs.get("max_overflow", DB_MAX_OVERFLOW))
+    new_engine = create_engine(
+        url,
+        # Python-level wait before the busy handler existed, keep in sync with busy_timeout
+        connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000},
+        echo=False,
+        **kwargs,
+    )
+    _set_pragmas_on_connect(new_engine, SQLITE_PRAGMAS if pragmas is None else pragmas)
+    return new_engine
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, pragmas: Optional[Dict[str, str]] = None, **kwargs) -> AsyncEngine:
+    """
+    Create an aiosqlite engine with the same pragmas as make_engine.
+
+    Queries run on aiosqlite's own thread and are awaited, so they do not
+    block the event loop.
+
+    args:
+        url: sqlite+aiosqlite database URL
+        pragmas: pragmas to set, defaults to SQLITE_PRAGMAS
+        **kwargs: passed to create_async_engine
+
+    returns:
+        AsyncEngine
+    """
+    if "poolclass" not in kwargs:
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+    new_engine = create_async_engine(url, connect_args={"timeout": DB_BUSY_TIMEOUT_MS / 1000}, echo=False, **kwargs)
+    _set_pragmas_on_connect(new_engine.sync_engine, SQLITE_PRAGMAS if pragmas is None else pragmas)
+    return new_engine
+
+
+def _set_pragmas_on_connect(target: Engine, pragmas: Dict[str, str]) -> None:
+    @event.listens_for(target, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# Sync engine - startup, seeding and scripts
+engine = make_engine()
+# Async engine - API requests
+async_engine = make_async_engine()
 
 def get_session():
     with Session(engine) as session:
         yield session
 
 
+def get_engine() -> Engine:
+    """Sync engine, for endpoints that stream or bulk load through Core."""
+    return engine
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """
+    Request-scoped AsyncSession.
+
+    Objects are not expired on commit, so returning them from an endpoint
+    after commit does not trigger lazy loads (which cannot run under async).
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 def create_db_and_tables():
     """Create all database tables if they don't exist."""
     SQLModel.metadata.create_all(engine)
 
 def wipe_database():
     """Drop all tables and recreate them."""
-    SQLModel.metadata.drop_all(engine)
\ No newline at end of file
+    SQLModel.metadata.drop_all(engine)
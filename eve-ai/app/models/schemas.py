@@ -1,6 +1,7 @@
 from ast import Set
 import json
 from pydantic import field_validator
+from sqlalchemy import event
 from sqlmodel import SQLModel, Field, Relationship, Index
 from typing import Any, List, Optional, Dict, Set
 from datetime import datetime, timezone
@@ -202,6 +203,14 @@ class Character(SQLModel, table=True):
             raise ValueError(f"Invalid emotions: {[e.value for e in invalid]}")
         self.enabled_emotions_json = json.dumps([e.value for e in emotions])
     
+    @property
+    def enabled_emotion_values(self) -> List[str]:
+        """Enabled emotions in configured order, without duplicates"""
+        try:
+            return list(dict.fromkeys(Emotion(e).value for e in json.loads(self.enabled_emotions_json)))
+        except:
+            return [Emotion.NEUTRAL.value]
+    
     __table_args__ = (
         Index("idx_character_active", "is_active"),
         Index("idx_character_default", "is_default"),
@@ -231,17 +240,34 @@ class Conversation(SQLModel, table=True):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     last_activity: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    # Rolling summary of messages up to and including summary_until_id,
+    # written in the background by ConversationSummarizer
+    summary: str = Field(default="")
+    summary_until_id: int = Field(default=0)
 
     memory_notes: List["MemoryNote"] = Relationship(back_populates="conversation",sa_relationship_kwargs={"cascade":"all, delete-orphan"})
     messages: List["Message"] = Relationship(back_populates="conversation",sa_relationship_kwargs={"cascade":"all, delete-orphan"})
 
-    @property
-    def last_interactions_summary(self, max_messages=5):
-        raise NotImplementedError
-    
     __table_args__ = (Index("idx_conversation_activity", "last_activity", "character_id"),)
 
 # =========== MESSAGE ===========
+def full_emotion_name(emotion: Optional[str], intensity: float) -> str:
+    """Emotion name with intensity prefix, e.g. very_joyful"""
+    if not emotion:
+        return Emotion.NEUTRAL.value
+    
+    if intensity >= 0.8:
+        return f'extremely_{emotion}'
+    elif intensity >= 0.6:
+        return f'very_{emotion}'
+    elif intensity >= 0.3:
+        return f'{emotion}'
+    elif intensity >= 0.1:
+        return f'slightly_{emotion}'
+    return Emotion.NEUTRAL
+
+
 class Message(SQLModel, table=True):
     """Single message table"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -275,18 +301,12 @@ class Message(SQLModel, table=True):
     @property
     def full_emotion(self) -> str:
         """Full emotion name with intensity"""
-        if not self.emotion:
-            return Emotion.NEUTRAL.value
-        
-        if self.emotion_intensity >= 0.8:
-            return f'extremely_{self.emotion}'
-        elif self.emotion_intensity >= 0.6:
-            return f'very_{self.emotion}'
-        elif self.emotion_intensity >= 0.3:
-            return f'{self.emotion}'
-        elif self.emotion_intensity >= 0.1:
-            return f'slightly_{self.emotion}'
-        return Emotion.NEUTRAL
+        return full_emotion_name(self.emotion, self.emotion_intensity)
+    
+    __table_args__ = (
+        # Covers history pages and recent-context lookups (filter + sort + keyset cursor)
+        Index("idx_message_conversation_created", "conversation_id", "created_at", "id"),
+    )
     
 
 # =========== MEMORY NOTE ===========
@@ -308,4 +328,145 @@ class MemoryNote(SQLModel, table=True):
     
     __table_args__ = (
         Index("idx_memory_importance", "character_id", "importance_score"),
-    )
\ No newline at end of file
+    )
+
+# =========== ANALYTICS ROLLUPS ===========
+# Hourly aggregates of turns, updated by the write-behind writer, so analytics
+# never scan `message`. `hour` is the UTC hour start. No foreign keys - stats
+# outlive deleted characters.
+class GenerationRollup(SQLModel, table=True):
+    """Generated assistant messages per hour, character and model"""
+    __tablename__ = "generation_rollup"
+    hour: datetime = Field(primary_key=True)
+    character_id: int = Field(primary_key=True)
+    model_name: str = Field(primary_key=True)
+    
+    messages: int = Field(default=0)
+    generation_ms_sum: int = Field(default=0)
+    # Only messages with a token count, for tokens/s
+    tokens_sum: int = Field(default=0)
+    token_generation_ms_sum: int = Field(default=0)
+    
+    __table_args__ = (Index("idx_generation_rollup_character", "character_id", "hour"),)
+
+
+class LatencyRollup(SQLModel, table=True):
+    """Generation time histogram per hour, character and model (bucket index into ROLLUP_LATENCY_BUCKETS_MS)"""
+    __tablename__ = "latency_rollup"
+    hour: datetime = Field(primary_key=True)
+    character_id: int = Field(primary_key=True)
+    model_name: str = Field(primary_key=True)
+    bucket: int = Field(primary_key=True)
+    
+    messages: int = Field(default=0)
+
+
+class EmotionRollup(SQLModel, table=True):
+    """Emotion counts per hour, character and role"""
+    __tablename__ = "emotion_rollup"
+    hour: datetime = Field(primary_key=True)
+    character_id: int = Field(primary_key=True)
+    role: str = Field(primary_key=True, max_length=20)
+    emotion: str = Field(primary_key=True)
+    
+    messages: int = Field(default=0)
+    intensity_sum: float = Field(default=0.0)
+
+
+# =========== FULL-TEXT SEARCH ===========
+# FTS5 indexes over message and memorynote content, kept in sync by triggers.
+# External content - the text is not stored twice, snippets are read back
+# through the *_fts_source views. `scope` indexes one token per filter, e.g.
+# "ch1 ch1assistant cv7 cv7assistant" (no role tokens for memory notes), so a
+# scoped search intersects with a single doclist no larger than the scope -
+# bm25 reads every doclist of the query once, a bare role token would be half
+# the index.
+SEARCH_TABLES = ("message_fts", "memorynote_fts")
+
+_MESSAGE_SCOPE = (
+    "'ch' || {character} || ' ch' || {character} || {row}.role || "
+    "' cv' || {row}.conversation_id || ' cv' || {row}.conversation_id || {row}.role"
+)
+_NOTE_SCOPE = "'ch' || {row}.character_id || ' cv' || {row}.conversation_id"
+
+
+def _message_fts(command: str, row: str, source: str, character: str = "c.character_id") -> str:
+    """Index message `row` selected from `source`, or unindex it with command "delete"."""
+    scope = _MESSAGE_SCOPE.format(character=character, row=row)
+    if command == "delete":
+        return f"INSERT INTO message_fts(message_fts, rowid, content, scope) SELECT 'delete', {row}.id, {row}.content, {scope} FROM {source};"
+    return f"INSERT INTO message_fts(rowid, content, scope) SELECT {row}.id, {row}.content, {scope} FROM {source};"
+
+
+def _note_fts(command: str, row: str) -> str:
+    scope = _NOTE_SCOPE.format(row=row)
+    if command == "delete":
+        return f"INSERT INTO memorynote_fts(memorynote_fts, rowid, content, scope) VALUES ('delete', {row}.id, {row}.content, {scope});"
+    return f"INSERT INTO memorynote_fts(rowid, content, scope) VALUES ({row}.id, {row}.content, {scope});"
+
+
+_OLD_CONVERSATION = "conversation c WHERE c.id = old.conversation_id"
+_NEW_CONVERSATION = "conversation c WHERE c.id = new.conversation_id"
+
+SEARCH_DDL: List[str] = [
+    f"CREATE VIEW IF NOT EXISTS message_fts_source AS SELECT m.id, m.content, {_MESSAGE_SCOPE.format(character='c.character_id', row='m')} AS scope "
+    "FROM message m JOIN conversation c ON c.id = m.conversation_id",
+    f"CREATE VIEW IF NOT EXISTS memorynote_fts_source AS SELECT n.id, n.content, {_NOTE_SCOPE.format(row='n')} AS scope FROM memorynote n",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content, scope, content='message_fts_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memorynote_fts USING fts5(content, scope, content='memorynote_fts_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    # Rank by content only, scope tokens match every hit
+    "INSERT INTO message_fts(message_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    "INSERT INTO memorynote_fts(memorynote_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    # 'delete' must be given the indexed values exactly. When a conversation is
+    # deleted its messages are unindexed first, the cascade then finds no
+    # conversation and skips them.
+    "CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN "
+    f"{_message_fts('insert', 'new', _NEW_CONVERSATION)} END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN "
+    f"{_message_fts('delete', 'old', _OLD_CONVERSATION)} END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF content, role, conversation_id ON message BEGIN "
+    f"{_message_fts('delete', 'old', _OLD_CONVERSATION)} {_message_fts('insert', 'new', _NEW_CONVERSATION)} END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_fts_delete BEFORE DELETE ON conversation BEGIN "
+    f"{_message_fts('delete', 'm', 'message m WHERE m.conversation_id = old.id', 'old.character_id')} END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_fts_update AFTER UPDATE OF character_id ON conversation BEGIN "
+    f"{_message_fts('delete', 'm', 'message m WHERE m.conversation_id = old.id', 'old.character_id')} "
+    f"{_message_fts('insert', 'm', 'message m WHERE m.conversation_id = new.id', 'new.character_id')} END",
+    f"CREATE TRIGGER IF NOT EXISTS memorynote_fts_insert AFTER INSERT ON memorynote BEGIN {_note_fts('insert', 'new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS memorynote_fts_delete AFTER DELETE ON memorynote BEGIN {_note_fts('delete', 'old')} END",
+    "CREATE TRIGGER IF NOT EXISTS memorynote_fts_update AFTER UPDATE OF content, character_id, conversation_id ON memorynote BEGIN "
+    f"{_note_fts('delete', 'old')} {_note_fts('insert', 'new')} END",
+]
+SEARCH_TRIGGERS = (
+    "message_fts_insert", "message_fts_delete", "message_fts_update", "conversation_fts_delete", "conversation_fts_update",
+    "memorynote_fts_insert", "memorynote_fts_delete", "memorynote_fts_update",
+)
+SEARCH_TRIGGER_DDL: List[str] = [statement for statement in SEARCH_DDL if statement.startswith("CREATE TRIGGER")]
+# Reindex everything from the source views - after creating an index over
+# existing rows, or after a bulk load without the triggers
+SEARCH_REBUILD: List[str] = [f"INSERT INTO {table}({table}) VALUES ('rebuild')" for table in SEARCH_TABLES]
+SEARCH_DROP_DDL: List[str] = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SEARCH_TRIGGERS),
+    "DROP TABLE IF EXISTS message_fts",
+    "DROP TABLE IF EXISTS memorynote_fts",
+    "DROP VIEW IF EXISTS message_fts_source",
+    "DROP VIEW IF EXISTS memorynote_fts_source",
+]
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_search_index(target, connection, **kw) -> None:
+    """create_all (tests, scripts) gets the same search index as the migration, existing rows included."""
+    if connection.dialect.name == "sqlite":
+        existing = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+        for statement in SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        for table, rebuild in zip(SEARCH_TABLES, SEARCH_REBUILD):
+            if table not in existing:
+                connection.exec_driver_sql(rebuild)
+
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw) -> None:
+    if connection.dialect.name == "sqlite":
+        for statement in SEARCH_DROP_DDL:
+            connection.exec_driver_sql(statement)
@@ -0,0 +1,306 @@
+"""
+Synthetic data generator for load testing.
+
+Adds characters, users, conversations and long message / memory note
+histories with realistic shapes: lognormal conversation and message
+lengths, a skewed emotion mix, generation times that grow with the reply
+length, and activity spread over the last days. Analytics rollups are
+filled for the generated turns, like the app does.
+
+Messages and notes go in with executemany in large transactions, so
+millions of rows load in minutes. IDs are assigned up front - run it
+against a database the app is not writing to. The full-text search
+triggers are dropped for the load and the index is rebuilt once at the end.
+
+Usage:
+    uv run eve-synthetic --characters 20 --conversations 2000 --messages 5000
+    python -m app.models.synthetic --db sqlite:///load.db --conversations 100
+"""
+import argparse
+import math
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import Connection, Engine, func, select
+from sqlmodel import Session, SQLModel
+from app.models.database import DATABASE_URL, make_engine
+from app.models.schemas import SEARCH_REBUILD, SEARCH_TRIGGER_DDL, SEARCH_TRIGGERS, Character, Conversation, Emotion, MemoryNote, Message, User
+from app.services.analytics_service import TurnStats, rollup_statements
+
+# Relative frequency of emotions in replies, user messages lean more neutral
+EMOTION_WEIGHTS: Dict[str, float] = {
+    Emotion.NEUTRAL.value: 30, Emotion.JOYFUL.value: 14, Emotion.CURIOUS.value: 12, Emotion.CONTENT.value: 9,
+    Emotion.PLAYFUL.value: 8, Emotion.AFFECTIONATE.value: 6, Emotion.EXCITED.value: 5, Emotion.CONFUSED.value: 3,
+    Emotion.TIRED.value: 3, Emotion.SARCASTIC.value: 2, Emotion.ANXIOUS.value: 2, Emotion.FLUSTERED.value: 2,
+    Emotion.IRRITATED.value: 1, Emotion.DISAPPOINTED.value: 1, Emotion.EMBARRASSED.value: 1, Emotion.SMUG.value: 1,
+}
+WORDS = (
+    "the a I you it and to of that is was in my what do so but we just like know think it's really have about not "
+    "this for with be me on can your are how time day today feel good one would there they all if when more want "
+    "yeah oh maybe little bit work home friend music book game rain coffee tea night morning weekend story cat dog "
+    "walk movie remember tell why because still again never always something everything nothing tomorrow yesterday "
+    "happy tired busy quiet strange funny late early long short new old favourite place city sea mountain dream"
+).split()
+CORPUS_WORDS = 50_000
+
+
+@dataclass
+class SyntheticSpec:
+    """What to generate. Message counts and lengths are means of lognormal distributions."""
+    characters: int = 10
+    users: int = 10
+    conversations: int = 100
+    messages: int = 200
+    user_words: int = 12
+    assistant_words: int = 45
+    note_rate: float = 0.08
+    days: int = 90
+    model_name: str = "synthetic"
+    seed: Optional[int] = 42
+    batch_rows: int = 100_000
+
+
+@dataclass
+class SyntheticResult:
+    characters: int = 0
+    users: int = 0
+    conversations: int = 0
+    messages: int = 0
+    memory_notes: int = 0
+    seconds: float = field(default=0.0, compare=False)
+
+
+def _insert_sql(model, columns: Sequence[str]) -> str:
+    return f"INSERT INTO {model.__tablename__} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+MESSAGE_COLUMNS = ("id", "conversation_id", "role", "content", "language", "emotion", "emotion_confidence", "emotion_intensity", "generation_time_ms", "token_count", "created_at")
+NOTE_COLUMNS = ("id", "character_id", "conversation_id", "content", "source_message_id", "importance_score", "created_at")
+CONVERSATION_COLUMNS = ("id", "character_id", "user_id", "relationship_type", "user_intent", "world_state", "title", "message_count", "is_active", "created_at", "updated_at", "last_activity", "summary", "summary_until_id")
+
+
+def _timestamps(micros: np.ndarray) -> List[str]:
+    """Epoch microseconds as SQLAlchemy stores DateTime in SQLite: UTC, no offset, space separated."""
+    return np.strings.replace(np.datetime_as_string(micros.astype("datetime64[us]"), unit="us"), "T", " ").tolist()
+
+
+class SyntheticGenerator:
+    """
+    Writes a SyntheticSpec into a database.
+
+    Each conversation is drawn at once as numpy arrays, rows are built as
+    tuples and inserted with the driver's executemany, bypassing per-row ORM
+    and type processing. Conversations are flushed whole, in transactions of
+    about batch_rows messages with their notes and rollups.
+    """
+
+    def __init__(self, engine: Engine, spec: SyntheticSpec):
+        self.engine = engine
+        self.spec = spec
+        self.rng = np.random.default_rng(spec.seed)
+        self.now_us = int(datetime.now(timezone.utc).timestamp()) * 1_000_000
+        self.result = SyntheticResult()
+
+        weights = np.array(list(EMOTION_WEIGHTS.values()))
+        self._emotions = np.array(list(EMOTION_WEIGHTS))
+        self._ai_p = weights / weights.sum()
+        # Users leave the emotion neutral more often
+        self._user_p = 0.6 * self._ai_p + 0.4 * (self._emotions == Emotion.NEUTRAL.value)
+
+        # One long random text, messages are word-aligned slices of it
+        words = self.rng.choice(WORDS, size=CORPUS_WORDS).tolist()
+        self._corpus = " ".join(words)
+        self._word_starts = np.concatenate(([0], np.cumsum([len(word) + 1 for word in words]))).tolist()
+
+        self._conversations: List[Tuple] = []
+        self._messages: List[Tuple] = []
+        self._notes: List[Tuple] = []
+        self._turns: List[TurnStats] = []
+
+    # =========== SHAPES ===========
+    def _lognormal(self, mean: float, sigma: float, size: Optional[int] = None) -> np.ndarray:
+        """Lognormal samples with the given mean."""
+        return self.rng.lognormal(math.log(mean) - sigma * sigma / 2, sigma, size)
+
+    def _word_counts(self, mean: float, sigma: float, size: int) -> np.ndarray:
+        return np.clip(np.rint(self._lognormal(mean, sigma, size)), 1, CORPUS_WORDS // 2).astype(np.int64)
+
+    def _texts(self, counts: np.ndarray) -> List[str]:
+        starts = (self.rng.random(len(counts)) * (CORPUS_WORDS - counts)).astype(np.int64).tolist()
+        corpus, word_starts = self._corpus, self._word_starts
+        texts = []
+        for start, count in zip(starts, counts.tolist()):
+            text = corpus[word_starts[start]:word_starts[start + count] - 1]
+            texts.append(text[0].upper() + text[1:] + ".")
+        return texts
+
+    # =========== GENERATION ===========
+    def run(self) -> SyntheticResult:
+        start = time.perf_counter()
+        SQLModel.metadata.create_all(self.engine)
+        characters, users = self._create_people()
+
+        with self.engine.connect() as conn:
+            # Synthetic rows are reproducible, durability of each commit does not matter
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            ids = {model: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar_one() for model in (Conversation, Message, MemoryNote)}
+            # Indexing row by row in the triggers cuts the load rate several times,
+            # one rebuild at the end is much cheaper
+            for name in SEARCH_TRIGGERS:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+            conn.commit()
+            conversation_id, message_id, note_id = ids[Conversation], ids[Message], ids[MemoryNote]
+
+            try:
+                turns = np.maximum(1, np.rint(self._lognormal(self.spec.messages, 1.0, self.spec.conversations) / 2)).astype(np.int64).tolist()
+                character_ids = self.rng.choice(characters, self.spec.conversations).tolist()
+                user_ids = self.rng.choice(users, self.spec.conversations).tolist()
+                for n, character_id, user_id in zip(turns, character_ids, user_ids):
+                    conversation_id += 1
+                    note_id = self._conversation(conversation_id, character_id, user_id, n, message_id, note_id)
+                    message_id += 2 * n
+                    if len(self._messages) >= self.spec.batch_rows:
+                        self._flush(conn)
+                self._flush(conn)
+            finally:
+                # Also after a failed load - committed batches get indexed, the triggers come back
+                conn.rollback()
+                for statement in SEARCH_TRIGGER_DDL + SEARCH_REBUILD:
+                    conn.exec_driver_sql(statement)
+                conn.commit()
+                conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+
+        self.result.seconds = round(time.perf_counter() - start, 2)
+        return self.result
+
+    def _create_people(self) -> Tuple[List[int], List[int]]:
+        """Characters and users through the ORM - few rows, and their many defaults apply."""
+        with Session(self.engine) as session:
+            offset = session.scalar(select(func.coalesce(func.max(Character.id), 0)))
+            personalities = self._texts(np.full(self.spec.characters, 30))
+            characters = [
+                Character(name=f"Synthetic {offset + i + 1}", description="Generated for load testing", personality=personality, default_emotion=Emotion.NEUTRAL.value)
+                for i, personality in enumerate(personalities)
+            ]
+            offset = session.scalar(select(func.coalesce(func.max(User.id), 0)))
+            users = [User(name=f"Synthetic user {offset + i + 1}") for i in range(self.spec.users)]
+            session.add_all(characters + users)
+            session.commit()
+            self.result.characters, self.result.users = len(characters), len(users)
+            return [c.id for c in characters], [u.id for u in users]
+
+    def _conversation(self, conversation_id: int, character_id: int, user_id: int, n: int, message_id: int, note_id: int) -> int:
+        """Queue one conversation of n turns. Message IDs follow message_id, returns the last note ID."""
+        spec, rng = self.spec, self.rng
+
+        user_words = self._word_counts(spec.user_words, 0.7, n)
+        ai_words = self._word_counts(spec.assistant_words, 0.6, n)
+        tokens = np.maximum(1, np.rint(ai_words * 1.35)).astype(np.int64)
+        generation_ms = np.rint(300 + tokens * rng.uniform(15, 40, n)).astype(np.int64)
+
+        # Turns spread over a stretch of the last `days`, exponential gaps between
+        # a reply and the next message, shifted back if they would end in the future
+        span_us = spec.days * 86_400_000_000 * min(1.0, rng.uniform(0.05, 1.0) * (1 + n / 500))
+        gaps_us = rng.exponential(span_us / (n + 1), n).astype(np.int64)
+        user_at = np.cumsum(gaps_us) + np.concatenate(([0], np.cumsum(generation_ms[:-1] * 1000)))
+        ai_at = user_at + generation_ms * 1000
+        created = min(self.now_us - int(span_us), self.now_us - int(ai_at[-1]))
+        user_at += created
+        ai_at += created
+
+        user_emotions = self._emotions[rng.choice(len(self._emotions), n, p=self._user_p)].tolist()
+        ai_emotions = self._emotions[rng.choice(len(self._emotions), n, p=self._ai_p)].tolist()
+        user_intensity = rng.beta(2, 2, n).round(2).tolist()
+        ai_intensity = rng.beta(2, 2, n).round(2).tolist()
+        user_times, ai_times = _timestamps(user_at), _timestamps(ai_at)
+        user_ids = range(message_id + 1, message_id + 2 * n, 2)
+        ai_ids = range(message_id + 2, message_id + 2 * n + 1, 2)
+
+        messages: List[Tuple] = [None] * (2 * n)
+        messages[0::2] = zip(
+            user_ids, repeat(conversation_id), repeat("user"), self._texts(user_words), repeat("en"),
+            user_emotions, rng.uniform(0.4, 1.0, n).round(2).tolist(), user_intensity, repeat(None), repeat(None), user_times,
+        )
+        generation_ms, tokens = generation_ms.tolist(), tokens.tolist()
+        messages[1::2] = zip(
+            ai_ids, repeat(conversation_id), repeat("assistant"), self._texts(ai_words), repeat("en"),
+            ai_emotions, rng.uniform(0.5, 1.0, n).round(2).tolist(), ai_intensity, generation_ms, tokens, ai_times,
+        )
+        self._messages.extend(messages)
+
+        replied = ai_at.astype("datetime64[us]").tolist()  # naive UTC, what hour_of expects
+        self._turns.extend(
+            TurnStats(character_id, spec.model_name, at, ms, count, ai_emotion, ai_level, user_emotion, user_level)
+            for at, ms, count, ai_emotion, ai_level, user_emotion, user_level
+            in zip(replied, generation_ms, tokens, ai_emotions, ai_intensity, user_emotions, user_intensity)
+        )
+
+        noted = np.flatnonzero(rng.random(n) < spec.note_rate)
+        if len(noted):
+            contents = self._texts(rng.integers(6, 26, len(noted)))
+            importance = rng.uniform(0.86, 1.0, len(noted)).round(2).tolist()
+            for i, content, score in zip(noted.tolist(), contents, importance):
+                note_id += 1
+                self._notes.append((note_id, character_id, conversation_id, content, ai_ids[i], score, ai_times[i]))
+
+        created_at = _timestamps(np.array([created]))[0]
+        self._conversations.append((
+            conversation_id, character_id, user_id, "friend", "casual_chat", "", f"Synthetic conversation {conversation_id}",
+            2 * n, 1, created_at, ai_times[-1], ai_times[-1], "", 0,
+        ))
+        return note_id
+
+    def _flush(self, conn: Connection) -> None:
+        """Insert everything pending in one transaction, parents first."""
+        if not self._conversations:
+            return
+        with conn.begin():
+            for model, columns, rows in ((Conversation, CONVERSATION_COLUMNS, self._conversations), (Message, MESSAGE_COLUMNS, self._messages), (MemoryNote, NOTE_COLUMNS, self._notes)):
+                if rows:
+                    conn.exec_driver_sql(_insert_sql(model, columns), rows)
+            for statement, rows in rollup_statements(self._turns):
+                conn.execute(statement, rows)
+        self.result.conversations += len(self._conversations)
+        self.result.messages += len(self._messages)
+        self.result.memory_notes += len(self._notes)
+        self._conversations, self._messages, self._notes, self._turns = [], [], [], []
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = SyntheticSpec()
+    parser.add_argument("--db", default=DATABASE_URL, help="SQLAlchemy database URL, tables are created if missing")
+    parser.add_argument("--characters", type=int, default=defaults.characters)
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--conversations", type=int, default=defaults.conversations)
+    parser.add_argument("--messages", type=int, default=defaults.messages, help="Mean messages per conversation (lognormal, long tail)")
+    parser.add_argument("--note-rate", type=float, default=defaults.note_rate, help="Share of turns that leave a memory note")
+    parser.add_argument("--days", type=int, default=defaults.days, help="Activity spread over the last N days")
+    parser.add_argument("--model-name", default=defaults.model_name, help="Model recorded in the analytics rollups")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--batch-rows", type=int, default=defaults.batch_rows, help="Messages per transaction, rounded up to whole conversations")
+    args = parser.parse_args(argv)
+
+    spec = SyntheticSpec(
+        characters=args.characters, users=args.users, conversations=args.conversations, messages=args.messages,
+        note_rate=args.note_rate, days=args.days, model_name=args.model_name, seed=args.seed, batch_rows=args.batch_rows,
+    )
+    if spec.characters < 1 or spec.users < 1:
+        parser.error("--characters and --users must be at least 1")
+
+    engine = make_engine(args.db)
+    try:
+        result = SyntheticGenerator(engine, spec).run()
+    finally:
+        engine.dispose()
+    rows = result.messages + result.memory_notes + result.conversations
+    print(f"Generated {', '.join(f'{value} {name}' for name, value in asdict(result).items() if name != 'seconds')} in {result.seconds}s ({rows / max(result.seconds, 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
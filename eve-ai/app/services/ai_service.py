@@ -1,183 +1,429 @@
 from datetime import datetime, timezone
-from tracemalloc import start
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 import time
-import json
-from ollama import ChatResponse, chat
-from sqlmodel import Session, desc, select
-from app.models.schemas import Character, Config, Conversation, Emotion, MemoryNote, Message, User
-from app.services.config_service import config_service
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.interfaces import LoaderOption
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import CONTEXT_MAX_MEMORY_NOTES, CONTEXT_MAX_MESSAGES, PROMPT_MODE
+from app.core.log import get_logger
+from app.models.schemas import Character, Conversation, Emotion, MemoryNote, Message, User
+from app.services.analytics_service import TurnStats
+from app.services.config_service import ConfigSnapshot, config_service
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.context_cache import MemoryRecord, MessageRecord, context_cache
+from app.services.context_packer import ContextPacker
+from app.services.llm_providers import LLMResult, ProviderRegistry
+from app.services.memory_service import MemoryService
+from app.services.metrics import observe_generation
+from app.services.response_contract import parse_turn_response, response_schema
+from app.services.summary_service import ConversationSummarizer
+from app.services.tracing import Trace, Tracer
+from app.services.turn_coordinator import TurnCoordinator
+from app.services.write_behind import TurnEffects, WriteBehindWriter
+from app.utils.json_stream import JsonFieldStreamer
+from app.utils.lru_cache import LRUCache
+
+logger = get_logger("ai")
+
+
+def conversation_participants() -> List[LoaderOption]:
+    """Loader options that fetch character and user together with the conversation."""
+    return [joinedload(Conversation.character), joinedload(Conversation.user)]
 
 
 class AI_Service:
     
-    def generate_message(self, message: str) -> ChatResponse:
-        cfg: Config = config_service.get_runtime_config()
-        response: ChatResponse = chat(model=cfg.model_name, messages=[{"role": "user", "content": message}])
-        return response
+    def __init__(self, providers: Optional[ProviderRegistry] = None, prompt_mode: str = PROMPT_MODE, scheduler: Optional[GenerationScheduler] = None, memory: Optional[MemoryService] = None, packer: Optional[ContextPacker] = None, summarizer: Optional[ConversationSummarizer] = None, writer: Optional[WriteBehindWriter] = None, tracer: Optional[Tracer] = None):
+        # Providers and their connection pools are created once, not per call
+        self.providers = providers or ProviderRegistry.from_settings()
+        self.prompt_mode = prompt_mode
+        # One turn at a time per conversation, retried sends share the running turn
+        self.turns = TurnCoordinator()
+        # Bounded number of generations at once across all conversations
+        self.scheduler = scheduler or GenerationScheduler()
+        # Memory notes picked by relevance to the new message
+        self.memory = memory or MemoryService()
+        # History and notes chosen by token budget, not by count
+        self.packer = packer or ContextPacker()
+        # Old history folded into a rolling summary in the background
+        self.summarizer = summarizer or ConversationSummarizer(self.providers, self.scheduler)
+        # Memory notes and activity timestamps are written after the reply
+        self.writer = writer or WriteBehindWriter(on_notes=self._notes_saved)
+        # Per-stage latency histograms and sampled turn logs
+        self.tracer = tracer or Tracer()
+    
+    async def warm_up(self) -> None:
+        """
+        Prepare the configured provider, e.g. load local model into memory,
+        so the first turn does not pay for it.
+        """
+        cfg = config_service.get_runtime_config()
+        try:
+            await self.providers.get(cfg.mode).warm_up(cfg)
+            logger.info("Model ready", extra={"model": cfg.model_name})
+        except Exception as e:
+            logger.warning("Model warm up failed", extra={"model": cfg.model_name, "error": repr(e)})
+    
+    async def aclose(self) -> None:
+        """Drain pending writes, stop the summary worker and close provider connection pools."""
+        await self.writer.aclose()
+        await self.summarizer.aclose()
+        await self.providers.aclose()
+        await self.memory.aclose()
+    
+    async def generate_message(self, message: str) -> LLMResult:
+        cfg: ConfigSnapshot = config_service.get_runtime_config()
+        async with self.scheduler.slot():
+            return await self.providers.get(cfg.mode).chat([{"role": "user", "content": message}], cfg, json_format=False)
                 
     
 
-    def generate_response(self,message_text: str,conversation_id: int, session: Session) -> Tuple[Message,float]:
+    async def generate_response(self,message_text: str,conversation_id: int, session: AsyncSession, idempotency_key: Optional[str] = None, conversation: Optional[Conversation] = None) -> Tuple[Message,float]:
         """
         Generate character response with full context system
         
+        Database work and the LLM call are both awaited (aiosqlite and the async
+        provider client), so the event loop stays free for other requests.
+        Turns of one conversation run one after another, see TurnCoordinator.
+        The LLM call waits for a GenerationScheduler slot and raises
+        GenerationRejected when the scheduler is saturated.
+        
         :param message_text: User's new message
         :param conversation_id: ID of current conversation
-        :param session: SQLModel session for DB operations
+        :param session: Async SQLModel session for DB operations
+        :param idempotency_key: Optional client key, a retry with the same key gets the same turn
+        :param conversation: Conversation already loaded by the caller with conversation_participants(), saves a query
         :return: (Message object with AI response, generation_time_seconds)
         """
+        shared = self.turns.existing(conversation_id, idempotency_key, message_text)
+        if shared is not None:
+            ai_msg, _, generation_time = await asyncio.shield(shared)
+            return ai_msg, generation_time
         
-        # === PREPARE PROMPT ===
+        with self.tracer.trace("turn", conversation_id=conversation_id, streamed=False) as trace:
+            queued_at = time.perf_counter()
+            async with self.turns.exclusive(conversation_id, idempotency_key, message_text) as turn:
+                trace.record("turn_wait", (time.perf_counter() - queued_at) * 1000)
+                
+                # === PREPARE PROMPT ===
+                
+                conversation, character, cfg, model_messages = await self._prepare_context(message_text, conversation_id, session, conversation, trace)
+                
+                # ==== Generate response ====
+                
+                queued_at = time.perf_counter()
+                async with self.scheduler.slot(conversation_id):
+                    trace.record("queue_wait", (time.perf_counter() - queued_at) * 1000)
+                    start_time = time.time()
+                    with trace.span("llm"):
+                        result = await self.providers.get(cfg.mode).chat(model_messages, cfg, self._response_format(character))
+                    generation_time = time.time() - start_time
+                trace.record_llm(result)
+                observe_generation(result.eval_count, result.eval_duration)
+                
+                ai_msg, parsed = await self._finish_turn(session, conversation, character, cfg, message_text, result.content, result.eval_count, generation_time, trace)
+                turn.set_result((ai_msg, parsed, generation_time))
         
-        conversation = session.get(Conversation,conversation_id)
-        if not conversation:
-            raise ValueError(f"Conversation with ID {conversation_id} not found")
+        return ai_msg,generation_time
+    
+    async def stream_response(self, message_text: str, conversation_id: int, session: AsyncSession, idempotency_key: Optional[str] = None, conversation: Optional[Conversation] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate character response token by token.
         
-        cfg = config_service.load_from_db(session)
-        character = conversation.character
-        user = conversation.user
+        The "response" field of the JSON envelope is decoded while the model
+        writes it. The turn is persisted exactly like in generate_response
+        once the generation is finished. A retry of a turn that is already
+        running gets no tokens, only the "done" event once it finishes.
         
-        if character.id is None or user is None:
-            raise ValueError("Character or user not found")
+        :param message_text: User's new message
+        :param conversation_id: ID of current conversation
+        :param session: Async SQLModel session for DB operations
+        :param idempotency_key: Optional client key, a retry with the same key gets the same turn
+        :param conversation: Conversation already loaded by the caller with conversation_participants(), saves a query
+        :return: async iterator of ("token", text) events, then one ("done", (Message, parsed_result))
+        """
+        shared = self.turns.existing(conversation_id, idempotency_key, message_text)
+        if shared is not None:
+            ai_msg, parsed, _ = await asyncio.shield(shared)
+            yield "done", (ai_msg, parsed)
+            return
         
+        with self.tracer.trace("turn", conversation_id=conversation_id, streamed=True) as trace:
+            queued_at = time.perf_counter()
+            async with self.turns.exclusive(conversation_id, idempotency_key, message_text) as turn:
+                trace.record("turn_wait", (time.perf_counter() - queued_at) * 1000)
+                conversation, character, cfg, model_messages = await self._prepare_context(message_text, conversation_id, session, conversation, trace)
+                provider = self.providers.get(cfg.mode)
+                
+                streamer = JsonFieldStreamer("response")
+                raw_parts: List[str] = []
+                token_count: Optional[int] = None
+                
+                queued_at = time.perf_counter()
+                async with self.scheduler.slot(conversation_id):
+                    trace.record("queue_wait", (time.perf_counter() - queued_at) * 1000)
+                    start_time = time.time()
+                    with trace.span("llm"):
+                        async for chunk in provider.stream_chat(model_messages, cfg, self._response_format(character)):
+                            if chunk.content:
+                                if not raw_parts:
+                                    trace.record("first_token", (time.time() - start_time) * 1000)
+                                raw_parts.append(chunk.content)
+                                text = streamer.feed(chunk.content)
+                                if text:
+                                    yield "token", text
+                            if chunk.done and chunk.result:
+                                token_count = chunk.result.eval_count
+                                trace.record_llm(chunk.result)
+                                observe_generation(chunk.result.eval_count, chunk.result.eval_duration)
+                    generation_time = time.time() - start_time
+                
+                raw_response = "".join(raw_parts)
+                if not raw_response:
+                    raise ValueError("AI response is empty")
+                
+                ai_msg, parsed = await self._finish_turn(session, conversation, character, cfg, message_text, raw_response, token_count, generation_time, trace)
+                turn.set_result((ai_msg, parsed, generation_time))
         
-        #Download message history
-        recent_messages = session.exec(select(Message).where(Message.conversation_id == conversation_id).order_by(desc(Message.created_at)).limit(cfg.conversation_memory_length)).all()
-        recent_messages = list(reversed(recent_messages))
+        yield "done", (ai_msg, parsed)
+    
+    @staticmethod
+    def _response_format(character: Character) -> Dict[str, Any]:
+        """JSON Schema of the reply, so the model can only pick the character's emotions."""
+        return response_schema(tuple(character.enabled_emotion_values))
+    
+    @staticmethod
+    def _parse_response(raw_response: str, cfg: ConfigSnapshot, character: Character) -> Dict[str, Any]:
+        """
+        Parse JSON envelope returned by the model.
         
-        #Download important memory notes
-        memory_notes = session.exec(select(MemoryNote).where(MemoryNote.conversation_id == conversation_id).order_by(desc(MemoryNote.importance_score)).limit(max(1, cfg.conversation_memory_length // 2))).all()
-        memory_notes = list(reversed(memory_notes))        
+        Broken JSON is salvaged by parse_turn_response rather than discarded,
+        the generation is never repeated.
         
-        #Build prompt
-        system_prompt = PromptBuilder.build_system_prompt(character,user,conversation,recent_messages,memory_notes,cfg.conversation_memory_length)
+        :param raw_response: Raw model output
+        :param cfg: Runtime config
+        :param character: Character that answered
+        :return: dict with response text, emotions, memory note fields and the parse outcome
+        """
+        result, outcome = parse_turn_response(raw_response)
+        parsed: Dict[str, Any] = result.model_dump()
+        parsed["parse_outcome"] = outcome
         
-        # Prepare messages for LLM
-        model_messages = [{"role": "system", "content": system_prompt}]
+        if parsed["ai_emotion_confidence"] < cfg.emotion_confidence_threshold:
+            parsed["ai_emotion"] = Emotion.NEUTRAL.value
         
-        # Add history messages
-        for msg in recent_messages:
-            model_messages.append({"role": msg.role, "content": msg.content})
-            
-        model_messages.append({"role": "user", "content": message_text})
+        if parsed["ai_emotion"] not in [e.value for e in character.enabled_emotions]:
+            parsed["ai_emotion"] = character.default_emotion
+        
+        # Stored on the message, which only accepts known emotions
+        if parsed["user_emotion"] not in [e.value for e in Emotion]:
+            parsed["user_emotion"] = None
+        
+        return parsed
+    
+    async def _finish_turn(self, session: AsyncSession, conversation: Conversation, character: Character, cfg: ConfigSnapshot, message_text: str, raw_response: str, token_count: Optional[int], generation_time: float, trace: Optional[Trace] = None) -> Tuple[Message, Dict[str, Any]]:
+        """
+        Parse model output and persist the turn.
         
-        # ==== Generate response ====
+        :return: (saved AI message, parsed result)
+        """
+        trace = trace or Trace("turn")
+        with trace.span("parse"):
+            parsed = self._parse_response(raw_response, cfg, character)
         
-        start_time = time.time()
-        ai_emotion: str = Emotion.NEUTRAL.value
-        memory_note_content: Optional[str] = None
-        token_count: Optional[int] = None
+        # ==== SAVE RESPONSE =====
+        user_msg = Message(conversation_id=conversation.id, role="user", content=message_text,emotion=parsed["user_emotion"],emotion_confidence=parsed["user_emotion_confidence"],emotion_intensity=parsed["user_emotion_intensity"])
+        ai_msg = Message(conversation_id=conversation.id, role="assistant",emotion=parsed["ai_emotion"], content=parsed["response"],emotion_intensity=parsed["ai_emotion_intensity"],emotion_confidence=parsed["ai_emotion_confidence"],generation_time_ms=int(generation_time*1000),token_count=token_count)
         
-        ai_emotion: str = Emotion.NEUTRAL.value
-        ai_emotion_confidence: float = 0.5
-        ai_emotion_intensity: float = 0.5
-        user_emotion: Optional[str] = None
-        user_emotion_confidence: float = 0.0  # Domyślna pewność
-        user_emotion_intensity: float = 0.5
-        memory_note_content: Optional[str] = None
-        memory_note_importance: float = 0.5
-        token_count: Optional[int] = None
+        with trace.span("commit"):
+            await self._save_turn(session, conversation, character, user_msg, ai_msg, parsed["memory_note"], parsed["memory_note_importance"], cfg.model_name)
+        trace.set(emotion=parsed["ai_emotion"], memory_note_importance=parsed["memory_note_importance"], parse=parsed["parse_outcome"])
+        
+        return ai_msg, parsed
     
-        try:
-            if cfg.mode == "local":
-                response: ChatResponse = chat(model=cfg.model_name, messages=model_messages,format="json",options={"temperature": cfg.temperature,"max_tokens": cfg.max_tokens,"gpu_layers": cfg.gpu_layers})
-                
-                if not response.message or not response.message.content:
-                    raise ValueError("AI response is empty")
-                
-                raw_response: str = response.message.content
-                token_count = response.eval_count
-                
-            elif cfg.mode == "remote":
-                # TODO: Implement remote mode
-                raise NotImplementedError("Remote mode not implemented yet")        
-            else:
-                raise ValueError(f"Invalid AI mode: {cfg.mode}")
-
-            result = json.loads(raw_response)
-            print("======\nAI response: \n======", result)
-            ai_response_text = result.get("response")
-            
-            ai_emotion = result.get("emotion")
-            ai_emotion_confidence = result.get("ai_emotion_confidence", 0.5)
-            ai_emotion_intensity = result.get("ai_emotion_intensity", 0.5)
-            
-            user_emotion = result.get("user_emotion")
-            user_emotion_confidence = result.get("user_emotion_confidence", 0.5)
-            user_emotion_intensity = result.get("user_emotion_intensity", 0.5)
+    async def _prepare_context(self, message_text: str, conversation_id: int, session: AsyncSession, conversation: Optional[Conversation] = None, trace: Optional[Trace] = None) -> Tuple[Conversation, Character, ConfigSnapshot, List[Dict[str, str]]]:
+        """
+        Load conversation, config and history, and build messages for the LLM.
+        
+        At most two statements: conversation joined with character and user
+        (skipped if the caller passed it loaded), and the context on a cache miss.
+        History and memory notes are packed into the token budget left after
+        reserving Config.max_tokens for the reply.
+        Lazy loads cannot run under async, so everything is loaded explicitly.
+        """
+        trace = trace or Trace("turn")
+        with trace.span("context_load"):
+            if conversation is None or {"character", "user"} & inspect(conversation).unloaded:
+                conversation = (await session.exec(
+                    select(Conversation).where(Conversation.id == conversation_id).options(*conversation_participants())
+                )).first()
+            if not conversation:
+                raise ValueError(f"Conversation with ID {conversation_id} not found")
             
-            memory_note_content = result.get("memory_note")
-            memory_note_importance = result.get("memory_note_importance", 0.5)
+            cfg = config_service.get_runtime_config()
+            character = conversation.character
+            user = conversation.user
             
-            if ai_emotion_confidence < cfg.emotion_confidence_threshold:
-                ai_emotion = Emotion.NEUTRAL.value
+            if character.id is None or user is None:
+                raise ValueError("Character or user not found")
             
-            if ai_emotion not in [e.value for e in character.enabled_emotions]:
-                ai_emotion = character.default_emotion
+            # Candidate messages and top memory notes, from cache - DB only on a miss
+            recent_messages, memory_notes = await session.run_sync(context_cache.get_or_load, conversation_id, CONTEXT_MAX_MESSAGES, CONTEXT_MAX_MEMORY_NOTES)
             
-        except json.JSONDecodeError:
-            ai_response_text = "I had trouble formatting my response correctly."
-        except Exception as e:
-            print(f"Failed to generate response: {e}")
-            raise e
+            # Summarized messages are in conversation.summary, not sent again
+            recent_messages = [m for m in recent_messages if m.id > conversation.summary_until_id]
         
-        # ==== SAVE RESPONSE =====
-        generation_time = time.time() - start_time
-
-        # Save user message
-        user_msg = Message(conversation_id=conversation_id, role="user", content=message_text,emotion=user_emotion,emotion_confidence=user_emotion_confidence,emotion_intensity=user_emotion_intensity)
-        session.add(user_msg)
-        
-        # Save AI response
-        ai_msg = Message(conversation_id=conversation_id, role="assistant",emotion=ai_emotion, content=ai_response_text,emotion_intensity=ai_emotion_intensity,emotion_confidence=ai_emotion_confidence,generation_time_ms=int(generation_time*1000),token_count=token_count)
-        session.add(ai_msg)
-        session.flush()
+        # Prefer notes relevant to the new message, most important ones are the fallback
+        memory_notes = list(reversed(memory_notes))
+        with trace.span("memory_retrieval"):
+            try:
+                memory_notes = await self.memory.retrieve(session, conversation_id, message_text, CONTEXT_MAX_MEMORY_NOTES)
+            except Exception as e:
+                logger.warning("Memory retrieval failed, using most important notes", extra={"conversation_id": conversation_id, "error": repr(e)})
         
-        # Save memory note
-        # TODO: Create better memory note logic for different emotions
-        if memory_note_content is not None:
-            if memory_note_importance > 0.85:
-                memory_note = MemoryNote(conversation_id=conversation_id,character_id=character.id,importance_score=memory_note_importance, content=memory_note_content,source_message_id=ai_msg.id)
-                session.add(memory_note)
+        with trace.span("prompt_build"):
+            # Fill the token budget: fixed parts, then notes best first, then history newest first
+            include_recent = self.prompt_mode == "summary"
+            fixed_texts = [
+                PromptBuilder.compile_static_prompt(character, user, conversation),
+                PromptBuilder.build_context(conversation, recent_messages if include_recent else [], [], cfg.conversation_memory_length, include_recent=include_recent),
+                message_text,
+            ]
+            packed = self.packer.pack(self.packer.budget(cfg.max_tokens), fixed_texts, memory_notes, recent_messages)
             
-        conversation.message_count+=2
-        conversation.last_activity = datetime.now(timezone.utc)
-        character.last_interaction_at = datetime.now(timezone.utc)
-        session.commit()
+            #Build prompt and messages for LLM
+            model_messages = PromptBuilder.build_messages(character,user,conversation,packed.messages,list(reversed(packed.memory_notes)),message_text,cfg.conversation_memory_length,self.prompt_mode)
+        trace.set(context_tokens=packed.total_tokens, history_messages=len(packed.messages), memory_notes=len(packed.memory_notes))
         
-        # PRINT EVERYTHING
-        print("=== AI RESPONSE ===")
-        print(f"User Message: {message_text}")
-        print(f"AI Response: {ai_response_text}")
-        print(f"AI Emotion: {ai_emotion}")
-        print(f"Memory Note: {memory_note_content}")
-        print(f"Memory Note Importance: {memory_note_importance}")
-        print(f"Generation Time: {generation_time} seconds")
+        return conversation, character, cfg, model_messages
+    
+    async def _save_turn(self, session: AsyncSession, conversation: Conversation, character: Character, user_msg: Message, ai_msg: Message, memory_note_content: Optional[str], memory_note_importance: float, model_name: str = "unknown") -> None:
+        """
+        Commit user and AI message, hand the rest to the write-behind writer.
         
+        Only the messages and message_count (history pagination depends on
+        it) are on the response path. The memory note, activity timestamps
+        and analytics rollups are committed in the background, batched with other turns - see
+        WriteBehindWriter for what a crash can lose.
+        """
+        session.add(user_msg)
+        session.add(ai_msg)
+        # Increment in SQL - another worker may have saved a turn since the row was loaded
+        conversation.message_count = Conversation.message_count + 2
+        await session.commit()
         
-        return ai_msg,generation_time
+        # Only committed rows go to the context cache, notes follow when the writer commits them
+        conversation_id = conversation.id
+        context_cache.append_turn(conversation_id, [MessageRecord.from_message(user_msg), MessageRecord.from_message(ai_msg)])
+        at = datetime.now(timezone.utc)
+        # TODO: Create better memory note logic for different emotions
+        await self.writer.submit(TurnEffects(
+            conversation_id=conversation_id,
+            character_id=character.id,
+            source_message_id=ai_msg.id,
+            at=at,
+            memory_note_content=memory_note_content,
+            memory_note_importance=memory_note_importance,
+            stats=TurnStats(
+                character_id=character.id,
+                model_name=model_name,
+                at=at,
+                generation_time_ms=ai_msg.generation_time_ms or 0,
+                token_count=ai_msg.token_count,
+                ai_emotion=ai_msg.emotion,
+                ai_emotion_intensity=ai_msg.emotion_intensity,
+                user_emotion=user_msg.emotion,
+                user_emotion_intensity=user_msg.emotion_intensity,
+            ),
+        ), session)
+        # Not conversation.id - a failed inline write rolls back and expires the instance
+        self.summarizer.schedule(conversation_id)
+    
+    async def _notes_saved(self, notes: List[MemoryNote]) -> None:
+        """Add notes committed by the writer to the context cache and memory index."""
+        for note in notes:
+            record = MemoryRecord.from_note(note)
+            context_cache.append_turn(note.conversation_id, [], record)
+            await self.memory.add_note(note.conversation_id, record, note.created_at)
 
 
 
 class PromptBuilder:
+    """
+    Builds system prompt for a character.
+    
+    The prompt has two parts:
+        static  - identity, user profile, behavior rules, emotions and output format.
+                  Compiled once per (character, user, conversation settings) version and cached.
+        context - "CURRENT CONTEXT" tail with recent events and memory notes, built every turn.
+    
+    Static part is byte-stable between turns, so the model can reuse its prompt prefix cache.
+    In "stable_prefix" mode the context goes to a separate message after the history, so
+    the cached prefix also covers the history (until the window slides).
+    """
+    
+    _static_cache: LRUCache[Tuple, str] = LRUCache(maxsize=256)
+    
     @staticmethod
     def build_system_prompt(character: Character,user: User, conversation: Conversation, recent_messages: List[Message], memory_notes: List[MemoryNote],memory_length=5) -> str:
+        return PromptBuilder.compile_static_prompt(character, user, conversation) + PromptBuilder.build_context(conversation, recent_messages, memory_notes, memory_length)
+    
+    @staticmethod
+    def build_messages(character: Character, user: User, conversation: Conversation, recent_messages: List[Message], memory_notes: List[MemoryNote], message_text: str, memory_length=5, mode: str = "stable_prefix") -> List[Dict[str, str]]:
+        """
+        Build chat messages for the LLM.
         
-        emotions = ", ".join([f'"{e.value}"' for e in character.enabled_emotions])
+        :param mode: "stable_prefix" or "summary", see app.core.config.PROMPT_MODE
+        :return: list of {"role", "content"} dicts, last one is the new user message
+        """
+        history = [{"role": msg.role, "content": msg.content} for msg in recent_messages]
         
-        recent_summary = ""
-        if recent_messages:
-            recent_summary = "\n".join([f"- {msg.role}: {msg.content[:100]}... (emotion: {msg.full_emotion})" for msg in recent_messages[-memory_length:]])
-            
-        memory_context = ""
-        if memory_notes:
-            memory_context = "\n".join([
-                f"- {note.content} (importance: {note.importance_score:.2f})"
-                for note in memory_notes
-            ])
-            
+        if mode == "summary":
+            system_prompt = PromptBuilder.build_system_prompt(character,user,conversation,recent_messages,memory_notes,memory_length)
+            return [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": message_text}]
+        
+        if mode != "stable_prefix":
+            raise ValueError(f"Invalid prompt mode: {mode}")
+        
+        # History already goes as chat messages - no need to repeat it in the summary
+        static_prompt = PromptBuilder.compile_static_prompt(character, user, conversation)
+        context = PromptBuilder.build_context(conversation, recent_messages, memory_notes, memory_length, include_recent=False)
+        return [
+            {"role": "system", "content": static_prompt},
+            *history,
+            {"role": "system", "content": context},
+            {"role": "user", "content": message_text},
+        ]
+    
+    @staticmethod
+    def static_prompt_key(character: Character, user: User, conversation: Conversation) -> Tuple:
+        """Cache key - changes whenever anything used by the static part can change."""
+        return (character.id, character.updated_at, user.id, user.updated_at, conversation.user_intent)
+    
+    @classmethod
+    def compile_static_prompt(cls, character: Character, user: User, conversation: Conversation) -> str:
+        """
+        Get static part of the system prompt, compiling it on cache miss.
+        
+        :return: static prompt text, ends right before the "CURRENT CONTEXT" section
+        """
+        key = cls.static_prompt_key(character, user, conversation)
+        prompt = cls._static_cache.get(key)
+        if prompt is None:
+            prompt = cls._render_static_prompt(character, user, conversation)
+            cls._static_cache.put(key, prompt)
+        return prompt
+    
+    @staticmethod
+    def _render_static_prompt(character: Character, user: User, conversation: Conversation) -> str:
+        
+        # Keep configured order, so the text is the same in every process
+        emotions = ", ".join([f'"{e}"' for e in character.enabled_emotion_values])
         phrases = ", ".join([f'"{p}"' for p in character.favorite_phrases])
+        profile = user.profile
         
         return f"""You are {character.name}, {character.description}.
 
@@ -192,8 +438,8 @@ class PromptBuilder:
 **USER PROFILE:**
 - User name: {user.name}
 - User gender: {user.gender or "Unknown"}
-- User preferences: {", ".join(user.topics_user_likes) or "Unknown"}
-- User dislikes: {", ".join(user.topics_user_dislikes) or "Unknown"}
+- User preferences: {", ".join(profile.get("likes", [])) or "Unknown"}
+- User dislikes: {", ".join(profile.get("dislikes", [])) or "Unknown"}
 - Interaction goal: {conversation.user_intent}
 
 **BEHAVIOR RULES:**
@@ -225,11 +471,35 @@ Intensity: 0.0-0.3 = slightly_, 0.4-0.6 = "", 0.7-0.9 = very_, 1.0 = extremely_
   "memory_note_importance": 0.0-1.0
 }}
 
-**CURRENT CONTEXT:**
-Recent events:
+"""
+    
+    @staticmethod
+    def build_context(conversation: Conversation, recent_messages: List[Message], memory_notes: List[MemoryNote], memory_length=5, include_recent: bool = True) -> str:
+        """Build dynamic "CURRENT CONTEXT" tail of the system prompt."""
+        
+        recent_summary = ""
+        if recent_messages:
+            recent_summary = "\n".join([f"- {msg.role}: {msg.content[:100]}... (emotion: {msg.full_emotion})" for msg in recent_messages[-memory_length:]])
+            
+        memory_context = ""
+        if memory_notes:
+            memory_context = "\n".join([
+                f"- {note.content} (importance: {note.importance_score:.2f})"
+                for note in memory_notes
+            ])
+        
+        story_so_far = f"""Story so far:
+{conversation.summary}
+
+""" if conversation.summary else ""
+        
+        recent_events = f"""Recent events:
 {recent_summary or "No recent history"}
 
-Important memory notes:
+""" if include_recent else ""
+        
+        return f"""**CURRENT CONTEXT:**
+{story_so_far}{recent_events}Important memory notes:
 {memory_context or "No memory notes"}
 
 World state: {conversation.world_state or "Default state"}
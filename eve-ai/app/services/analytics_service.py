@@ -0,0 +1,270 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Connection, func, text
+from sqlalchemy.dialects.sqlite import Insert, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import EmotionRollup, GenerationRollup, LatencyRollup
+
+# Upper bounds of generation time buckets. Index len(...) counts slower ones.
+# Changing them needs a rollup rebuild - the migration backfill uses the same values.
+ROLLUP_LATENCY_BUCKETS_MS: Tuple[int, ...] = (250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000, 120000)
+
+
+def hour_of(at: datetime) -> datetime:
+    """UTC hour start, the rollup key. Naive datetimes are taken as UTC."""
+    at = at.replace(tzinfo=timezone.utc) if at.tzinfo is None else at.astimezone(timezone.utc)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def latency_bucket(ms: int) -> int:
+    return bisect_left(ROLLUP_LATENCY_BUCKETS_MS, ms)
+
+
+def percentile_from_buckets(counts: Dict[int, int], q: float) -> Optional[float]:
+    """
+    Estimate a percentile from bucket counts, interpolating inside the bucket.
+    Values past the last bound are reported as the last bound.
+    """
+    total = sum(counts.values())
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in sorted(counts):
+        count = counts[bucket]
+        if count and seen + count >= rank:
+            if bucket >= len(ROLLUP_LATENCY_BUCKETS_MS):
+                return float(ROLLUP_LATENCY_BUCKETS_MS[-1])
+            lower = ROLLUP_LATENCY_BUCKETS_MS[bucket - 1] if bucket else 0
+            upper = ROLLUP_LATENCY_BUCKETS_MS[bucket]
+            return round(lower + (upper - lower) * (rank - seen) / count, 1)
+        seen += count
+    return float(ROLLUP_LATENCY_BUCKETS_MS[-1])
+
+
+@dataclass
+class TurnStats:
+    """What one turn adds to the rollups."""
+    character_id: int
+    model_name: str
+    at: datetime
+    generation_time_ms: int
+    token_count: Optional[int] = None
+    ai_emotion: Optional[str] = None
+    ai_emotion_intensity: float = 0.5
+    user_emotion: Optional[str] = None
+    user_emotion_intensity: float = 0.5
+
+
+# =========== WRITING ===========
+async def record_turns(session: AsyncSession, turns: Sequence[TurnStats]) -> None:
+    """Add turns to the hourly rollups. Does not commit."""
+    for statement, rows in rollup_statements(turns):
+        await session.exec(statement, params=rows)
+
+
+def rollup_statements(turns: Sequence[TurnStats]) -> List[Tuple[Insert, List[Dict[str, Any]]]]:
+    """
+    Upserts adding turns to the rollups, with rows summed per key in Python
+    first. Shared by the write-behind writer and bulk loaders.
+
+    returns:
+        (statement, rows) pairs, to execute as executemany
+    """
+    generations: Dict[Tuple, List[int]] = {}
+    latencies: Dict[Tuple, int] = {}
+    emotions: Dict[Tuple, List[float]] = {}
+    for turn in turns:
+        key = (hour_of(turn.at), turn.character_id, turn.model_name)
+        row = generations.setdefault(key, [0, 0, 0, 0])
+        row[0] += 1
+        row[1] += turn.generation_time_ms
+        if turn.token_count:
+            row[2] += turn.token_count
+            row[3] += turn.generation_time_ms
+
+        bucket_key = key + (latency_bucket(turn.generation_time_ms),)
+        latencies[bucket_key] = latencies.get(bucket_key, 0) + 1
+
+        for role, emotion, intensity in (("assistant", turn.ai_emotion, turn.ai_emotion_intensity), ("user", turn.user_emotion, turn.user_emotion_intensity)):
+            if emotion:
+                counts = emotions.setdefault((key[0], turn.character_id, role, emotion), [0, 0.0])
+                counts[0] += 1
+                counts[1] += intensity
+
+    statements = [
+        (GenerationRollup, ("hour", "character_id", "model_name"), [
+            {"hour": h, "character_id": c, "model_name": m, "messages": n, "generation_ms_sum": ms, "tokens_sum": t, "token_generation_ms_sum": tms}
+            for (h, c, m), (n, ms, t, tms) in generations.items()
+        ]),
+        (LatencyRollup, ("hour", "character_id", "model_name", "bucket"), [
+            {"hour": h, "character_id": c, "model_name": m, "bucket": b, "messages": n}
+            for (h, c, m, b), n in latencies.items()
+        ]),
+        (EmotionRollup, ("hour", "character_id", "role", "emotion"), [
+            {"hour": h, "character_id": c, "role": r, "emotion": e, "messages": n, "intensity_sum": i}
+            for (h, c, r, e), (n, i) in emotions.items()
+        ]),
+    ]
+    return [(_upsert(model, keys, tuple(rows[0])), rows) for model, keys, rows in statements if rows]
+
+
+def _upsert(model, keys: Sequence[str], columns: Sequence[str]) -> Insert:
+    """
+    INSERT ... ON CONFLICT DO UPDATE adding the value columns to the existing
+    row. One-row statement run as executemany - compiled once and cached,
+    where a multi-row VALUES compiles anew for every row count.
+    """
+    table = model.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + statement.excluded[column] for column in columns if column not in keys},
+    )
+
+
+def backfill_messages(conn: Connection, after_message_id: int) -> None:
+    """
+    Add stored messages with IDs above after_message_id to the rollups, for
+    rows that did not go through a turn (bulk imports). Does not commit.
+
+    The model is not stored on messages - they count as model "unknown",
+    like the migration backfill.
+    """
+    hour = "strftime('%Y-%m-%d %H:00:00.000000', m.created_at)"
+    bucket = "CASE " + " ".join(
+        f"WHEN COALESCE(m.generation_time_ms, 0) <= {bound} THEN {index}" for index, bound in enumerate(ROLLUP_LATENCY_BUCKETS_MS)
+    ) + f" ELSE {len(ROLLUP_LATENCY_BUCKETS_MS)} END"
+    source = "FROM message m JOIN conversation c ON c.id = m.conversation_id WHERE m.id > :after_id"
+    for statement in (
+        f"""INSERT INTO generation_rollup (hour, character_id, model_name, messages, generation_ms_sum, tokens_sum, token_generation_ms_sum)
+            SELECT {hour}, c.character_id, 'unknown', COUNT(*), COALESCE(SUM(m.generation_time_ms), 0),
+                   COALESCE(SUM(CASE WHEN m.token_count > 0 THEN m.token_count END), 0),
+                   COALESCE(SUM(CASE WHEN m.token_count > 0 THEN m.generation_time_ms END), 0)
+            {source} AND m.role = 'assistant' GROUP BY 1, 2
+            ON CONFLICT (hour, character_id, model_name) DO UPDATE SET
+                messages = messages + excluded.messages,
+                generation_ms_sum = generation_ms_sum + excluded.generation_ms_sum,
+                tokens_sum = tokens_sum + excluded.tokens_sum,
+                token_generation_ms_sum = token_generation_ms_sum + excluded.token_generation_ms_sum""",
+        f"""INSERT INTO latency_rollup (hour, character_id, model_name, bucket, messages)
+            SELECT {hour}, c.character_id, 'unknown', {bucket}, COUNT(*)
+            {source} AND m.role = 'assistant' GROUP BY 1, 2, 4
+            ON CONFLICT (hour, character_id, model_name, bucket) DO UPDATE SET messages = messages + excluded.messages""",
+        f"""INSERT INTO emotion_rollup (hour, character_id, role, emotion, messages, intensity_sum)
+            SELECT {hour}, c.character_id, m.role, m.emotion, COUNT(*), SUM(m.emotion_intensity)
+            {source} AND m.emotion IS NOT NULL AND m.role IN ('user', 'assistant') GROUP BY 1, 2, 3, 4
+            ON CONFLICT (hour, character_id, role, emotion) DO UPDATE SET
+                messages = messages + excluded.messages,
+                intensity_sum = intensity_sum + excluded.intensity_sum""",
+    ):
+        conn.execute(text(statement), {"after_id": after_message_id})
+
+
+# =========== READING ===========
+def default_range(since: Optional[datetime], until: Optional[datetime], days: int = 7) -> Tuple[datetime, datetime]:
+    """Range as rollup hours, the last `days` days by default."""
+    until = hour_of(until or datetime.now(timezone.utc))
+    since = hour_of(since) if since else until - timedelta(days=days)
+    return since, until
+
+
+async def latency_stats(session: AsyncSession, since: datetime, until: datetime, group_by: str = "character", character_id: Optional[int] = None, model_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Generation time percentiles and tokens/s per character or model.
+
+    tokens/s is tokens over the whole generation time, prompt reading included.
+
+    args:
+        since, until: rollup hours, both inclusive
+        group_by: "character" or "model"
+    """
+    if group_by not in ("character", "model"):
+        raise ValueError(f"Invalid group_by: {group_by}")
+    group_col = "character_id" if group_by == "character" else "model_name"
+
+    def scoped(model, statement):
+        statement = statement.where(model.hour >= since, model.hour <= until)
+        if character_id is not None:
+            statement = statement.where(model.character_id == character_id)
+        if model_name is not None:
+            statement = statement.where(model.model_name == model_name)
+        return statement
+
+    group = getattr(GenerationRollup, group_col)
+    totals = (await session.exec(scoped(GenerationRollup, select(
+        group,
+        func.sum(GenerationRollup.messages),
+        func.sum(GenerationRollup.generation_ms_sum),
+        func.sum(GenerationRollup.tokens_sum),
+        func.sum(GenerationRollup.token_generation_ms_sum),
+    )).group_by(group))).all()
+
+    bucket_group = getattr(LatencyRollup, group_col)
+    buckets: Dict[Any, Dict[int, int]] = {}
+    for key, bucket, count in (await session.exec(scoped(LatencyRollup, select(
+        bucket_group, LatencyRollup.bucket, func.sum(LatencyRollup.messages)
+    )).group_by(bucket_group, LatencyRollup.bucket))).all():
+        buckets.setdefault(key, {})[bucket] = count
+
+    results = []
+    for key, messages, generation_ms, tokens, token_ms in totals:
+        counts = buckets.get(key, {})
+        results.append({
+            group_col: key,
+            "messages": messages,
+            "avg_ms": round(generation_ms / messages, 1) if messages else None,
+            "p50_ms": percentile_from_buckets(counts, 0.5),
+            "p95_ms": percentile_from_buckets(counts, 0.95),
+            "p99_ms": percentile_from_buckets(counts, 0.99),
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / (token_ms / 1000), 2) if token_ms else None,
+        })
+    return results
+
+
+async def emotion_distribution(session: AsyncSession, since: datetime, until: datetime, role: str = "assistant", character_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Emotion counts, shares and average intensity, most frequent first."""
+    statement = (
+        select(EmotionRollup.emotion, func.sum(EmotionRollup.messages), func.sum(EmotionRollup.intensity_sum))
+        .where(EmotionRollup.hour >= since, EmotionRollup.hour <= until, EmotionRollup.role == role)
+        .group_by(EmotionRollup.emotion)
+    )
+    if character_id is not None:
+        statement = statement.where(EmotionRollup.character_id == character_id)
+    rows = (await session.exec(statement)).all()
+    total = sum(count for _, count, _ in rows)
+    return sorted(
+        (
+            {"emotion": emotion, "messages": count, "share": round(count / total, 4), "avg_intensity": round(intensity / count, 3)}
+            for emotion, count, intensity in rows
+        ),
+        key=lambda row: row["messages"],
+        reverse=True,
+    )
+
+
+async def activity(session: AsyncSession, since: datetime, until: datetime, interval: str = "hour", character_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Generated messages per hour or day, oldest first. Periods without messages are left out."""
+    if interval == "hour":
+        period = GenerationRollup.hour
+    elif interval == "day":
+        period = func.date(GenerationRollup.hour)
+    else:
+        raise ValueError(f"Invalid interval: {interval}")
+
+    statement = (
+        select(period, func.sum(GenerationRollup.messages), func.sum(GenerationRollup.generation_ms_sum))
+        .where(GenerationRollup.hour >= since, GenerationRollup.hour <= until)
+        .group_by(period)
+        .order_by(period)
+    )
+    if character_id is not None:
+        statement = statement.where(GenerationRollup.character_id == character_id)
+    return [
+        {"period": key, "messages": messages, "avg_ms": round(generation_ms / messages, 1) if messages else None}
+        for key, messages, generation_ms in (await session.exec(statement)).all()
+    ]
@@ -1,92 +1,176 @@
+from datetime import datetime, timezone
+from pydantic import BaseModel, ConfigDict
 from sqlmodel import Session, select
-from app.models.schemas import Config
-from typing import Optional
+from app.models.schemas import AIMode, Config
+from app.core.log import get_logger
+from typing import Any, Dict, Optional
+
+logger = get_logger("config")
+
+# Values used for first start and for config reset
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "mode": AIMode.LOCAL.value,
+    "model_name": "gemma3:latest",
+    "gpu_layers": 60,
+    "temperature": 0.7,
+    "max_tokens": 4096,
+    "conversation_memory_length": 10,
+    "emotion_confidence_threshold": 0.6,
+}
+
+
+class ConfigSnapshot(BaseModel):
+    """
+    Immutable copy of the Config row.
+
+    Detached from any session, so it can be shared between requests and
+    read on the hot path without touching the database.
+    """
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: int
+    mode: str
+    model_name: str
+    gpu_layers: int
+    temperature: float
+    max_tokens: int
+    openai_api_key: Optional[str] = None
+    anthropic_api_key: Optional[str] = None
+    conversation_memory_length: int
+    emotion_confidence_threshold: float
+    created_at: datetime
+    updated_at: datetime
+
+    # Bumped every time a new snapshot is published
+    version: int = 0
+
 
 class ConfigService:
-    """Central service for config."""
-    
+    """
+    Central service for config.
+
+    Holds the current ConfigSnapshot. The snapshot is replaced as a whole
+    (single reference swap) only when config is loaded or written through
+    this service, so readers never see a half-updated config.
+    """
+
     def __init__(self):
-        self._cache: Optional[Config] = None
-    
-    def load_from_db(self, session: Session) -> Config:
+        self._cache: Optional[ConfigSnapshot] = None
+        self._version: int = 0
+        # Reads served from the snapshot vs loads from the database
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        """Version of the current snapshot, 0 if config was never loaded."""
+        return self._version
+
+    def load_from_db(self, session: Session) -> ConfigSnapshot:
         """
         Load config from database and cache it.
-        
+
         args:
             session: database session
-        
+
         returns:
-            Config
+            ConfigSnapshot
         """
+        self.misses += 1
         config = session.exec(select(Config)).first()
         if not config:
             # Pierwsze uruchomienie – stwórz default
-            config = Config(
-                mode="local",
-                model_name="gemma3:latest",
-                gpu_layers=60,
-                temperature=0.7,
-                max_tokens=4096,
-                conversation_memory_length=10,
-                emotion_confidence_threshold=0.6
-            )
+            config = Config(**DEFAULT_CONFIG)
             session.add(config)
             session.commit()
             session.refresh(config)
-            print("-> Default config created")
-        
-        self._cache = config
-        print("-> Config loaded")
-        return config
-    
-    def get_runtime_config(self) -> Config:
+            logger.info("Default config created")
+
+        snapshot = self._publish(config)
+        logger.info("Config loaded", extra={"mode": snapshot.mode, "model": snapshot.model_name})
+        return snapshot
+
+    def get_runtime_config(self) -> ConfigSnapshot:
         """
         Get config from cache.
-        
+
         returns:
-            Config
+            ConfigSnapshot
         """
         if self._cache is None:
             raise RuntimeError("Config not loaded. Call load_from_db() first.")
+        self.hits += 1
         return self._cache
-    
-    def update_runtime_config(self, session: Session, **fields) -> Config:
+
+    def update_runtime_config(self, session: Session, **fields) -> ConfigSnapshot:
         """
-        Update config in database.
-        
+        Update config in database and publish a new snapshot.
+
+        The current snapshot is kept if the write fails.
+
         args:
             session: database session
             **fields: config fields
-        
+
         returns:
-            Config
+            ConfigSnapshot
         """
         if self._cache is None:
             raise RuntimeError("Config not loaded. Call load_from_db() first.")
-        
-        for key, value in fields.items():
-            if hasattr(self._cache, key):
-                setattr(self._cache, key, value)
-            else:
+
+        for key in fields:
+            if key not in Config.model_fields or key in ("id", "created_at", "updated_at"):
                 raise ValueError(f"Invalid config field: {key}")
-        
-        session.add(self._cache)
-        session.commit()
-        session.refresh(self._cache)
-        return self._cache
-    
-    def reload_from_db(self, session: Session) -> Config:
+
+        config = session.get(Config, self._cache.id)
+        if config is None:
+            raise LookupError("Configuration not found")
+
+        for key, value in fields.items():
+            setattr(config, key, value)
+        config.updated_at = datetime.now(timezone.utc)
+
+        try:
+            session.add(config)
+            session.commit()
+            session.refresh(config)
+        except Exception:
+            session.rollback()
+            raise
+
+        return self._publish(config)
+
+    def reset_runtime_config(self, session: Session) -> ConfigSnapshot:
+        """
+        Reset config in database to defaults.
+
+        args:
+            session: database session
+
+        returns:
+            ConfigSnapshot
+        """
+        return self.update_runtime_config(session, **DEFAULT_CONFIG)
+
+    def reload_from_db(self, session: Session) -> ConfigSnapshot:
         """
         Reload config from database.
-        
+
         args:
             session: database session
-        
+
         returns:
-            Config
+            ConfigSnapshot
         """
         self._cache = None
         return self.load_from_db(session)
 
+    def _publish(self, config: Config) -> ConfigSnapshot:
+        """Copy ORM row into a new snapshot and swap it in."""
+        self._version += 1
+        snapshot = ConfigSnapshot.model_validate(config).model_copy(update={"version": self._version})
+        self._cache = snapshot
+        return snapshot
+
 
-config_service = ConfigService()
\ No newline at end of file
+config_service = ConfigService()
@@ -0,0 +1,179 @@
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Deque, List, Optional, Tuple
+from sqlalchemy import DateTime, Float, String, literal, union_all
+from sqlalchemy.sql import CompoundSelect
+from sqlmodel import Session, desc, select
+from app.models.schemas import MemoryNote, Message, full_emotion_name
+from app.utils.lru_cache import LRUCache
+from app.utils.token_counter import estimate_tokens
+
+
+@dataclass(frozen=True, slots=True)
+class MessageRecord:
+    """Compact, session-free copy of a Message used for prompt building"""
+    id: int
+    role: str
+    content: str
+    emotion: Optional[str]
+    emotion_intensity: float
+    # Estimated content tokens, computed once per record
+    tokens: int = field(default=0, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "tokens", estimate_tokens(self.content))
+
+    @property
+    def full_emotion(self) -> str:
+        return full_emotion_name(self.emotion, self.emotion_intensity)
+
+    @classmethod
+    def from_message(cls, message: Message) -> "MessageRecord":
+        return cls(message.id, message.role, message.content, message.emotion, message.emotion_intensity)
+
+
+@dataclass(frozen=True, slots=True)
+class MemoryRecord:
+    """Compact, session-free copy of a MemoryNote used for prompt building"""
+    id: int
+    content: str
+    importance_score: float
+
+    @classmethod
+    def from_note(cls, note: MemoryNote) -> "MemoryRecord":
+        return cls(note.id, note.content, note.importance_score)
+
+
+@dataclass
+class ConversationContext:
+    """Rolling window of one conversation"""
+    window: int
+    notes_limit: int
+    messages: Deque[MessageRecord] = field(default_factory=deque)
+    # Most important first
+    memory_notes: List[MemoryRecord] = field(default_factory=list)
+
+
+class ConversationContextCache:
+    """
+    In-process LRU cache of conversation context (recent messages + top memory notes).
+
+    Loaded from the database on a miss. After that, new messages and notes
+    are appended when their turn is committed, so regular chat turns do not
+    query history at all. Entries are dropped on eviction, on conversation
+    delete, or when the requested window no longer matches the config.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._cache: LRUCache[int, ConversationContext] = LRUCache(maxsize=maxsize)
+        self._lock = Lock()
+
+    @property
+    def stats(self) -> LRUCache:
+        """Underlying LRU cache, exposes hits/misses."""
+        return self._cache
+
+    def get_or_load(self, session: Session, conversation_id: int, window: int, notes_limit: int) -> Tuple[List[MessageRecord], List[MemoryRecord]]:
+        """
+        Get context for a conversation, loading it from database on a miss.
+
+        args:
+            session: database session, used only on a miss
+            conversation_id: conversation ID
+            window: number of recent messages
+            notes_limit: number of memory notes (highest importance)
+
+        returns:
+            (messages oldest first, memory notes least important first)
+        """
+        context = self._cache.get(conversation_id)
+        if context is None or context.window != window or context.notes_limit != notes_limit:
+            context = self._load(session, conversation_id, window, notes_limit)
+            self._cache.put(conversation_id, context)
+
+        with self._lock:
+            return list(context.messages), list(reversed(context.memory_notes))
+
+    def append_turn(self, conversation_id: int, messages: List[MessageRecord], memory_note: Optional[MemoryRecord] = None) -> None:
+        """
+        Append committed messages (and memory note) to a cached conversation.
+        Does nothing if the conversation is not cached - next read loads it.
+        """
+        context = self._cache.get(conversation_id)
+        if context is None:
+            return
+
+        with self._lock:
+            context.messages.extend(messages)
+            if memory_note is not None:
+                notes = context.memory_notes + [memory_note]
+                notes.sort(key=lambda n: n.importance_score, reverse=True)
+                context.memory_notes = notes[:context.notes_limit]
+
+    def invalidate(self, conversation_id: int) -> None:
+        self._cache.pop(conversation_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @staticmethod
+    def context_statement(conversation_id: int, window: int, notes_limit: int) -> CompoundSelect:
+        """
+        One statement for the last `window` messages and the top `notes_limit`
+        memory notes of a conversation.
+
+        Both go through the same UNION ALL, rows are told apart by the "kind"
+        column. Only the columns needed for prompt building are selected.
+        """
+        messages = (
+            select(
+                literal("message").label("kind"),
+                Message.id.label("id"),
+                Message.role.label("role"),
+                Message.content.label("content"),
+                Message.emotion.label("emotion"),
+                Message.emotion_intensity.label("emotion_intensity"),
+                literal(None, Float).label("importance_score"),
+                Message.created_at.label("created_at"),
+            )
+            .where(Message.conversation_id == conversation_id)
+            .order_by(desc(Message.created_at), desc(Message.id))
+            .limit(window)
+            .subquery()
+        )
+        notes = (
+            select(
+                literal("note"),
+                MemoryNote.id,
+                literal(None, String),
+                MemoryNote.content,
+                literal(None, String),
+                literal(None, Float),
+                MemoryNote.importance_score,
+                literal(None, DateTime),
+            )
+            .where(MemoryNote.conversation_id == conversation_id)
+            .order_by(desc(MemoryNote.importance_score))
+            .limit(notes_limit)
+            .subquery()
+        )
+        return union_all(select(messages), select(notes))
+
+    @classmethod
+    def _load(cls, session: Session, conversation_id: int, window: int, notes_limit: int) -> ConversationContext:
+        rows = session.exec(cls.context_statement(conversation_id, window, notes_limit)).all()
+
+        # Compound select does not keep the order of its parts - sort here
+        message_rows = sorted((r for r in rows if r.kind == "message"), key=lambda r: (r.created_at, r.id))
+        note_rows = sorted((r for r in rows if r.kind == "note"), key=lambda r: r.importance_score, reverse=True)
+
+        return ConversationContext(
+            window=window,
+            notes_limit=notes_limit,
+            messages=deque((MessageRecord(r.id, r.role, r.content, r.emotion, r.emotion_intensity) for r in message_rows), maxlen=window),
+            memory_notes=[MemoryRecord(r.id, r.content, r.importance_score) for r in note_rows],
+        )
+
+
+context_cache = ConversationContextCache()
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+from app.core.config import CONTEXT_MEMORY_SHARE, LLM_CONTEXT_WINDOW
+from app.services.context_cache import MemoryRecord, MessageRecord
+from app.utils.token_counter import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_tokens
+
+
+@dataclass
+class PackedContext:
+    """History and memory notes that fit the prompt budget, with their sizes in tokens."""
+    budget: int
+    fixed_tokens: int
+    # Oldest first
+    messages: List[MessageRecord] = field(default_factory=list)
+    # Best first
+    memory_notes: List[MemoryRecord] = field(default_factory=list)
+    memory_tokens: int = 0
+    history_tokens: int = 0
+    dropped_messages: int = 0
+    dropped_notes: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.fixed_tokens + self.memory_tokens + self.history_tokens
+
+    @property
+    def fits(self) -> bool:
+        return self.total_tokens <= self.budget
+
+
+class ContextPacker:
+    """
+    Fills the prompt token budget instead of taking a fixed number of messages.
+
+    The budget is the context window minus Config.max_tokens reserved for
+    the reply. Fixed parts (system prompt, per-turn context, new message)
+    always go in first, then memory notes best first (up to memory_share of
+    the budget), then history newest first until the budget is used up.
+    History is cut at the first message that does not fit, so it stays
+    contiguous.
+    """
+
+    def __init__(self, context_window: int = LLM_CONTEXT_WINDOW, memory_share: float = CONTEXT_MEMORY_SHARE):
+        self.context_window = context_window
+        self.memory_share = memory_share
+
+        self.packs = 0
+        self.truncated = 0
+        self.over_budget = 0
+        self.last: Dict[str, Any] = {}
+        self._total_tokens = 0
+
+    def budget(self, max_tokens: int) -> int:
+        """Prompt tokens left after reserving max_tokens for the reply (at least a quarter of the window)."""
+        return max(self.context_window // 4, self.context_window - max_tokens)
+
+    @staticmethod
+    def note_tokens(note: MemoryRecord) -> int:
+        """Tokens of a note line as rendered by PromptBuilder.build_context."""
+        return estimate_tokens(f"- {note.content} (importance: {note.importance_score:.2f})") + 1
+
+    def pack(self, budget: int, fixed_texts: Sequence[str], memory_notes: Sequence[MemoryRecord], history: Sequence[MessageRecord]) -> PackedContext:
+        """
+        args:
+            budget: prompt tokens available
+            fixed_texts: contents of the messages that are always sent
+            memory_notes: candidate notes, best first
+            history: candidate messages, oldest first
+
+        returns:
+            PackedContext
+        """
+        packed = PackedContext(budget=budget, fixed_tokens=sum(estimate_message_tokens(t) for t in fixed_texts))
+        remaining = budget - packed.fixed_tokens
+
+        memory_budget = min(remaining, int(budget * self.memory_share))
+        for note in memory_notes:
+            tokens = self.note_tokens(note)
+            if packed.memory_tokens + tokens > memory_budget:
+                break
+            packed.memory_notes.append(note)
+            packed.memory_tokens += tokens
+        packed.dropped_notes = len(memory_notes) - len(packed.memory_notes)
+        remaining -= packed.memory_tokens
+
+        kept = 0
+        for message in reversed(history):
+            tokens = message.tokens + MESSAGE_OVERHEAD_TOKENS
+            if packed.history_tokens + tokens > remaining:
+                break
+            packed.history_tokens += tokens
+            kept += 1
+        packed.messages = list(history[len(history) - kept:]) if kept else []
+        packed.dropped_messages = len(history) - kept
+
+        self._record(packed)
+        return packed
+
+    def _record(self, packed: PackedContext) -> None:
+        self.packs += 1
+        self._total_tokens += packed.total_tokens
+        if packed.dropped_messages:
+            self.truncated += 1
+        if not packed.fits:
+            self.over_budget += 1
+        self.last = {
+            "budget": packed.budget,
+            "total_tokens": packed.total_tokens,
+            "fixed_tokens": packed.fixed_tokens,
+            "memory_tokens": packed.memory_tokens,
+            "history_tokens": packed.history_tokens,
+            "messages": len(packed.messages),
+            "memory_notes": len(packed.memory_notes),
+            "dropped_messages": packed.dropped_messages,
+            "dropped_notes": packed.dropped_notes,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Packing counters and the size of the last packed prompt."""
+        return {
+            "context_window": self.context_window,
+            "packs": self.packs,
+            "avg_total_tokens": round(self._total_tokens / self.packs, 1) if self.packs else None,
+            "truncated": self.truncated,
+            "over_budget": self.over_budget,
+            "last": self.last,
+        }
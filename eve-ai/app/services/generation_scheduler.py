@@ -0,0 +1,206 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, List, Optional
+from app.core.config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_S
+
+# Assumed run time before any generation finished, used for Retry-After
+DEFAULT_RUN_TIME_S = 5.0
+
+
+class GenerationRejected(Exception):
+    """Generation was not admitted. Maps to an HTTP status with Retry-After."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class GenerationScheduler:
+    """
+    Limits how many LLM generations run at once.
+
+    Up to max_concurrent generations run, up to max_queue more wait for a
+    slot. When a slot frees up it goes to the next conversation in
+    round-robin order, so one busy conversation cannot starve the others.
+    A generation is rejected when the queue is full (429) or when it waited
+    longer than max_wait (503), both with a Retry-After estimate.
+
+    Background work (summaries) goes through background_slot, a low-priority
+    lane that only starts when nothing is queued and a slot stays free for
+    user turns.
+
+    Runs on the event loop - counters are not locked.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE, max_wait: float = LLM_QUEUE_TIMEOUT_S, window: int = 1000):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._running = 0
+        self._queued = 0
+        # Waiting generations per conversation, first key is served next
+        self._waiters: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.background_running = 0
+        self.background_completed = 0
+        # Recent samples, seconds
+        self._wait_times: Deque[float] = deque(maxlen=window)
+        self._run_times: Deque[float] = deque(maxlen=window)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def saturated(self) -> bool:
+        """True if a new generation would be rejected right now."""
+        return self._running >= self.max_concurrent and self._queued >= self.max_queue
+
+    def check_admission(self) -> None:
+        """Raise GenerationRejected if a new generation would be rejected right now."""
+        if self.saturated():
+            self.rejected += 1
+            raise GenerationRejected("Too many generations waiting, try again later", 429, self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until a new generation would likely get a slot."""
+        run_time = sum(self._run_times) / len(self._run_times) if self._run_times else DEFAULT_RUN_TIME_S
+        rounds = (self._queued + 1) / self.max_concurrent
+        return max(1, math.ceil(run_time * rounds))
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable = None) -> AsyncIterator[None]:
+        """
+        Hold a generation slot for the duration of the block.
+
+        args:
+            key: fairness group, usually the conversation ID
+        """
+        start = time.perf_counter()
+        if self._running < self.max_concurrent and not self._queued:
+            self._running += 1
+        else:
+            self.check_admission()
+            await self._wait(key)
+        self.admitted += 1
+
+        run_start = time.perf_counter()
+        self._wait_times.append(run_start - start)
+        try:
+            yield
+        finally:
+            self._run_times.append(time.perf_counter() - run_start)
+            self.completed += 1
+            self._release()
+
+    def background_ready(self) -> bool:
+        """True if background work can start without making user generations wait."""
+        if self._queued:
+            return False
+        # Keep one slot free for user turns, a single slot only when idle
+        return self._running == 0 or self._running + 1 < self.max_concurrent
+
+    @asynccontextmanager
+    async def background_slot(self, poll_interval: float = 0.5) -> AsyncIterator[None]:
+        """
+        Hold a slot for low-priority work, waiting as long as user generations need them.
+        Background runs are not counted in admission stats or wait/run times.
+        """
+        while not self.background_ready():
+            await asyncio.sleep(poll_interval)
+        self._running += 1
+        self.background_running += 1
+        try:
+            yield
+        finally:
+            self.background_running -= 1
+            self.background_completed += 1
+            self._release()
+
+    async def _wait(self, key: Hashable) -> None:
+        """Queue up and wait until _release hands over a slot."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just as we gave up - pass it on
+                self._release()
+            else:
+                self._remove(key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise GenerationRejected("Timed out waiting for a free generation slot", 503, self.retry_after()) from e
+            raise
+
+    def _remove(self, key: Hashable, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(key)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        self._queued -= 1
+        if not waiters:
+            del self._waiters[key]
+
+    def _release(self) -> None:
+        """Give the slot to the next waiting conversation, or free it."""
+        while self._waiters:
+            key, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                # Slot changes hands, running count stays the same
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    @staticmethod
+    def _summary(samples: Deque[float]) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"avg_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        ordered: List[float] = sorted(samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": round(pick(0.5) * 1000, 2),
+            "p95_ms": round(pick(0.95) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, counters and recent wait/run time percentiles."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._queued,
+            "waiting_conversations": len(self._waiters),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "background_running": self.background_running,
+            "background_completed": self.background_completed,
+            "wait_time": self._summary(self._wait_times),
+            "run_time": self._summary(self._run_times),
+        }
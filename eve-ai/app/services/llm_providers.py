@@ -0,0 +1,332 @@
+import asyncio
+import json
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar, Union
+import httpx
+from ollama import AsyncClient, ResponseError
+from app.core.config import (
+    LLM_CONNECT_TIMEOUT_S,
+    LLM_CONTEXT_WINDOW,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY_S,
+    LOCAL_LLM_TIMEOUT_S,
+    OLLAMA_KEEP_ALIVE,
+    REMOTE_API_BASE_URL,
+    REMOTE_LLM_TIMEOUT_S,
+)
+from app.core.log import get_logger
+from app.services.config_service import ConfigSnapshot
+
+logger = get_logger("llm")
+
+T = TypeVar("T")
+# True for any JSON object, or a JSON Schema dict
+JsonFormat = Union[bool, Dict[str, Any]]
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Never wait longer than this between attempts, even if the server asks for more
+MAX_RETRY_DELAY_S = 10.0
+
+
+@dataclass
+class LLMResult:
+    """Finished generation. Durations are in nanoseconds, like Ollama reports them."""
+    content: str
+    eval_count: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration: Optional[int] = None
+    eval_duration: Optional[int] = None
+
+
+@dataclass
+class LLMChunk:
+    """Piece of a streamed generation. The last chunk has done=True and the stats."""
+    content: str
+    done: bool = False
+    result: Optional[LLMResult] = None
+
+
+class RetryableError(Exception):
+    """Transient provider error - the request can be sent again."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMProvider(ABC):
+    """
+    Backend that generates chat completions.
+
+    Providers are created once at startup and own their connection pool.
+    Runtime settings (model, temperature, API keys) come from the config
+    snapshot on every call, so config changes apply without rebuilding.
+    """
+
+    name: str = "base"
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, retry_base_delay: float = LLM_RETRY_BASE_DELAY_S):
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+    @abstractmethod
+    async def chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> LLMResult:
+        """Generate full reply. json_format is True for any JSON object, or a JSON Schema the reply must match."""
+
+    @abstractmethod
+    def stream_chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> AsyncIterator[LLMChunk]:
+        """Generate reply piece by piece."""
+
+    async def warm_up(self, cfg: ConfigSnapshot) -> None:
+        """Prepare backend before the first request (optional)."""
+
+    async def aclose(self) -> None:
+        """Close connection pool."""
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with full jitter, or the server's Retry-After if given."""
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_DELAY_S)
+        return random.uniform(0, min(MAX_RETRY_DELAY_S, self.retry_base_delay * 2 ** attempt))
+
+    async def with_retries(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run call, retrying RetryableError up to max_retries times.
+
+        args:
+            call: coroutine factory, called once per attempt
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e.retry_after)
+                logger.warning("LLM request failed, retrying", extra={"provider": self.name, "error": repr(e), "attempt": attempt + 1, "max_retries": self.max_retries, "delay_s": round(delay, 2)})
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+# =========== OLLAMA ===========
+class OllamaProvider(LLMProvider):
+    """Local models served by Ollama."""
+
+    name = "ollama"
+
+    def __init__(self, client: Optional[AsyncClient] = None, keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client or AsyncClient(
+            timeout=httpx.Timeout(LOCAL_LLM_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+        # Sent with every request, so the model stays resident between turns
+        self.keep_alive = keep_alive
+
+    @staticmethod
+    def options(cfg: ConfigSnapshot) -> Dict[str, Any]:
+        # Ollama names - unknown keys are ignored silently: num_predict caps the reply,
+        # num_ctx is the window the prompt was packed for, num_gpu the layers offloaded to the GPU
+        return {"temperature": cfg.temperature,"num_predict": cfg.max_tokens,"num_ctx": LLM_CONTEXT_WINDOW,"num_gpu": cfg.gpu_layers}
+
+    @staticmethod
+    def format(json_format: JsonFormat) -> Union[str, Dict[str, Any], None]:
+        # A schema dict is Ollama's structured output, decoding is constrained to it
+        if isinstance(json_format, dict):
+            return json_format
+        return "json" if json_format else None
+
+    async def _call(self, **kwargs) -> Any:
+        try:
+            return await self.client.chat(keep_alive=self.keep_alive, **kwargs)
+        except (ConnectionError, ResponseError) as e:
+            raise self._retryable(e)
+
+    async def _open_stream(self, **kwargs) -> Any:
+        """Start a stream and wait for its first part - the request is only sent on iteration."""
+        stream = await self._call(stream=True, **kwargs)
+        try:
+            first = await anext(stream)
+        except (ConnectionError, ResponseError) as e:
+            raise self._retryable(e)
+        return first, stream
+
+    @staticmethod
+    def _retryable(error: Exception) -> Exception:
+        if isinstance(error, ConnectionError):
+            return RetryableError(str(error))
+        if isinstance(error, ResponseError) and error.status_code in RETRYABLE_STATUS_CODES:
+            return RetryableError(str(error))
+        return error
+
+    async def chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> LLMResult:
+        response = await self.with_retries(lambda: self._call(
+            model=cfg.model_name, messages=messages, format=self.format(json_format), options=self.options(cfg)
+        ))
+        if not response.message or not response.message.content:
+            raise ValueError("AI response is empty")
+
+        return LLMResult(
+            content=response.message.content,
+            eval_count=response.eval_count,
+            prompt_eval_count=response.prompt_eval_count,
+            prompt_eval_duration=response.prompt_eval_duration,
+            eval_duration=response.eval_duration,
+        )
+
+    async def stream_chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> AsyncIterator[LLMChunk]:
+        # Retry only opening the stream - once text went to the client it cannot be taken back
+        first, stream = await self.with_retries(lambda: self._open_stream(
+            model=cfg.model_name, messages=messages, format=self.format(json_format), options=self.options(cfg)
+        ))
+        
+        async def parts():
+            yield first
+            async for part in stream:
+                yield part
+        
+        async for part in parts():
+            content = part.message.content if part.message and part.message.content else ""
+            if part.done:
+                yield LLMChunk(content=content, done=True, result=LLMResult(
+                    content="",
+                    eval_count=part.eval_count,
+                    prompt_eval_count=part.prompt_eval_count,
+                    prompt_eval_duration=part.prompt_eval_duration,
+                    eval_duration=part.eval_duration,
+                ))
+            elif content:
+                yield LLMChunk(content=content)
+
+    async def warm_up(self, cfg: ConfigSnapshot) -> None:
+        # Ollama loads a model on a chat request with no messages
+        await self.client.chat(model=cfg.model_name, messages=[], keep_alive=self.keep_alive)
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+# =========== OPENAI-COMPATIBLE ===========
+class OpenAICompatibleProvider(LLMProvider):
+    """Remote models behind an OpenAI-compatible /chat/completions API."""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = REMOTE_API_BASE_URL, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/",
+            timeout=httpx.Timeout(REMOTE_LLM_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS, keepalive_expiry=60),
+            transport=transport,
+        )
+
+    def _request(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat, stream: bool) -> httpx.Request:
+        if not cfg.openai_api_key:
+            raise ValueError("Remote mode requires openai_api_key in config")
+
+        body: Dict[str, Any] = {
+            "model": cfg.model_name,
+            "messages": messages,
+            "temperature": cfg.temperature,
+            "max_tokens": cfg.max_tokens,
+            "stream": stream,
+        }
+        if json_format:
+            # Not every OpenAI-compatible server supports json_schema - a schema is checked when parsing instead
+            body["response_format"] = {"type": "json_object"}
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+
+        return self.client.build_request(
+            "POST", "chat/completions", json=body, headers={"Authorization": f"Bearer {cfg.openai_api_key}"}
+        )
+
+    async def _send(self, request: httpx.Request, stream: bool) -> httpx.Response:
+        try:
+            response = await self.client.send(request, stream=stream)
+        except httpx.TransportError as e:
+            raise RetryableError(f"{type(e).__name__}: {e}") from e
+
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After")
+            await response.aclose()
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            raise ValueError(f"Remote API error {response.status_code}: {response.text[:200]}")
+        return response
+
+    @staticmethod
+    def _result(usage: Optional[Dict[str, Any]], content: str) -> LLMResult:
+        usage = usage or {}
+        return LLMResult(content=content, eval_count=usage.get("completion_tokens"), prompt_eval_count=usage.get("prompt_tokens"))
+
+    async def chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> LLMResult:
+        request = self._request(messages, cfg, json_format, stream=False)
+        response = await self.with_retries(lambda: self._send(request, stream=False))
+        data = response.json()
+
+        content = (data.get("choices") or [{}])[0].get("message", {}).get("content")
+        if not content:
+            raise ValueError("AI response is empty")
+        return self._result(data.get("usage"), content)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], cfg: ConfigSnapshot, json_format: JsonFormat = True) -> AsyncIterator[LLMChunk]:
+        request = self._request(messages, cfg, json_format, stream=True)
+        response = await self.with_retries(lambda: self._send(request, stream=True))
+
+        usage = None
+        try:
+            # Server-Sent Events: "data: {...}" lines, "data: [DONE]" at the end
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                data = json.loads(payload)
+                usage = data.get("usage") or usage
+                for choice in data.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield LLMChunk(content=content)
+        finally:
+            await response.aclose()
+
+        yield LLMChunk(content="", done=True, result=self._result(usage, ""))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# =========== REGISTRY ===========
+class ProviderRegistry:
+    """Providers by config mode ("local" / "remote"), resolved once at startup."""
+
+    def __init__(self, providers: Dict[str, LLMProvider]):
+        self._providers = providers
+
+    @classmethod
+    def from_settings(cls) -> "ProviderRegistry":
+        return cls({
+            "local": OllamaProvider(),
+            "remote": OpenAICompatibleProvider(),
+        })
+
+    def get(self, mode: str) -> LLMProvider:
+        provider = self._providers.get(mode)
+        if provider is None:
+            raise ValueError(f"Invalid AI mode: {mode}")
+        return provider
+
+    async def aclose(self) -> None:
+        for provider in self._providers.values():
+            await provider.aclose()
@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+from ollama import AsyncClient
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import (
+    EMBEDDING_BACKEND,
+    OLLAMA_KEEP_ALIVE,
+    EMBEDDING_MODEL,
+    MEMORY_IMPORTANCE_WEIGHT,
+    MEMORY_INDEX_DIR,
+    MEMORY_RECENCY_HALF_LIFE_DAYS,
+    MEMORY_RECENCY_WEIGHT,
+    MEMORY_SIMILARITY_WEIGHT,
+)
+from app.core.log import get_logger
+from app.models.schemas import Conversation, MemoryNote
+from app.services.context_cache import MemoryRecord
+from app.utils.lru_cache import LRUCache
+
+logger = get_logger("memory")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, so a dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        # SQLite returns naive datetimes, they are stored as UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+# =========== EMBEDDERS ===========
+class Embedder(ABC):
+    """Turns texts into L2-normalized float32 vectors."""
+
+    # Part of the index path - vectors of different embedders never mix
+    name: str = "base"
+
+    @abstractmethod
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        returns:
+            array of shape (len(texts), dim)
+        """
+
+    async def aclose(self) -> None:
+        """Close client connections (optional)."""
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder - hashed bag of words and word pairs.
+
+    Needs no model, so it works offline and in tests. Matches on shared
+    words only, not on meaning.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _WORD_RE.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.stack([self._vector(t) for t in texts]))
+
+
+class OllamaEmbedder(Embedder):
+    """
+    Embeddings from an Ollama embedding model.
+
+    Sent with the chat keep_alive - Ollama's default (5m) would unload the
+    embedding model and load it again next to the chat model on a later turn.
+    """
+
+    def __init__(self, client: Optional[AsyncClient] = None, model: str = EMBEDDING_MODEL, keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE):
+        self.client = client or AsyncClient()
+        self.model = model
+        self.keep_alive = keep_alive
+        self.name = f"ollama-{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}"
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        response = await self.client.embed(model=self.model, input=list(texts), keep_alive=self.keep_alive)
+        return _normalize(np.asarray(response.embeddings, dtype=np.float32))
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+# =========== INDEX ===========
+@dataclass
+class ScoringWeights:
+    similarity: float = MEMORY_SIMILARITY_WEIGHT
+    importance: float = MEMORY_IMPORTANCE_WEIGHT
+    recency: float = MEMORY_RECENCY_WEIGHT
+    recency_half_life_days: float = MEMORY_RECENCY_HALF_LIFE_DAYS
+
+
+class MemoryIndex:
+    """
+    Vectors and metadata of one conversation's memory notes in flat NumPy arrays.
+
+    Arrays grow by doubling, so adding one note is amortized O(1). Search is
+    a brute-force dot product - a conversation has at most a few thousand notes.
+
+    `key` identifies the conversation beyond its ID (see MemoryService._conversation_key),
+    so a file left over from another database is not mistaken for this one.
+    """
+
+    def __init__(self, dim: int, capacity: int = 16, key: str = ""):
+        self.dim = dim
+        self.key = key
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.importance = np.zeros(capacity, dtype=np.float32)
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.contents: List[str] = []
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids[:self.size].max()) if self.size else 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.ids = np.resize(self.ids, capacity)
+        self.vectors = np.resize(self.vectors, (capacity, self.dim))
+        self.importance = np.resize(self.importance, capacity)
+        self.created_at = np.resize(self.created_at, capacity)
+
+    def add(self, records: Sequence[MemoryRecord], vectors: np.ndarray, created_at: Sequence[float]) -> None:
+        """Append notes. vectors must be normalized, one row per record."""
+        if not records:
+            return
+        if vectors.shape != (len(records), self.dim):
+            raise ValueError(f"Expected vectors of shape {(len(records), self.dim)}, got {vectors.shape}")
+        start, end = self.size, self.size + len(records)
+        self._grow(end)
+        self.ids[start:end] = [r.id for r in records]
+        self.vectors[start:end] = vectors
+        self.importance[start:end] = [r.importance_score for r in records]
+        self.created_at[start:end] = created_at
+        self.contents.extend(r.content for r in records)
+        self.size = end
+
+    def search(self, query: np.ndarray, k: int, weights: ScoringWeights, now: Optional[float] = None) -> List[Tuple[MemoryRecord, float]]:
+        """
+        Top-k notes by similarity blended with importance and recency.
+
+        args:
+            query: normalized query vector
+            k: number of notes
+            weights: score weights
+            now: reference time for recency, defaults to current time
+
+        returns:
+            [(note, score)] best first
+        """
+        if self.size == 0 or k <= 0:
+            return []
+        n = self.size
+        similarity = self.vectors[:n] @ query
+        age_days = np.maximum(0.0, (now or time.time()) - self.created_at[:n]) / 86400
+        recency = np.power(0.5, age_days / weights.recency_half_life_days)
+        scores = weights.similarity * similarity + weights.importance * self.importance[:n] + weights.recency * recency
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (MemoryRecord(int(self.ids[i]), self.contents[i], float(self.importance[i])), float(scores[i]))
+            for i in top
+        ]
+
+    def save(self, path: Path) -> None:
+        """Write to an .npz file. Atomic - readers never see a half-written index."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        n = self.size
+        np.savez(
+            tmp,
+            ids=self.ids[:n],
+            vectors=self.vectors[:n],
+            importance=self.importance[:n],
+            created_at=self.created_at[:n],
+            contents=np.array(self.contents, dtype=np.str_),
+            key=np.array(self.key, dtype=np.str_),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "MemoryIndex":
+        with np.load(path, allow_pickle=False) as data:
+            vectors = data["vectors"]
+            # Files written before keys existed get an empty one, and are rebuilt
+            key = str(data["key"]) if "key" in data.files else ""
+            index = cls(dim=vectors.shape[1], capacity=max(16, len(vectors)), key=key)
+            n = len(vectors)
+            index.ids[:n] = data["ids"]
+            index.vectors[:n] = vectors
+            index.importance[:n] = data["importance"]
+            index.created_at[:n] = data["created_at"]
+            index.contents = [str(c) for c in data["contents"]]
+            index.size = n
+        return index
+
+
+# =========== SERVICE ===========
+class MemoryService:
+    """
+    Picks memory notes relevant to the new user message.
+
+    One MemoryIndex per conversation, kept in an LRU and saved to
+    `index_dir/<embedder>/<conversation_id>.npz`. A cold index is read from
+    disk and only notes it does not have yet are embedded, so startup does
+    not re-embed history. New notes are added incrementally by add_note.
+
+    A file is used only if it belongs to the same conversation (its creation
+    time, IDs repeat after a reseed or into a fresh database) and holds
+    exactly the notes the database has up to its max id - otherwise the
+    index is rebuilt from the database.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, index_dir: str = MEMORY_INDEX_DIR, weights: Optional[ScoringWeights] = None, maxsize: int = 256):
+        self.embedder = embedder or (HashingEmbedder() if EMBEDDING_BACKEND == "hashing" else OllamaEmbedder())
+        self.index_dir = Path(index_dir) / self.embedder.name
+        self.weights = weights or ScoringWeights()
+        self._indexes: LRUCache[int, MemoryIndex] = LRUCache(maxsize=maxsize)
+
+    @property
+    def stats(self) -> LRUCache:
+        """Underlying LRU cache of loaded indexes, exposes hits/misses."""
+        return self._indexes
+
+    def index_path(self, conversation_id: int) -> Path:
+        return self.index_dir / f"{conversation_id}.npz"
+
+    async def retrieve(self, session: AsyncSession, conversation_id: int, query_text: str, k: int) -> List[MemoryRecord]:
+        """
+        Get the k best notes for the query, best first.
+
+        args:
+            session: database session, used only when the index is not in memory
+            conversation_id: conversation ID
+            query_text: new user message
+            k: number of notes
+        """
+        query, index = await asyncio.gather(self.embedder.embed([query_text]), self.get_index(session, conversation_id))
+        return [record for record, _ in index.search(query[0], k, self.weights)]
+
+    async def get_index(self, session: AsyncSession, conversation_id: int) -> MemoryIndex:
+        """Index from memory, else from disk, brought up to date with the database."""
+        index = self._indexes.get(conversation_id)
+        if index is not None:
+            return index
+
+        path = self.index_path(conversation_id)
+        # Read only when there is a file to check or new notes to save
+        key: Optional[str] = None
+        index = await asyncio.to_thread(MemoryIndex.load, path) if path.exists() else None
+        if index is not None:
+            key = await self._conversation_key(session, conversation_id)
+            if not await self._is_current(session, conversation_id, key, index):
+                logger.info("Stale memory index rebuilt", extra={"conversation_id": conversation_id})
+                index = None
+
+        notes = (await session.exec(
+            select(MemoryNote)
+            .where(MemoryNote.conversation_id == conversation_id, MemoryNote.id > (index.max_id if index else 0))
+            .order_by(MemoryNote.id)
+        )).all()
+        if notes:
+            records = [MemoryRecord.from_note(n) for n in notes]
+            vectors = await self.embedder.embed([r.content for r in records])
+            if index is None:
+                key = key if key is not None else await self._conversation_key(session, conversation_id)
+                index = MemoryIndex(dim=vectors.shape[1], key=key)
+            index.add(records, vectors, [_timestamp(n.created_at) for n in notes])
+            await asyncio.to_thread(index.save, path)
+
+        index = index or MemoryIndex(dim=0, key=key or "")
+        self._indexes.put(conversation_id, index)
+        return index
+
+    @staticmethod
+    async def _conversation_key(session: AsyncSession, conversation_id: int) -> str:
+        """Creation time of the conversation - IDs repeat after a reseed or in a fresh database, this does not."""
+        created_at = await session.scalar(select(Conversation.created_at).where(Conversation.id == conversation_id))
+        return created_at.isoformat() if created_at else ""
+
+    @staticmethod
+    async def _is_current(session: AsyncSession, conversation_id: int, key: str, index: MemoryIndex) -> bool:
+        """Index file written for this conversation, with no note deleted or replaced since."""
+        if not key or index.key != key:
+            return False
+        count = await session.scalar(
+            select(func.count()).select_from(MemoryNote)
+            .where(MemoryNote.conversation_id == conversation_id, MemoryNote.id <= index.max_id)
+        )
+        return count == len(index)
+
+    async def add_note(self, conversation_id: int, record: MemoryRecord, created_at: Optional[datetime] = None) -> None:
+        """
+        Add a committed note to a loaded index and save it.
+        Does nothing if the index is not in memory - it syncs from the database on load.
+        """
+        index = self._indexes.get(conversation_id)
+        if index is None:
+            return
+        try:
+            vectors = await self.embedder.embed([record.content])
+            if index.dim == 0:
+                # An empty conversation's index may have no key yet, its file is then rebuilt once on load
+                index = MemoryIndex(dim=vectors.shape[1], key=index.key)
+                self._indexes.put(conversation_id, index)
+            index.add([record], vectors, [_timestamp(created_at)])
+            await asyncio.to_thread(index.save, self.index_path(conversation_id))
+        except Exception as e:
+            # Drop the index, next load catches up from the database
+            logger.warning("Failed to index memory note", extra={"conversation_id": conversation_id, "note_id": record.id, "error": repr(e)})
+            self._indexes.pop(conversation_id)
+
+    def forget(self, conversation_id: int) -> None:
+        """Drop the index of a deleted conversation."""
+        self._indexes.pop(conversation_id)
+        self.index_path(conversation_id).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Drop in-memory indexes (files stay)."""
+        self._indexes.clear()
+
+    async def aclose(self) -> None:
+        await self.embedder.aclose()
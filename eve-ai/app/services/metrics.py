@@ -0,0 +1,183 @@
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds - from a cached health check to a long local generation
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+LabelValues = Tuple[str, ...]
+# (suffix, labels, value) - what a collector reports for one metric
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base of a named metric family with fixed label names."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        return []
+
+
+class Counter(Metric):
+    """
+    Monotonic counter, name it with the _total suffix.
+
+    Plain floats in a dict, no lock: counters are incremented from the event
+    loop, and a rare lost increment from a threadpool race is acceptable for
+    monitoring.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: LabelValues = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in list(self._values.items()):
+            yield "", self._labels(labels), value
+
+
+class Histogram(Metric):
+    """Cumulative bucket histogram, one bisect and three additions per observation."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, labels: LabelValues = ()) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, (counts, total, count) in list(self._series.items()):
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield "_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield "_sum", base, total
+            yield "_count", base, count
+
+
+class GaugeCallback(Metric):
+    """Gauge read at scrape time, e.g. queue depth. Costs nothing between scrapes."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Dict[LabelValues, float]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.read = read
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self.read().items():
+            yield "", self._labels(labels), value
+
+
+class CounterCallback(GaugeCallback):
+    """Counter kept elsewhere (e.g. cache hits), read at scrape time."""
+
+    type = "counter"
+
+
+class MetricsRegistry:
+    """Metric families rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # A broken callback must not take the whole scrape down
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# =========== RECORDED METRICS ===========
+http_requests = registry.register(Counter("eve_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram("eve_http_request_duration_seconds", "HTTP request duration by route, until the last body chunk.", ("method", "route")))
+turn_stage_duration = registry.register(Histogram("eve_turn_stage_duration_seconds", "Chat turn duration per stage.", ("stage",)))
+llm_generated_tokens = registry.register(Counter("eve_llm_generated_tokens_total", "Tokens generated by the model (eval_count).", ("source",)))
+llm_eval_seconds = registry.register(Counter("eve_llm_eval_seconds_total", "Model time spent generating tokens (eval_duration).", ("source",)))
+llm_tokens_per_second = registry.register(Histogram("eve_llm_tokens_per_second", "Generation speed per call, eval_count / eval_duration.", ("source",), buckets=TOKENS_PER_SECOND_BUCKETS))
+
+
+def observe_generation(eval_count: Optional[int], eval_duration: Optional[int], source: str = "turn") -> None:
+    """
+    Record model throughput of one generation.
+
+    args:
+        eval_count: generated tokens
+        eval_duration: generation time in nanoseconds, as Ollama reports it
+        source: what generated, e.g. "turn" or "summary"
+    """
+    if not eval_count:
+        return
+    llm_generated_tokens.inc(eval_count, (source,))
+    if eval_duration:
+        seconds = eval_duration / 1e9
+        llm_eval_seconds.inc(seconds, (source,))
+        llm_tokens_per_second.observe(eval_count / seconds, (source,))
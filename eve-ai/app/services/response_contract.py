@@ -0,0 +1,133 @@
+import copy
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from pydantic import AliasChoices, BaseModel, Field, ValidationError, field_validator
+from app.core.log import get_logger
+from app.services.metrics import Counter, registry
+from app.utils.json_repair import loads_tolerant
+
+logger = get_logger("response")
+
+# Stored when nothing usable came back - the reply is never generated twice
+FALLBACK_RESPONSE = "I had trouble formatting my response correctly."
+# MemoryNote.content limit
+MEMORY_NOTE_MAX_LENGTH = 500
+
+response_parses = registry.register(Counter("eve_response_parses_total", "Model replies by parse outcome: ok, salvaged (repaired or partial) and failed.", ("outcome",)))
+
+
+class TurnResponse(BaseModel):
+    """
+    The JSON envelope a character replies with.
+
+    Lenient on purpose: numbers are clamped to 0-1 instead of rejected and an
+    empty memory note is no note, so one odd field never costs the reply.
+    Emotions are checked against the character later, in AI_Service.
+    """
+
+    response: str = Field(min_length=1)
+    # "emotion" is what older prompts and some models write
+    ai_emotion: Optional[str] = Field(default=None, validation_alias=AliasChoices("ai_emotion", "emotion"))
+    ai_emotion_intensity: float = 0.5
+    ai_emotion_confidence: float = 0.5
+    user_emotion: Optional[str] = None
+    user_emotion_intensity: float = 0.5
+    user_emotion_confidence: float = 0.0
+    memory_note: Optional[str] = None
+    memory_note_importance: float = 0.5
+
+    @field_validator("response")
+    @classmethod
+    def strip_response(cls, value: str) -> str:
+        return value.strip()
+
+    @field_validator("ai_emotion_intensity", "ai_emotion_confidence", "user_emotion_intensity", "user_emotion_confidence", "memory_note_importance", mode="before")
+    @classmethod
+    def clamp_unit(cls, value: Any) -> float:
+        try:
+            return min(1.0, max(0.0, float(value)))
+        except (TypeError, ValueError):
+            return 0.5
+
+    @field_validator("ai_emotion", "user_emotion", mode="before")
+    @classmethod
+    def normalize_emotion(cls, value: Any) -> Optional[str]:
+        if not isinstance(value, str) or not value.strip():
+            return None
+        return value.strip().lower()
+
+    @field_validator("memory_note", mode="before")
+    @classmethod
+    def normalize_note(cls, value: Any) -> Optional[str]:
+        if not isinstance(value, str) or not value.strip():
+            return None
+        return value.strip()[:MEMORY_NOTE_MAX_LENGTH]
+
+
+def response_schema(emotions: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    JSON Schema of TurnResponse for structured output, with the character's
+    emotions as an enum. Passed as Ollama's `format`, the model can only
+    produce matching JSON (until max_tokens cuts it).
+
+    A copy on every call - the caller (or its HTTP client) may change it.
+    """
+    return copy.deepcopy(_response_schema(emotions))
+
+
+@lru_cache(maxsize=128)
+def _response_schema(emotions: Tuple[str, ...]) -> Dict[str, Any]:
+    unit = {"type": "number", "minimum": 0, "maximum": 1}
+    emotion = {"type": "string", "enum": list(emotions)} if emotions else {"type": "string"}
+    return {
+        "type": "object",
+        "properties": {
+            # First, so a cut-off reply still has its text
+            "response": {"type": "string"},
+            "ai_emotion": emotion,
+            "ai_emotion_intensity": unit,
+            "ai_emotion_confidence": unit,
+            "user_emotion": emotion,
+            "user_emotion_confidence": unit,
+            "user_emotion_intensity": unit,
+            "memory_note": {"type": "string"},
+            "memory_note_importance": unit,
+        },
+        "required": ["response", "ai_emotion", "ai_emotion_intensity", "ai_emotion_confidence", "user_emotion", "user_emotion_confidence", "user_emotion_intensity", "memory_note", "memory_note_importance"],
+    }
+
+
+def parse_turn_response(raw: str) -> Tuple[TurnResponse, str]:
+    """
+    Parse and validate a model reply, salvaging what can be salvaged.
+
+    Fenced, wrapped or truncated JSON is repaired, a reply that is plain
+    text (the model ignored the format) becomes the response itself.
+
+    returns:
+        (response, outcome) - outcome is "ok", "salvaged" or "failed"
+    """
+    data, repaired = loads_tolerant(raw)
+    outcome = "salvaged" if repaired else "ok"
+
+    if isinstance(data, dict):
+        try:
+            result = TurnResponse.model_validate(data)
+        except ValidationError:
+            # Usually a missing or empty response - keep the valid fields
+            text = data.get("response")
+            result = TurnResponse.model_validate({**data, "response": text if isinstance(text, str) and text.strip() else FALLBACK_RESPONSE})
+            outcome = "salvaged" if result.response != FALLBACK_RESPONSE else "failed"
+    elif data is None and raw.strip() and "{" not in raw:
+        result, outcome = TurnResponse(response=raw), "salvaged"
+    else:
+        result, outcome = TurnResponse(response=FALLBACK_RESPONSE), "failed"
+
+    response_parses.inc(labels=(outcome,))
+    if outcome == "failed":
+        logger.warning("Model reply could not be parsed", extra={"raw": raw[:200]})
+    return result, outcome
+
+
+def parse_stats() -> Dict[str, int]:
+    return {outcome: int(response_parses.value((outcome,))) for outcome in ("ok", "salvaged", "failed")}
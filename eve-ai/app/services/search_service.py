@@ -0,0 +1,115 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import MemoryNote, Message
+
+# Marks around matched words in snippets
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+SNIPPET_TOKENS = 24
+# Each term is one more doclist to intersect
+SEARCH_MAX_TERMS = 16
+
+# "quoted phrase" or a bare word, a trailing * on a word makes it a prefix
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+# sort -> (score, ORDER BY) of the FTS query. "relevance" is bm25, which
+# first reads the doclist of every term and of the scope token once for
+# document counts - cost grows with how common they are. "recent" never
+# touches rank, walks the matches newest first and stops at the page,
+# milliseconds at any index size.
+SEARCH_ORDER = {"relevance": ("rank", "rank"), "recent": ("NULL", "rowid DESC")}
+
+
+def _search_statement(fts: str, table: str, columns: str, score: str, order: str, created_at_type):
+    # Page of hits first, then only those rows are joined - FTS5 sorts inside
+    # the virtual table and stops at LIMIT + OFFSET
+    return text(f"""
+        SELECT {columns}, t.created_at, f.snippet, f.rank
+        FROM (
+            SELECT rowid, {score} AS rank, snippet({fts}, 0, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet
+            FROM {fts} WHERE {fts} MATCH :match ORDER BY {order} LIMIT :limit OFFSET :offset
+        ) f JOIN {table} t ON t.id = f.rowid
+        ORDER BY f.{order}
+    """).columns(created_at=created_at_type)
+
+
+_MESSAGE_SEARCH = {
+    sort: _search_statement("message_fts", "message", "t.id, t.conversation_id, t.role, t.emotion", score, order, Message.__table__.c.created_at.type)
+    for sort, (score, order) in SEARCH_ORDER.items()
+}
+_NOTE_SEARCH = {
+    sort: _search_statement("memorynote_fts", "memorynote", "t.id, t.conversation_id, t.importance_score", score, order, MemoryNote.__table__.c.created_at.type)
+    for sort, (score, order) in SEARCH_ORDER.items()
+}
+
+
+def match_expression(query: str, character_id: int, conversation_id: Optional[int] = None, role: Optional[str] = None) -> str:
+    """
+    FTS5 MATCH expression for user text within a scope.
+
+    Words and "quoted phrases" must all match, `word*` matches a prefix.
+    Everything is quoted, so FTS5 operators in the text (AND, NEAR, column
+    filters) are searched for as words, never interpreted.
+
+    The scope is the single narrowest indexed token. A conversation scope
+    does not repeat the character - the caller checks the conversation
+    belongs to it.
+
+    raises:
+        ValueError: no searchable words in the query
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        term = phrase if not word else word.rstrip("*")
+        if not re.search(r"\w", term):
+            continue
+        terms.append('"' + term.replace('"', '""') + '"' + ("*" if word.endswith("*") else ""))
+    if not terms:
+        raise ValueError("Search query has no words")
+    if len(terms) > SEARCH_MAX_TERMS:
+        raise ValueError(f"Search query has more than {SEARCH_MAX_TERMS} terms")
+
+    # Tokens of the indexed scope column, see SEARCH_DDL in app.models.schemas
+    scope = f"ch{character_id}" if conversation_id is None else f"cv{conversation_id}"
+    return f"content : ({' '.join(terms)}) AND scope : {scope}{role or ''}"
+
+
+async def search_messages(session: AsyncSession, query: str, character_id: int, conversation_id: Optional[int] = None, role: Optional[str] = None, limit: int = 20, offset: int = 0, sort: str = "relevance") -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Messages matching the query, best or newest first, with highlighted snippets.
+
+    returns:
+        (hits, has_more)
+    """
+    rows = await _search(session, _MESSAGE_SEARCH, sort, match_expression(query, character_id, conversation_id, role), limit, offset)
+    hits = [
+        {"id": id, "conversation_id": conversation_id, "role": role, "emotion": emotion, "created_at": created_at, "snippet": snippet, "score": _score(rank)}
+        for id, conversation_id, role, emotion, created_at, snippet, rank in rows[:limit]
+    ]
+    return hits, len(rows) > limit
+
+
+async def search_memory_notes(session: AsyncSession, query: str, character_id: int, conversation_id: Optional[int] = None, limit: int = 20, offset: int = 0, sort: str = "relevance") -> Tuple[List[Dict[str, Any]], bool]:
+    """Memory notes matching the query, best or newest first, with highlighted snippets."""
+    rows = await _search(session, _NOTE_SEARCH, sort, match_expression(query, character_id, conversation_id), limit, offset)
+    hits = [
+        {"id": id, "conversation_id": conversation_id, "importance_score": importance, "created_at": created_at, "snippet": snippet, "score": _score(rank)}
+        for id, conversation_id, importance, created_at, snippet, rank in rows[:limit]
+    ]
+    return hits, len(rows) > limit
+
+
+async def _search(session: AsyncSession, statements: Dict[str, Any], sort: str, match: str, limit: int, offset: int) -> List[Any]:
+    if sort not in statements:
+        raise ValueError(f"Invalid sort: {sort}")
+    # One row past the page tells whether there is a next one, without counting all matches
+    params = {"match": match, "open": HIGHLIGHT_OPEN, "close": HIGHLIGHT_CLOSE, "limit": limit + 1, "offset": offset}
+    return (await session.exec(statements[sort], params=params)).all()
+
+
+def _score(rank: Optional[float]) -> Optional[float]:
+    """bm25 rank is negative, lower is better - reported as a positive score, higher is better."""
+    # Not rounded - a word in most rows of a small index scores close to 0
+    return None if rank is None else -rank
@@ -0,0 +1,195 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import LLM_CONTEXT_WINDOW, SUMMARY_BATCH_MESSAGES, SUMMARY_MAX_WORDS, SUMMARY_PASS_MESSAGES
+from app.core.log import get_logger
+from app.models.database import async_engine
+from app.models.schemas import Conversation, Message
+from app.services.config_service import config_service
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.llm_providers import ProviderRegistry
+from app.services.metrics import observe_generation
+from app.utils.token_counter import estimate_message_tokens, estimate_tokens
+
+logger = get_logger("summary")
+
+
+class ConversationSummarizer:
+    """
+    Folds history that left the prompt window into a rolling summary.
+
+    After every turn the conversation is scheduled. A single background
+    worker checks whether more than conversation_memory_length + batch
+    messages are not summarized yet, and if so asks the LLM to merge the
+    oldest ones into Conversation.summary. The prompt then carries the
+    summary plus only the messages after summary_until_id, so its size stays
+    about the same however long the conversation gets.
+
+    A pass reads at most pass_messages + conversation_memory_length rows and
+    folds no more than fit the prompt budget, so a long backlog is worked
+    off oldest first in several calls, each advancing summary_until_id.
+
+    Generation runs in the scheduler's background lane and the turn only
+    enqueues an ID, so summarizing never adds to turn latency.
+    """
+
+    def __init__(self, providers: ProviderRegistry, scheduler: GenerationScheduler, session_factory: Optional[Callable[[], AsyncSession]] = None, batch: int = SUMMARY_BATCH_MESSAGES, max_words: int = SUMMARY_MAX_WORDS, pass_messages: int = SUMMARY_PASS_MESSAGES, context_window: int = LLM_CONTEXT_WINDOW):
+        self.providers = providers
+        self.scheduler = scheduler
+        self.session_factory = session_factory or (lambda: AsyncSession(async_engine, expire_on_commit=False))
+        self.batch = batch
+        self.max_words = max_words
+        self.pass_messages = max(batch, pass_messages)
+        self.context_window = context_window
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.summarized = 0
+        self.failed = 0
+
+    # =========== WORKER ===========
+    def start(self) -> None:
+        """Start the background worker on the running event loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def schedule(self, conversation_id: int) -> None:
+        """Check the conversation in the background. No-op if the worker is not running."""
+        if self._queue is None or conversation_id in self._pending:
+            return
+        self._pending.add(conversation_id)
+        self._queue.put_nowait(conversation_id)
+
+    async def _run(self) -> None:
+        while True:
+            conversation_id = await self._queue.get()
+            self._pending.discard(conversation_id)
+            try:
+                await self.summarize(conversation_id)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Summarizing failed", extra={"conversation_id": conversation_id, "error": repr(e)})
+
+    async def aclose(self) -> None:
+        """Stop the worker. Unfinished summaries are redone after the next turn."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+        self._pending.clear()
+
+    # =========== SUMMARIZING ===========
+    async def summarize(self, conversation_id: int) -> bool:
+        """
+        Fold old messages of a conversation into its summary if enough piled
+        up, pass after pass until fewer than a batch are left.
+
+        returns:
+            True if a new summary was stored
+        """
+        summarized = False
+        while await self._summarize_pass(conversation_id):
+            summarized = True
+        return summarized
+
+    async def _summarize_pass(self, conversation_id: int) -> bool:
+        cfg = config_service.get_runtime_config()
+        keep = max(2, cfg.conversation_memory_length)
+
+        async with self.session_factory() as session:
+            conversation = (await session.exec(
+                select(Conversation)
+                .where(Conversation.id == conversation_id)
+                .options(joinedload(Conversation.character), joinedload(Conversation.user))
+            )).first()
+            if conversation is None:
+                return False
+
+            # Oldest unsummarized first - with a longer backlog the first
+            # pass_messages are older than the last `keep` anyway
+            messages = (await session.exec(
+                select(Message)
+                .where(Message.conversation_id == conversation_id, Message.id > conversation.summary_until_id)
+                .order_by(Message.id)
+                .limit(self.pass_messages + keep)
+            )).all()
+            if len(messages) < keep + self.batch:
+                return False
+
+            evicted = self.fit_budget(conversation, messages[:len(messages) - keep], cfg.max_tokens)
+            prompt = self.build_prompt(conversation, evicted)
+            since_id = conversation.summary_until_id
+
+        # No connection or read transaction is held while the model runs
+        async with self.scheduler.background_slot():
+            result = await self.providers.get(cfg.mode).chat(prompt, cfg, json_format=False)
+        observe_generation(result.eval_count, result.eval_duration, source="summary")
+
+        async with self.session_factory() as session:
+            # Compare-and-set - a deleted conversation or a concurrent pass wins
+            updated = await session.exec(
+                update(Conversation)
+                .where(Conversation.id == conversation_id, Conversation.summary_until_id == since_id)
+                .values(summary=result.content.strip(), summary_until_id=evicted[-1].id)
+            )
+            await session.commit()
+
+        if updated.rowcount != 1:
+            return False
+        self.summarized += 1
+        logger.info("Conversation summarized", extra={"conversation_id": conversation_id, "messages": len(evicted), "until_id": evicted[-1].id})
+        return True
+
+    def fit_budget(self, conversation: Conversation, messages: List[Message], max_tokens: int) -> List[Message]:
+        """
+        Oldest messages whose transcript fits the prompt next to the previous
+        summary, with max_tokens reserved for the reply. At least one, so a
+        pass always makes progress.
+        """
+        budget = max(self.context_window // 4, self.context_window - max_tokens)
+        used = sum(estimate_message_tokens(m["content"]) for m in self.build_prompt(conversation, []))
+        for count, message in enumerate(messages):
+            # Line and newline of the transcript
+            used += estimate_tokens(self.transcript_line(conversation, message)) + 1
+            if used > budget:
+                return messages[:max(1, count)]
+        return messages
+
+    def build_prompt(self, conversation: Conversation, messages: List[Message]) -> List[Dict[str, str]]:
+        """Chat messages asking to merge the previous summary with older messages."""
+        transcript = "\n".join(self.transcript_line(conversation, m) for m in messages)
+        return [
+            {"role": "system", "content": (
+                "You maintain the running summary of a role-play conversation. "
+                "Merge the previous summary with the new messages into one updated summary. "
+                "Keep facts, names, promises, feelings and unresolved threads, drop small talk. "
+                f"Write plain prose in the third person, at most {self.max_words} words. "
+                "Reply with the summary only."
+            )},
+            {"role": "user", "content": f"Previous summary:\n{conversation.summary or 'None yet'}\n\nNew messages:\n{transcript}"},
+        ]
+
+    @staticmethod
+    def transcript_line(conversation: Conversation, message: Message) -> str:
+        name = {"user": conversation.user.name, "assistant": conversation.character.name}.get(message.role, message.role)
+        return f"{name}: {message.content}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "pending": len(self._pending),
+            "summarized": self.summarized,
+            "failed": self.failed,
+        }
@@ -0,0 +1,141 @@
+import logging
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+from app.core.config import TRACE_SAMPLE_RATE, TRACE_SLOW_TURN_MS
+from app.core.log import get_logger
+from app.services.llm_providers import LLMResult
+from app.services.metrics import turn_stage_duration
+
+logger = get_logger("trace")
+
+
+class LatencyHistogram:
+    """Recent samples of one stage in milliseconds, summarized as percentiles."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self._samples.append(ms)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self._samples:
+            return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+        ordered = sorted(self._samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+        return {"count": self.count, "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 2)}
+
+
+class Trace:
+    """
+    Stage timings of one operation, e.g. a chat turn.
+
+    Stages are measured with span() or recorded directly when the duration
+    comes from elsewhere (Ollama's prompt_eval_duration). A repeated stage
+    adds up. Nothing is recorded unless a Tracer finishes the trace, so a
+    bare Trace works as a no-op default.
+    """
+
+    def __init__(self, name: str, **fields: Any):
+        self.name = name
+        self.fields: Dict[str, Any] = fields
+        self.stages: Dict[str, float] = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def record(self, stage: str, ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def record_llm(self, result: Optional[LLMResult]) -> None:
+        """Split of model time reported by the provider: reading the prompt vs writing the reply."""
+        if result is None:
+            return
+        if result.prompt_eval_duration is not None:
+            self.record("llm_prompt_eval", result.prompt_eval_duration / 1e6)
+        if result.eval_duration is not None:
+            self.record("llm_eval", result.eval_duration / 1e6)
+        self.set(prompt_tokens=result.prompt_eval_count, eval_tokens=result.eval_count)
+
+    def set(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+
+class Tracer:
+    """
+    Collects traces into per-stage latency histograms and logs a sample.
+
+    Every finished trace goes to the histograms. Its structured log line is
+    written for sample_rate of traces, and always for slow or failed ones,
+    so the hot path does not flood stdout.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, slow_ms: float = TRACE_SLOW_TURN_MS, window: int = 1000, sampler: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.window = window
+        self.sampler = sampler
+        self.errors = 0
+        self._histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+
+    @contextmanager
+    def trace(self, name: str, **fields: Any) -> Iterator[Trace]:
+        """Trace the block, finishing it on exit (with the error, if it raised)."""
+        trace = Trace(name, **fields)
+        try:
+            yield trace
+        except BaseException as e:
+            self.finish(trace, error=e)
+            raise
+        self.finish(trace)
+
+    def finish(self, trace: Trace, error: Optional[BaseException] = None) -> None:
+        total = trace.elapsed_ms
+        histograms = self._histograms.setdefault(trace.name, {})
+        for stage, ms in [("total", total), *trace.stages.items()]:
+            if stage not in histograms:
+                histograms[stage] = LatencyHistogram(self.window)
+            histograms[stage].add(ms)
+            if trace.name == "turn":
+                turn_stage_duration.observe(ms / 1000, (stage,))
+
+        if error is not None:
+            self.errors += 1
+        if error is None and total < self.slow_ms and self.sampler() >= self.sample_rate:
+            return
+        logger.log(
+            logging.WARNING if error is not None else logging.INFO,
+            trace.name,
+            extra={
+                "total_ms": round(total, 2),
+                "stages_ms": {stage: round(ms, 2) for stage, ms in trace.stages.items()},
+                "error": repr(error) if error is not None else None,
+                **trace.fields,
+            },
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """p50/p95/p99 per stage of each trace name."""
+        return {
+            "sample_rate": self.sample_rate,
+            "errors": self.errors,
+            "traces": {
+                name: {stage: histogram.summary() for stage, histogram in histograms.items()}
+                for name, histograms in self._histograms.items()
+            },
+        }
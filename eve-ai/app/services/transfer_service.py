@@ -0,0 +1,195 @@
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+from sqlalchemy import Connection, DateTime, Engine, Table, func, select
+from sqlalchemy.exc import IntegrityError
+from app.core.log import get_logger
+from app.models.schemas import Character, Conversation, MemoryNote, Message, User
+from app.services.analytics_service import backfill_messages
+
+logger = get_logger("transfer")
+
+FORMAT = "eve-conversations"
+VERSION = 1
+# Lines joined into one chunk - a StreamingResponse pulls a sync generator
+# through the threadpool, one hop per yield
+EXPORT_CHUNK_LINES = 1000
+EXPORT_FETCH_ROWS = 2000
+IMPORT_BATCH_ROWS = 5000
+
+# Record type -> table, in dependency order
+TABLES: Dict[str, Table] = {
+    "conversation": Conversation.__table__,
+    "message": Message.__table__,
+    "memory_note": MemoryNote.__table__,
+}
+
+
+@dataclass
+class ImportResult:
+    conversations: int = 0
+    messages: int = 0
+    memory_notes: int = 0
+
+
+# =========== EXPORT ===========
+# Datetimes go through default=, no per-field type check in Python
+_encoder = json.JSONEncoder(ensure_ascii=False, default=lambda value: value.isoformat())
+
+
+def _encode(keys: Sequence[str], row: Sequence[Any]) -> str:
+    return _encoder.encode(dict(zip(keys, row)))
+
+
+def export_ndjson(engine: Engine, conversation_ids: Optional[Sequence[int]] = None, character_id: Optional[int] = None) -> Iterator[str]:
+    """
+    Export conversations with their messages and memory notes as NDJSON.
+
+    A header line, then per conversation: the conversation, its messages by
+    ID, its memory notes by ID. Rows are fetched in batches from open
+    cursors and written out in chunks of lines, so memory stays constant
+    whatever the size of the dump. Everything is read in one transaction,
+    a consistent snapshot under WAL.
+
+    args:
+        conversation_ids: only these conversations
+        character_id: only conversations of this character
+
+    yields:
+        chunks of complete lines
+    """
+    conversations = select(Conversation.__table__).order_by(Conversation.id)
+    if conversation_ids is not None:
+        conversations = conversations.where(Conversation.id.in_(conversation_ids))
+    if character_id is not None:
+        conversations = conversations.where(Conversation.character_id == character_id)
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(yield_per=EXPORT_FETCH_ROWS)
+        lines: List[str] = [json.dumps({"type": "header", "format": FORMAT, "version": VERSION, "exported_at": datetime.now(timezone.utc).isoformat()})]
+
+        result = conn.execute(conversations)
+        keys = ("type", *result.keys())
+        for conversation in result:
+            lines.append(_encode(keys, ("conversation", *conversation)))
+            for record_type, model in (("message", Message), ("memory_note", MemoryNote)):
+                rows = conn.execute(select(model.__table__).where(model.conversation_id == conversation.id).order_by(model.id))
+                row_keys = ("type", *rows.keys())
+                for row in rows:
+                    lines.append(_encode(row_keys, (record_type, *row)))
+                    if len(lines) >= EXPORT_CHUNK_LINES:
+                        yield "\n".join(lines) + "\n"
+                        lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+
+# =========== IMPORT ===========
+class _Importer:
+    """
+    Maps dump rows to new IDs and inserts them in batches.
+
+    New IDs are old IDs plus the current maximum of the table, so references
+    inside the dump (message -> conversation, note -> message, summary_until_id)
+    are remapped with one addition and no lookup table.
+    """
+
+    def __init__(self, conn: Connection, batch_rows: int):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self.offsets = {name: conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar_one() for name, table in TABLES.items()}
+        self.characters: Set[int] = set(conn.execute(select(Character.id)).scalars())
+        self.users: Set[int] = set(conn.execute(select(User.id)).scalars())
+        self.conversations: Set[int] = set()
+        self.pending: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TABLES}
+        self.datetime_columns = {
+            name: {c.name for c in table.columns if c.type._type_affinity is DateTime}
+            for name, table in TABLES.items()
+        }
+        self.result = ImportResult()
+
+    def add(self, record: Dict[str, Any], line: int) -> None:
+        record_type = record.pop("type", None)
+        table = TABLES.get(record_type)
+        if table is None:
+            raise ValueError(f"Line {line}: unknown record type {record_type!r}")
+        row = {column: record[column] for column in table.columns.keys() if column in record}
+        for column in self.datetime_columns[record_type] & row.keys():
+            if row[column] is not None:
+                value = datetime.fromisoformat(row[column])
+                row[column] = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+        if record_type == "conversation":
+            if row.get("character_id") not in self.characters:
+                raise ValueError(f"Line {line}: unknown character {row.get('character_id')}")
+            if row.get("user_id") not in self.users:
+                raise ValueError(f"Line {line}: unknown user {row.get('user_id')}")
+            self.conversations.add(row["id"])
+            if row.get("summary_until_id"):
+                row["summary_until_id"] += self.offsets["message"]
+        elif row.get("conversation_id") not in self.conversations:
+            raise ValueError(f"Line {line}: {record_type} of a conversation not in the dump")
+        else:
+            row["conversation_id"] += self.offsets["conversation"]
+            if row.get("source_message_id") is not None:
+                row["source_message_id"] += self.offsets["message"]
+
+        row["id"] += self.offsets[record_type]
+        self.pending[record_type].append(row)
+        if len(self.pending[record_type]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        # Parents first - a batch of messages may belong to a conversation still pending
+        for name, table in TABLES.items():
+            rows = self.pending[name]
+            if rows:
+                self.conn.execute(table.insert(), rows)  # executemany
+                setattr(self.result, name + "s", getattr(self.result, name + "s") + len(rows))
+                self.pending[name] = []
+
+
+def import_ndjson(engine: Engine, lines: Iterable[Union[str, bytes]], batch_rows: int = IMPORT_BATCH_ROWS) -> ImportResult:
+    """
+    Import an NDJSON dump written by export_ndjson, in one transaction.
+
+    Conversations get new IDs, so a dump can be imported next to existing
+    data, or twice. Characters and users are referenced by ID and must
+    exist. Lines are read one at a time and inserted with executemany in
+    batches of batch_rows, so the dump is never held in memory. Anything
+    invalid rolls the whole import back.
+
+    Imported messages are added to the analytics rollups in the same
+    transaction, as model "unknown" - dumps do not carry the model.
+
+    raises:
+        ValueError: malformed dump or references to missing rows
+    """
+    with engine.begin() as conn:
+        # Take the write lock before reading the ID offsets, no turn can insert in between
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        importer = _Importer(conn, batch_rows)
+        try:
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Line {number}: invalid JSON ({e.msg})") from e
+                if record.get("type") == "header":
+                    if record.get("format") != FORMAT or record.get("version") != VERSION:
+                        raise ValueError(f"Line {number}: unsupported dump {record.get('format')} v{record.get('version')}")
+                    continue
+                try:
+                    importer.add(record, number)
+                except (KeyError, TypeError) as e:
+                    raise ValueError(f"Line {number}: invalid record ({e!r})") from e
+            importer.flush()
+            backfill_messages(conn, importer.offsets["message"])
+        except IntegrityError as e:
+            raise ValueError(f"Dump references missing rows: {e.orig}") from e
+
+    logger.info("Conversations imported", extra=asdict(importer.result))
+    return importer.result
@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from app.utils.lru_cache import LRUCache
+
+
+class TurnCoordinator:
+    """
+    Serializes chat turns per conversation and dedupes retried sends.
+
+    Turns of one conversation run one at a time, so every turn builds its
+    context from the history committed by the previous one. Turns of
+    different conversations do not share a lock and run in parallel.
+
+    A send may carry an idempotency key. While a turn with that key is
+    running, or shortly after it finished, another send with the same key
+    waits for the same result instead of generating again. Failed turns are
+    forgotten, so a retry after a failure generates normally.
+
+    Locks live in the event loop - this coordinates one worker process.
+    """
+
+    def __init__(self, completed_size: int = 1024):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Turns holding or waiting for each lock, the lock is dropped at zero
+        self._lock_users: Dict[int, int] = {}
+        self._in_flight: Dict[Tuple[int, str], Tuple[str, asyncio.Future]] = {}
+        self._completed: LRUCache[Tuple[int, str], Tuple[str, Any]] = LRUCache(maxsize=completed_size)
+
+    def existing(self, conversation_id: int, idempotency_key: Optional[str], fingerprint: str) -> Optional[asyncio.Future]:
+        """
+        Find a running or finished turn for the idempotency key.
+
+        args:
+            conversation_id: conversation ID
+            idempotency_key: key sent by the client, None never matches
+            fingerprint: request content, must match the original request
+
+        returns:
+            future with the turn result, or None if the caller has to run the turn
+        """
+        if idempotency_key is None:
+            return None
+
+        key = (conversation_id, idempotency_key)
+        entry = self._in_flight.get(key)
+        completed = entry is None
+        if completed:
+            entry = self._completed.get(key)
+            if entry is None:
+                return None
+
+        original_fingerprint, value = entry
+        if original_fingerprint != fingerprint:
+            raise ValueError("Idempotency key was already used for a different message")
+        if not completed:
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        return future
+
+    @asynccontextmanager
+    async def exclusive(self, conversation_id: int, idempotency_key: Optional[str] = None, fingerprint: str = "") -> AsyncIterator[asyncio.Future]:
+        """
+        Run a turn holding the conversation lock.
+
+        The key is registered before waiting for the lock, so retries that
+        arrive while this turn is queued already find it. Set the turn result
+        on the yielded future; if the block raises instead, waiting retries
+        get the error.
+
+        args:
+            conversation_id: conversation ID
+            idempotency_key: key sent by the client (optional)
+            fingerprint: request content, stored with the key
+        """
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        key = (conversation_id, idempotency_key) if idempotency_key is not None else None
+        if key is not None:
+            self._in_flight[key] = (fingerprint, future)
+
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        self._lock_users[conversation_id] = self._lock_users.get(conversation_id, 0) + 1
+        try:
+            async with lock:
+                yield future
+        except BaseException as e:
+            if not future.done():
+                error = e if isinstance(e, Exception) else RuntimeError("Generation was interrupted")
+                future.set_exception(error)
+                # Mark as retrieved - nobody may be waiting
+                future.exception()
+            raise
+        finally:
+            self._lock_users[conversation_id] -= 1
+            if self._lock_users[conversation_id] == 0:
+                del self._lock_users[conversation_id]
+                del self._locks[conversation_id]
+
+            if key is not None:
+                self._in_flight.pop(key, None)
+                if future.done() and not future.exception():
+                    self._completed.put(key, (fingerprint, future.result()))
+                elif not future.done():
+                    future.set_exception(RuntimeError("Turn finished without a result"))
+                    future.exception()
+
+    def is_busy(self, conversation_id: int) -> bool:
+        """True while a turn of the conversation is running or queued."""
+        return conversation_id in self._locks
+
+    def clear(self) -> None:
+        """Forget finished turns (running ones are not affected)."""
+        self._completed.clear()
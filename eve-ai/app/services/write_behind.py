@@ -0,0 +1,175 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import WRITE_BEHIND_FLUSH_MS, WRITE_BEHIND_MAX_BATCH
+from app.core.log import get_logger
+from app.models.database import async_engine
+from app.models.schemas import Character, Conversation, MemoryNote
+from app.services.analytics_service import TurnStats, record_turns
+
+logger = get_logger("write_behind")
+
+
+@dataclass
+class TurnEffects:
+    """Secondary writes of one saved turn. The messages themselves are already committed."""
+    conversation_id: int
+    character_id: int
+    source_message_id: int
+    at: datetime
+    memory_note_content: Optional[str] = None
+    memory_note_importance: float = 0.0
+    # Added to the hourly analytics rollups
+    stats: Optional[TurnStats] = None
+
+
+class WriteBehindWriter:
+    """
+    Batches secondary turn writes off the response path.
+
+    A turn commits its two messages (and message_count) in the request and
+    answers right away. Memory notes, Conversation.last_activity and
+    Character.last_interaction_at and the analytics rollups are handed to
+    this writer, which commits everything submitted within flush_interval
+    in one transaction, across all conversations.
+
+    Crash safety:
+        - Messages and message_count are committed before the reply is
+          sent. With WAL and synchronous=NORMAL they survive a process
+          crash; a power loss can lose the last transactions.
+        - Effects waiting for a flush (at most flush_interval, or until
+          shutdown drains the queue) are lost on a process crash: a memory
+          note and the two activity timestamps of the last turns. The
+          conversation history itself is never lost or left half-written.
+
+    Without a running worker (tests, scripts) effects are written inline.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], AsyncSession]] = None, flush_interval: float = WRITE_BEHIND_FLUSH_MS / 1000, max_batch: int = WRITE_BEHIND_MAX_BATCH, note_threshold: float = 0.85, on_notes: Optional[Callable[[List[MemoryNote]], Awaitable[None]]] = None):
+        self.session_factory = session_factory or (lambda: AsyncSession(async_engine, expire_on_commit=False))
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.note_threshold = note_threshold
+        # Called with committed notes, e.g. to update caches and the memory index
+        self.on_notes = on_notes
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the flush worker on the running event loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, effects: TurnEffects, session: Optional[AsyncSession] = None) -> None:
+        """
+        Queue effects of a turn, or write them now if the worker is not running.
+
+        args:
+            effects: secondary writes of the turn
+            session: request session, used only for inline writes
+        """
+        if self._queue is None:
+            await self.write([effects], session)
+            return
+        self._queue.put_nowait(effects)
+
+    async def _run(self) -> None:
+        # None is the stop marker put by aclose, after everything already queued
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch, stop = [first], False
+            # Collect whatever else arrives within the flush interval
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    effects = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if effects is None:
+                    stop = True
+                    break
+                batch.append(effects)
+            await self.write(batch)
+            if stop:
+                return
+
+    async def write(self, batch: List[TurnEffects], session: Optional[AsyncSession] = None) -> None:
+        """Commit a batch in one transaction. If it fails, retry each turn alone and drop only the failing ones."""
+        try:
+            if session is not None:
+                notes = await self._commit(batch, session)
+            else:
+                async with self.session_factory() as own_session:
+                    notes = await self._commit(batch, own_session)
+        except Exception as e:
+            if session is not None:
+                await session.rollback()
+            if len(batch) == 1:
+                self.failed += 1
+                logger.error("Write-behind failed", extra={"conversation_id": batch[0].conversation_id, "error": repr(e)})
+                return
+            for effects in batch:
+                await self.write([effects], session)
+            return
+
+        self.flushes += 1
+        self.written += len(batch)
+        if notes and self.on_notes is not None:
+            await self.on_notes(notes)
+
+    async def _commit(self, batch: List[TurnEffects], session: AsyncSession) -> List[MemoryNote]:
+        notes = [
+            MemoryNote(
+                conversation_id=e.conversation_id, character_id=e.character_id, content=e.memory_note_content,
+                importance_score=e.memory_note_importance, source_message_id=e.source_message_id,
+            )
+            for e in batch
+            if e.memory_note_content is not None and e.memory_note_importance > self.note_threshold
+        ]
+        # Only the latest timestamp per row is written
+        conversations: Dict[int, datetime] = {}
+        characters: Dict[int, datetime] = {}
+        for e in batch:
+            conversations[e.conversation_id] = max(e.at, conversations.get(e.conversation_id, e.at))
+            characters[e.character_id] = max(e.at, characters.get(e.character_id, e.at))
+
+        session.add_all(notes)
+        for conversation_id, at in conversations.items():
+            await session.exec(update(Conversation).where(Conversation.id == conversation_id).values(last_activity=at))
+        for character_id, at in characters.items():
+            await session.exec(update(Character).where(Character.id == character_id).values(last_interaction_at=at))
+        await record_turns(session, [e.stats for e in batch if e.stats is not None])
+        await session.commit()
+        return notes
+
+    async def aclose(self) -> None:
+        """Stop the worker after writing everything still queued."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+        }
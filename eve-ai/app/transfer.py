@@ -0,0 +1,63 @@
+"""
+Export and import conversations as NDJSON.
+
+Dumps hold conversations with their messages and memory notes. Imported
+conversations get new IDs, characters and users must already exist.
+
+Usage:
+    python -m app.transfer export [--conversation 1 --conversation 2] [--character 1] [-o dump.ndjson]
+    python -m app.transfer import dump.ndjson
+"""
+import argparse
+import sys
+import time
+from dataclasses import asdict
+from app.models.database import DATABASE_URL, make_engine
+from app.services.transfer_service import export_ndjson, import_ndjson
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_URL, help="SQLAlchemy database URL")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write conversations to NDJSON")
+    export.add_argument("--conversation", type=int, action="append", help="Only this conversation, repeatable")
+    export.add_argument("--character", type=int, help="Only conversations of this character")
+    export.add_argument("-o", "--output", default="-", help="Output file, - for stdout")
+
+    load = commands.add_parser("import", help="Add conversations from NDJSON")
+    load.add_argument("input", help="Dump file, - for stdin")
+
+    args = parser.parse_args(argv)
+    engine = make_engine(args.db)
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            try:
+                for chunk in export_ndjson(engine, args.conversation, args.character):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"Exported in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        else:
+            source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+            try:
+                result = import_ndjson(engine, source)
+            except ValueError as e:
+                print(f"Import failed, nothing was written: {e}", file=sys.stderr)
+                return 1
+            finally:
+                if source is not sys.stdin.buffer:
+                    source.close()
+            counts = ", ".join(f"{count} {name}" for name, count in asdict(result).items())
+            print(f"Imported {counts} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_decoder = json.JSONDecoder()
+
+
+def loads_tolerant(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Parse JSON written by a model, salvaging what json.loads rejects.
+
+    Tried in order, cheapest first:
+        1. the text as is (the normal case, a single json.loads)
+        2. the content of a ```json fence
+        3. the first object in the text, ignoring anything around it
+        4. a truncated object, closed after its last complete value
+
+    returns:
+        (value, salvaged) - value is None if nothing could be parsed
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start == -1:
+        return None, False
+    text = text[start:]
+
+    try:
+        value, _ = _decoder.raw_decode(text)
+        return value, True
+    except json.JSONDecodeError:
+        pass
+
+    # A value cut mid-token (`12.`, `tru`) cannot be closed - retry without it
+    for candidate in (text, text[:text.rfind(",")]):
+        closed = close_truncated(candidate)
+        if closed is None:
+            continue
+        try:
+            return json.loads(closed), True
+        except json.JSONDecodeError:
+            pass
+    return None, False
+
+
+def close_truncated(text: str) -> Optional[str]:
+    """
+    Close a JSON document cut off mid-way, e.g. by the token limit.
+
+    An unterminated string is closed, and a dangling comma, key or colon is
+    dropped, then open arrays and objects are closed in order.
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack:
+                return None
+            stack.pop()
+    if not stack:
+        return None
+
+    if in_string:
+        # A cut escape sequence cannot be closed
+        if escaped:
+            text = text[:-1]
+        text += '"'
+    text = text.rstrip()
+    # Drop what has no value yet: `, "key": ` / `, "key"` / a trailing comma
+    text = re.sub(r'(?:,\s*"(?:[^"\\]|\\.)*"\s*:?\s*|,\s*|"(?:[^"\\]|\\.)*"\s*:\s*)$', "", text) if stack[-1] == "}" else text.rstrip(",")
+    return text + "".join(reversed(stack))
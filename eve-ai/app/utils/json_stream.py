@@ -0,0 +1,161 @@
+from typing import List
+
+# Scanner states
+_SCAN = 0          # structural JSON, looking for the target key
+_STRING = 1        # inside a string that is not the target value
+_AWAIT_VALUE = 2   # target key found, waiting for its value
+_VALUE = 3         # inside the target string value - decoded text is emitted
+_DONE = 4          # target value fully read (or it was not a string)
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_HEX = set("0123456789abcdefABCDEF")
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally extract one top-level string field from a JSON object
+    that arrives in chunks (e.g. LLM tokens).
+
+    Only the decoded text of the field is returned by feed(), as soon as
+    it is available. Escape sequences split across chunks are buffered
+    until complete. Everything else in the document is skipped.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.text = ""
+        self._buffer = ""
+        self._pos = 0
+        self._state = _SCAN
+        self._depth = 0
+        self._current: List[str] = []
+        self._last_string = None
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of raw JSON.
+
+        args:
+            chunk: next piece of the JSON document
+
+        returns:
+            newly decoded text of the field (may be empty)
+        """
+        self._buffer += chunk
+        out: List[str] = []
+        buf = self._buffer
+
+        while self._pos < len(buf) and self._state != _DONE:
+            ch = buf[self._pos]
+
+            if self._state in (_STRING, _VALUE):
+                if ch == "\\":
+                    decoded, consumed = self._decode_escape(buf, self._pos)
+                    if consumed == 0:
+                        break  # incomplete escape, wait for more data
+                    self._pos += consumed
+                    self._emit(decoded, out)
+                elif ch == '"':
+                    self._pos += 1
+                    if self._state == _VALUE:
+                        self._state = _DONE
+                    else:
+                        self._last_string = "".join(self._current)
+                        self._state = _SCAN
+                else:
+                    self._pos += 1
+                    self._emit(ch, out)
+
+            elif self._state == _AWAIT_VALUE:
+                self._pos += 1
+                if ch == '"':
+                    self._state = _VALUE
+                elif not ch.isspace():
+                    # Field is not a string (null, number...) - nothing to stream
+                    self._state = _DONE
+
+            else:
+                self._pos += 1
+                if ch == '"':
+                    self._current = []
+                    self._state = _STRING
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                elif ch == ":" and self._depth == 1 and self._last_string == self.field:
+                    self._state = _AWAIT_VALUE
+                elif ch == ",":
+                    self._last_string = None
+
+        # Drop consumed input, keep only what is still needed
+        self._buffer = buf[self._pos:]
+        self._pos = 0
+
+        new_text = "".join(out)
+        self.text += new_text
+        return new_text
+
+    def _emit(self, text: str, out: List[str]) -> None:
+        if self._state == _VALUE:
+            out.append(text)
+        elif self._depth == 1:
+            self._current.append(text)
+
+    @staticmethod
+    def _decode_escape(buf: str, pos: int):
+        """
+        Decode escape sequence at pos. Returns (text, consumed), consumed=0 if incomplete.
+
+        Model output is not always valid JSON: an unknown escape or a \\u
+        without 4 hex digits is passed through as written, an unpaired
+        surrogate becomes U+FFFD. The saved reply is still parsed from the
+        raw text, this only decides what the client sees while it streams.
+        """
+        if pos + 1 >= len(buf):
+            return "", 0
+
+        if buf[pos + 1] != "u":
+            return _ESCAPES.get(buf[pos + 1], buf[pos:pos + 2]), 2
+
+        code, complete = _hex4(buf, pos + 2)
+        if code is None:
+            return ("", 0) if not complete else ("\\u", 2)
+
+        if 0xDC00 <= code <= 0xDFFF:
+            return "\ufffd", 6
+        if not 0xD800 <= code <= 0xDBFF:
+            return chr(code), 6
+
+        # High surrogate - needs its low pair to make one character
+        pair = buf[pos + 6:pos + 8]
+        if pair != "\\u"[:len(pair)]:
+            return "\ufffd", 6
+        if len(pair) < 2:
+            return "", 0
+        low, complete = _hex4(buf, pos + 8)
+        if low is None:
+            return ("", 0) if not complete else ("\ufffd", 6)
+        if not 0xDC00 <= low <= 0xDFFF:
+            return "\ufffd", 6
+        return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+
+
+def _hex4(buf: str, pos: int):
+    """
+    Read the 4 hex digits of a \\u escape at pos.
+
+    returns:
+        (code, complete) - code is None if the digits are invalid
+        (complete=True) or not all here yet (complete=False)
+    """
+    digits = buf[pos:pos + 4]
+    if any(ch not in _HEX for ch in digits):
+        return None, True
+    if len(digits) < 4:
+        return None, False
+    return int(digits, 16), True
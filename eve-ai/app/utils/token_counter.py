@@ -0,0 +1,25 @@
+import re
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Chat templates add role markers and separators around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast approximation of the token count of text.
+
+    Every word and punctuation mark is one token, long words get one more
+    token per 8 characters. Close to BPE tokenizers on English and Polish
+    text (slightly over, which is the safe side for budgeting) and much
+    cheaper than running a real tokenizer.
+    """
+    if not text:
+        return 0
+    return sum(1 + (len(piece) >> 3) for piece in _PIECE_RE.findall(text))
+
+
+def estimate_message_tokens(content: str) -> int:
+    """Tokens of one chat message including template overhead."""
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,279 @@
+"""
+Benchmark: end-to-end API throughput, latency and SQL statements per request.
+
+Runs the FastAPI app in-process (httpx ASGITransport, no network) on a
+temporary database seeded with synthetic history. Generations go to the
+fake Ollama server with a configurable latency and token rate, and the
+write-behind and summary workers run like in the app. Each scenario sends
+a number of requests from concurrent clients and reports throughput,
+p50/p99 latency and SQL statements per request (background writes are
+counted separately).
+
+Results are written as JSON together with the commit, so a run can be
+compared with the results of another commit.
+
+Usage:
+    python -m benchmarks.e2e [--concurrency 16] [--requests 200] [--output e2e.json]
+    python -m benchmarks.e2e --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from ollama import AsyncClient
+from sqlalchemy import Engine, event, select
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.api import chat
+from app.core.config import API_VERSION
+from app.core.log import setup_logging
+from app.main import app
+from app.models.database import get_async_session, get_engine, make_async_engine, make_engine
+from app.models.schemas import Config, Conversation
+from app.models.synthetic import SyntheticGenerator, SyntheticSpec
+from app.services.ai_service import AI_Service
+from app.services.config_service import config_service
+from app.services.llm_providers import OllamaProvider, ProviderRegistry
+from app.services.memory_service import MemoryService, OllamaEmbedder
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaSettings
+
+PREFIX = f"/api/{API_VERSION}"
+# Metrics compared between runs, and whether higher is better
+COMPARED = {"throughput_rps": True, "p50_ms": False, "p99_ms": False, "queries_per_request": False}
+
+# Statements of the request being handled - None outside requests (background workers)
+_request_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("request_queries", default=None)
+
+
+class QueryCounter:
+    """Counts SQL statements per request, through a context variable the client sets around each call."""
+
+    def __init__(self, *engines: Engine):
+        self.background = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        counter = _request_queries.get()
+        if counter is None:
+            self.background += 1
+        else:
+            counter[0] += 1
+
+
+# Scenario: name -> (method, path, body) for the n-th request, given the seeded IDs
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+SCENARIOS: Dict[str, Callable[[int, List[Tuple[int, int]]], Request]] = {
+    "send_message": lambda n, conversations: ("POST", "/chat/{}/{}".format(*conversations[n % len(conversations)]), {"content": f"Tell me about your day, part {n}."}),
+    "get_chat_history": lambda n, conversations: ("GET", "/chat/{}/{}/messages?limit=50&sort_desc=true".format(*conversations[n % len(conversations)]), None),
+    "list_characters": lambda n, conversations: ("GET", "/characters", None),
+    "get_character": lambda n, conversations: ("GET", f"/characters/{conversations[n % len(conversations)][0]}", None),
+    "get_config": lambda n, conversations: ("GET", "/config", None),
+    "update_config": lambda n, conversations: ("PATCH", "/config", {"temperature": round(0.5 + n % 5 / 10, 1)}),
+    "search_messages": lambda n, conversations: ("GET", "/characters/{}/search?q={}&limit=20".format(conversations[n % len(conversations)][0], SEARCH_QUERIES[n % len(SEARCH_QUERIES)]), None),
+}
+# Words of the synthetic corpus, common to rare-ish, a phrase and a prefix
+SEARCH_QUERIES = ("coffee", "rain night", "favourite book", '"good morning"', "mount*", "strange dream")
+
+
+def seed(engine: Engine, args) -> List[Tuple[int, int]]:
+    """Config plus synthetic characters and history. Returns (character_id, conversation_id) pairs."""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Config(id=1, mode="local", model_name="bench-model"))
+        session.commit()
+    SyntheticGenerator(engine, SyntheticSpec(
+        characters=args.characters, users=2, conversations=args.conversations, messages=args.history, seed=args.seed,
+    )).run()
+    with Session(engine) as session:
+        config_service.load_from_db(session)
+        return [tuple(row) for row in session.execute(select(Conversation.character_id, Conversation.id).order_by(Conversation.id))]
+
+
+async def run_scenario(client: httpx.AsyncClient, counter: QueryCounter, name: str, conversations: List[Tuple[int, int]], args) -> Dict[str, Any]:
+    make_request = SCENARIOS[name]
+    latencies: List[float] = []
+    queries: List[int] = []
+    statuses: Dict[str, int] = {}
+    next_request = 0
+
+    async def call(n: int, record: bool) -> None:
+        method, path, body = make_request(n, conversations)
+        count = [0]
+        token = _request_queries.set(count)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, PREFIX + path, json=body)
+        finally:
+            _request_queries.reset(token)
+        if record:
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(count[0])
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    async def worker() -> None:
+        nonlocal next_request
+        while next_request < args.requests:
+            n, next_request = next_request, next_request + 1
+            await call(n, record=True)
+
+    for n in range(args.warmup):
+        await call(args.requests + n, record=False)
+    background = counter.background
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": pick(0.5),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 2),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "queries_max": max(queries),
+        # Write-behind flushes and summaries started by these requests, may finish later
+        "background_queries": counter.background - background,
+    }
+
+
+async def run_suite(args) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        engine = make_engine(f"sqlite:///{path}")
+        conversations = seed(engine, args)
+        async_engine = make_async_engine(f"sqlite+aiosqlite:///{path}")
+        counter = QueryCounter(engine, async_engine.sync_engine)
+
+        fake = FakeOllama(FakeOllamaSettings(
+            base_latency_ms=args.llm_latency_ms, tokens_per_second=args.tokens_per_second,
+            prompt_eval_ms_per_token=args.prompt_eval_ms_per_token, load_ms=0,
+        ))
+        ollama = AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+        service = AI_Service(
+            ProviderRegistry({"local": OllamaProvider(client=ollama)}),
+            memory=MemoryService(OllamaEmbedder(client=ollama), index_dir=tmp),
+        )
+        session_factory = lambda: AsyncSession(async_engine, expire_on_commit=False)
+        service.writer.session_factory = session_factory
+        service.summarizer.session_factory = session_factory
+
+        async def override_session():
+            async with session_factory() as session:
+                yield session
+
+        previous = chat.ai_service
+        chat.ai_service = service
+        app.dependency_overrides[get_async_session] = override_session
+        app.dependency_overrides[get_engine] = lambda: engine
+        service.writer.start()
+        service.summarizer.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                results = []
+                for name in args.scenarios:
+                    results.append(await run_scenario(client, counter, name, conversations, args))
+                    print(f"  {name}: {results[-1]['throughput_rps']} req/s", file=sys.stderr)
+        finally:
+            await service.aclose()
+            chat.ai_service = previous
+            app.dependency_overrides.clear()
+            await async_engine.dispose()
+            engine.dispose()
+        return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print changes per scenario against a baseline run. Returns True if any metric regressed past threshold."""
+    before = {s["scenario"]: s for s in baseline["scenarios"]}
+    print(f"\nCompared with {(baseline.get('commit') or 'unknown')[:12]} (regression threshold {threshold:.0%}):")
+    print(f"{'SCENARIO':<20}" + "".join(f"{metric:>26}" for metric in COMPARED))
+    regressed = False
+    for result in current["scenarios"]:
+        old = before.get(result["scenario"])
+        if old is None:
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED.items():
+            change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else "  "
+            regressed |= worse > threshold
+            cells.append(f"{old[metric]:>9} -> {result[metric]:>9}{flag}")
+        print(f"{result['scenario']:<20}" + "".join(f"{cell:>26}" for cell in cells))
+    return regressed
+
+
+def run(args) -> int:
+    print(f"{args.characters} characters, {args.conversations} conversations x ~{args.history} messages, "
+          f"{args.requests} requests per scenario, {args.concurrency} concurrent clients", file=sys.stderr)
+    results = asyncio.run(run_suite(args))
+    report = {
+        "benchmark": "e2e",
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "threshold", "verbose")},
+        "scenarios": results,
+    }
+
+    columns = ["throughput_rps", "p50_ms", "p99_ms", "queries_per_request", "background_queries", "errors"]
+    print(f"\n{'SCENARIO':<20}" + "".join(f"{c:>21}" for c in columns))
+    print("=" * (20 + 21 * len(columns)))
+    for result in results:
+        print(f"{result['scenario']:<20}" + "".join(f"{result[c]:>21}" for c in columns))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        return 1 if compare(report, json.loads(Path(args.compare).read_text()), args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="Scenarios to run, in order")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--characters", type=int, default=5, help="Seeded characters")
+    parser.add_argument("--conversations", type=int, default=50, help="Seeded conversations")
+    parser.add_argument("--history", type=int, default=200, help="Mean seeded messages per conversation")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Fake Ollama latency before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake Ollama generation rate")
+    parser.add_argument("--prompt-eval-ms-per-token", type=float, default=0.05, help="Fake Ollama prompt reading cost")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression with --compare")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's info logs, e.g. one line per chat turn")
+    args = parser.parse_args()
+    if not args.verbose:
+        setup_logging("WARNING")
+    sys.exit(run(args))
@@ -0,0 +1,261 @@
+"""
+Deterministic fake Ollama server for benchmarks and offline tests.
+
+Implements the parts of the Ollama HTTP API the app uses (/api/chat,
+streaming and non-streaming, /api/embed with hashed bag-of-words
+vectors) and an OpenAI-compatible
+/v1/chat/completions for the remote provider. Timings are simulated,
+not measured:
+
+    - prompt evaluation costs `prompt_eval_ms_per_token` for every prompt token
+      that is not covered by the cached prefix of the previous request
+      for the same model (like llama.cpp's KV cache reuse),
+    - generation costs 1 / `tokens_per_second` per output token,
+    - loading a model costs `load_ms` when it is not resident, i.e. first
+      request or `keep_alive` expired since the previous one.
+
+Run standalone:
+    uvicorn benchmarks.fake_ollama:app --port 11435
+    OLLAMA_HOST=http://127.0.0.1:11435 uv run dev
+
+Or in-process:
+    AsyncClient(transport=httpx.ASGITransport(app=FakeOllama().app))
+"""
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.memory_service import HashingEmbedder
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h)?$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Rough tokenizer - words and punctuation, good enough to simulate prefix reuse."""
+    return _TOKEN_RE.findall(text)
+
+
+def parse_keep_alive(value: Any, default: float = 300.0) -> float:
+    """Convert Ollama keep_alive ("5m", "30s", 0, -1) to seconds. Negative means forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION_RE.match(str(value).strip())
+    if not match:
+        return default
+    number, unit = float(match.group(1)), match.group(2) or "s"
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+@dataclass
+class FakeOllamaSettings:
+    prompt_eval_ms_per_token: float = 0.5
+    tokens_per_second: float = 200.0
+    load_ms: float = 50.0
+    # Fixed latency added to every request, before the first token
+    base_latency_ms: float = 0.0
+    # Scale all simulated delays; 0 answers instantly but still reports durations
+    time_scale: float = 1.0
+    # Failure injection: answer the next N requests with this status code
+    fail_next: int = 0
+    fail_status: int = 503
+    # OpenAI-compatible endpoint requires "Authorization: Bearer <key>" when set
+    api_key: Optional[str] = None
+    reply: Dict[str, Any] = field(default_factory=lambda: {
+        "response": "That sounds lovely, tell me more!",
+        "ai_emotion": "joyful",
+        "ai_emotion_intensity": 0.6,
+        "ai_emotion_confidence": 0.9,
+        "user_emotion": "content",
+        "user_emotion_confidence": 0.7,
+        "user_emotion_intensity": 0.5,
+        "memory_note": None,
+        "memory_note_importance": 0.2,
+    })
+
+
+@dataclass
+class _ModelState:
+    cached_tokens: List[str] = field(default_factory=list)
+    expires_at: float = 0.0
+
+
+class FakeOllama:
+    """Fake server state - keeps KV cache per model and a log of every request."""
+
+    def __init__(self, settings: Optional[FakeOllamaSettings] = None):
+        self.settings = settings or FakeOllamaSettings()
+        self.requests: List[Dict[str, Any]] = []
+        self._models: Dict[str, _ModelState] = {}
+        self._lock = asyncio.Lock()
+        self._embedder = HashingEmbedder()
+        self.app = self._build_app()
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self._models.clear()
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Ollama")
+
+        @app.get("/api/version")
+        async def version():
+            return {"version": "0.0.0-fake"}
+
+        @app.post("/api/chat")
+        async def chat(request: Request):
+            body = await request.json()
+            if failure := self._injected_failure():
+                return failure
+            stats, content = await self._run(body)
+            if body.get("stream", True):
+                return StreamingResponse(self._stream(stats, content), media_type="application/x-ndjson")
+            await asyncio.sleep(stats["eval_duration"] / 1e9 * self.settings.time_scale)
+            return JSONResponse(self._final(stats, content))
+
+        @app.post("/api/embed")
+        async def embed(request: Request):
+            body = await request.json()
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            vectors = await self._embedder.embed(texts)
+            return {"model": body.get("model"), "embeddings": vectors.tolist()}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            if self.settings.api_key and request.headers.get("authorization") != f"Bearer {self.settings.api_key}":
+                return JSONResponse({"error": {"message": "Invalid API key"}}, status_code=401)
+            body = await request.json()
+            if failure := self._injected_failure():
+                return failure
+            stats, content = await self._run({
+                "model": body.get("model"),
+                "messages": body.get("messages", []),
+                "format": (body.get("response_format") or {}).get("type") == "json_object",
+                "keep_alive": -1,
+            })
+            if body.get("stream"):
+                return StreamingResponse(self._stream_openai(stats, content), media_type="text/event-stream")
+            await asyncio.sleep(stats["eval_duration"] / 1e9 * self.settings.time_scale)
+            return JSONResponse({
+                "id": f"chatcmpl-{len(self.requests)}",
+                "object": "chat.completion",
+                "model": stats["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": self._usage(stats),
+            })
+
+        return app
+
+    def _injected_failure(self) -> Optional[JSONResponse]:
+        if self.settings.fail_next <= 0:
+            return None
+        self.settings.fail_next -= 1
+        self.requests.append({"failed": self.settings.fail_status})
+        return JSONResponse({"error": "injected failure"}, status_code=self.settings.fail_status, headers={"Retry-After": "0"})
+
+    @staticmethod
+    def _usage(stats: Dict[str, Any]) -> Dict[str, int]:
+        return {
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["eval_count"],
+            "total_tokens": stats["prompt_tokens"] + stats["eval_count"],
+        }
+
+    async def _stream_openai(self, stats: Dict[str, Any], content: str):
+        delay = 1 / self.settings.tokens_per_second * self.settings.time_scale
+        for chunk in self._chunks(content):
+            await asyncio.sleep(delay)
+            yield "data: " + json.dumps({"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": chunk}}]}) + "\n\n"
+        yield "data: " + json.dumps({"object": "chat.completion.chunk", "choices": [], "usage": self._usage(stats)}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def _run(self, body: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Simulate load + prompt evaluation, return timing stats and reply content."""
+        s = self.settings
+        model = body.get("model", "")
+        prompt_tokens = []
+        for message in body.get("messages", []):
+            prompt_tokens += [f"<{message.get('role')}>"] + tokenize(message.get("content", ""))
+
+        # One KV cache slot per model; requests for a model are evaluated one at a time
+        async with self._lock:
+            now = time.monotonic()
+            state = self._models.get(model)
+            load_ms = 0.0
+            if state is None or (state.expires_at >= 0 and now > state.expires_at):
+                state = _ModelState()
+                self._models[model] = state
+                load_ms = s.load_ms
+
+            reused = 0
+            for cached, token in zip(state.cached_tokens, prompt_tokens):
+                if cached != token:
+                    break
+                reused += 1
+            evaluated = len(prompt_tokens) - reused
+            prompt_eval_ms = evaluated * s.prompt_eval_ms_per_token
+            await asyncio.sleep((load_ms + prompt_eval_ms + s.base_latency_ms) / 1000 * s.time_scale)
+
+            content = json.dumps(s.reply) if body.get("format") else s.reply["response"]
+            state.cached_tokens = prompt_tokens + tokenize(content)
+            keep_alive = parse_keep_alive(body.get("keep_alive"))
+            state.expires_at = -1 if keep_alive < 0 else time.monotonic() + keep_alive
+
+        eval_count = len(self._chunks(content))
+        stats = {
+            "model": model,
+            "prompt_tokens": len(prompt_tokens),
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(prompt_eval_ms * 1e6),
+            "load_duration": int(load_ms * 1e6),
+            "reused_tokens": reused,
+            "eval_count": eval_count,
+            "eval_duration": int(eval_count / s.tokens_per_second * 1e9),
+        }
+        self.requests.append(stats)
+        return stats, content
+
+    @staticmethod
+    def _chunks(content: str) -> List[str]:
+        """Split reply into streamed pieces - one per simulated output token."""
+        return re.findall(r"\s*\S+", content) or [content]
+
+    async def _stream(self, stats: Dict[str, Any], content: str):
+        delay = 1 / self.settings.tokens_per_second * self.settings.time_scale
+        for chunk in self._chunks(content):
+            await asyncio.sleep(delay)
+            yield json.dumps({
+                "model": stats["model"],
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": chunk},
+                "done": False,
+            }) + "\n"
+        yield json.dumps(self._final(stats, "")) + "\n"
+
+    @staticmethod
+    def _final(stats: Dict[str, Any], content: str) -> Dict[str, Any]:
+        return {
+            "model": stats["model"],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": stats["load_duration"] + stats["prompt_eval_duration"] + stats["eval_duration"],
+            "load_duration": stats["load_duration"],
+            "prompt_eval_count": stats["prompt_eval_count"],
+            "prompt_eval_duration": stats["prompt_eval_duration"],
+            "eval_count": stats["eval_count"],
+            "eval_duration": stats["eval_duration"],
+        }
+
+
+fake_ollama = FakeOllama()
+app = fake_ollama.app
@@ -0,0 +1,140 @@
+"""
+Benchmark: message history pagination on a long conversation.
+
+Compares OFFSET pagination and keyset (before_id) pagination, with and
+without the (conversation_id, created_at, id) index.
+
+Usage:
+    python -m benchmarks.history_pagination [--messages 100000]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List
+from sqlalchemy import func, insert, text, tuple_
+from sqlmodel import Session, SQLModel, asc, create_engine, desc, select
+from app.models.schemas import Character, Conversation, Message, User
+
+INDEX_NAME = "idx_message_conversation_created"
+
+
+def populate(engine, messages: int) -> int:
+    """Create one long conversation (plus a noisy neighbour) using bulk inserts."""
+    with Session(engine) as session:
+        user = User(name="bench")
+        character = Character(name="bench")
+        session.add_all([user, character])
+        session.flush()
+        target = Conversation(character_id=character.id, user_id=user.id)
+        noise = Conversation(character_id=character.id, user_id=user.id)
+        session.add_all([target, noise])
+        session.commit()
+        target_id, noise_id = target.id, noise.id
+
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(messages * 2):
+            # Interleave both conversations, like real traffic
+            batch.append({
+                "conversation_id": target_id if i % 2 == 0 else noise_id,
+                "role": "user" if i % 4 < 2 else "assistant",
+                "content": f"message {i} " + "lorem ipsum " * 10,
+                "language": "en",
+                "emotion_intensity": 0.5,
+                "created_at": start + timedelta(seconds=i),
+            })
+            if len(batch) == 10_000:
+                conn.execute(insert(Message), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Message), batch)
+        conn.execute(text("UPDATE conversation SET message_count = :n WHERE id = :id"), {"n": messages, "id": target_id})
+    return target_id
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def offset_page(session: Session, conversation_id: int, offset: int, limit: int) -> List[Message]:
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    session.exec(select(func.count()).select_from(query.subquery())).one()
+    return session.exec(query.order_by(desc(Message.created_at), desc(Message.id)).offset(offset).limit(limit)).all()
+
+
+def keyset_page(session: Session, conversation_id: int, before_id: int, limit: int) -> List[Message]:
+    anchor = session.get(Message, before_id)
+    query = (
+        select(Message)
+        .where(Message.conversation_id == conversation_id)
+        .where(tuple_(Message.created_at, Message.id) < tuple_(anchor.created_at, anchor.id))
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(limit + 1)
+    )
+    return session.exec(query).all()
+
+
+def recent_context(session: Session, conversation_id: int, limit: int) -> List[Message]:
+    query = (
+        select(Message)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(limit)
+    )
+    return session.exec(query).all()
+
+
+def run(messages: int, limit: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+
+        print(f"Populating {messages} messages...")
+        conversation_id = populate(engine, messages)
+
+        with Session(engine) as session:
+            ids = session.exec(
+                select(Message.id).where(Message.conversation_id == conversation_id).order_by(asc(Message.created_at), asc(Message.id))
+            ).all()
+        # The same page both ways: scrolling back (newest first) to the oldest messages
+        deep_offset = len(ids) - limit
+        before_id = ids[limit]
+
+        results = {}
+        for with_index in (False, True):
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+                if with_index:
+                    conn.execute(text(f"CREATE INDEX {INDEX_NAME} ON message (conversation_id, created_at, id)"))
+                conn.execute(text("ANALYZE"))
+
+            label = "index" if with_index else "no index"
+            with Session(engine) as session:
+                results[f"offset, oldest page ({label})"] = timed(lambda: offset_page(session, conversation_id, deep_offset, limit), repeat)
+                results[f"keyset, oldest page ({label})"] = timed(lambda: keyset_page(session, conversation_id, before_id, limit), repeat)
+                results[f"recent context ({label})"] = timed(lambda: recent_context(session, conversation_id, 10), repeat)
+
+        engine.dispose()
+
+    print(f"\n{'CASE':<36} {'MEDIAN MS':>10}")
+    print("=" * 48)
+    for name, ms in results.items():
+        print(f"{name:<36} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000, help="Messages in the benchmarked conversation")
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=10, help="Samples per case")
+    args = parser.parse_args()
+    run(args.messages, args.limit, args.repeat)
@@ -0,0 +1,109 @@
+"""
+Benchmark: prompt prefix cache reuse across chat turns.
+
+Runs the same scripted conversation through AI_Service against the fake
+Ollama server for each prompt layout and keep_alive setting, and reports
+simulated prompt_eval_duration / load_duration per turn.
+
+Usage:
+    python -m benchmarks.prompt_cache [--turns 30]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+from pathlib import Path
+import httpx
+from ollama import AsyncClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.database import make_async_engine
+from app.models.schemas import Character, Config, Conversation, User
+from app.services.ai_service import AI_Service
+from app.services.config_service import config_service
+from app.services.llm_providers import OllamaProvider, ProviderRegistry
+from app.services.memory_service import MemoryService, OllamaEmbedder
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaSettings
+
+SCENARIOS = [
+    ("summary", "30m"),
+    ("stable_prefix", "30m"),
+    ("stable_prefix", 0),
+]
+
+USER_LINES = [
+    "Hi! How was your day?",
+    "I spent the afternoon fixing my bike, the chain kept slipping.",
+    "Do you know anything about gear ratios?",
+    "My sister says I should just buy a new one, but I like repairing things.",
+    "What do you like doing when it rains?",
+]
+
+
+def create_database(path: Path):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Config(id=1, model_name="bench-model", conversation_memory_length=10))
+        user = User(name="Alice", profile_json='{"likes": ["cycling", "tea"], "dislikes": ["noise"]}')
+        character = Character(
+            name="Luna",
+            description="A cheerful and curious AI companion",
+            personality="Friendly, enthusiastic and playful. " * 5,
+            world_context="A modern digital world where AI and humans work together. " * 5,
+        )
+        session.add_all([user, character])
+        session.flush()
+        session.add(Conversation(character_id=character.id, user_id=user.id))
+        session.commit()
+        config_service.load_from_db(session)
+    return engine
+
+
+async def run_scenario(mode: str, keep_alive, turns: int, settings: FakeOllamaSettings):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_database(Path(tmp) / "bench.db")
+        fake = FakeOllama(settings)
+        client = AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+        service = AI_Service(
+            ProviderRegistry({"local": OllamaProvider(client=client, keep_alive=keep_alive)}),
+            prompt_mode=mode,
+            memory=MemoryService(OllamaEmbedder(client=client), index_dir=tmp),
+        )
+
+        async_engine = make_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            for turn in range(turns):
+                await service.generate_response(USER_LINES[turn % len(USER_LINES)], 1, session)
+                if keep_alive == 0:
+                    # Real Ollama unloads right after the reply; give the fake server a moment to expire it
+                    await asyncio.sleep(0.001)
+        await async_engine.dispose()
+        engine.dispose()
+        return fake.requests
+
+
+def run(turns: int) -> None:
+    # time_scale=0 - report simulated durations without actually waiting for them
+    settings = FakeOllamaSettings(prompt_eval_ms_per_token=0.5, load_ms=1500, time_scale=0)
+
+    print(f"\n{'MODE':<15} {'KEEP_ALIVE':<11} {'PROMPT TOK':>10} {'EVAL TOK':>9} {'P50 PROMPT_EVAL MS':>19} {'TOTAL LOAD MS':>14}")
+    print("=" * 82)
+    for mode, keep_alive in SCENARIOS:
+        requests = asyncio.run(run_scenario(mode, keep_alive, turns, settings))
+        # First turn is a cold start for every scenario, compare steady state
+        steady = requests[1:]
+        print(
+            f"{mode:<15} {str(keep_alive):<11} "
+            f"{statistics.median(r['prompt_tokens'] for r in steady):>10.0f} "
+            f"{statistics.median(r['prompt_eval_count'] for r in steady):>9.0f} "
+            f"{statistics.median(r['prompt_eval_duration'] for r in steady) / 1e6:>19.1f} "
+            f"{sum(r['load_duration'] for r in requests) / 1e6:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30, help="Chat turns per scenario")
+    args = parser.parse_args()
+    run(args.turns)
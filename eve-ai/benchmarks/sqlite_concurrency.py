@@ -0,0 +1,151 @@
+"""
+Benchmark: concurrent chat writes and history reads on SQLite.
+
+Writer threads save chat turns (two messages + conversation counter, one
+commit, like AI_Service._save_turn) while reader threads page through
+history, for a fixed time. Compares the previous storage setup (rollback
+journal, default pool, foreign_keys only) with the tuned engine from
+app.models.database (WAL, synchronous=NORMAL, busy_timeout, cache/mmap,
+pool sized for the threadpool).
+
+Usage:
+    python -m benchmarks.sqlite_concurrency [--writers 4] [--readers 16] [--seconds 5]
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from sqlalchemy import insert, update
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, desc, select
+from app.models.database import make_engine
+from app.models.schemas import Character, Conversation, Message, User
+
+# Storage setup before tuning: only foreign keys, SQLAlchemy's default pool
+LEGACY = {"pragmas": {"foreign_keys": "ON"}, "pool_size": 5, "max_overflow": 10}
+TUNED: Dict = {}
+
+
+def populate(engine, conversations: int, messages: int) -> List[int]:
+    with Session(engine) as session:
+        user = User(name="bench")
+        character = Character(name="bench")
+        session.add_all([user, character])
+        session.flush()
+        rows = [Conversation(character_id=character.id, user_id=user.id) for _ in range(conversations)]
+        session.add_all(rows)
+        session.commit()
+        ids = [c.id for c in rows]
+
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    with engine.begin() as conn:
+        conn.execute(insert(Message), [
+            {
+                "conversation_id": ids[i % conversations],
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"message {i} " + "lorem ipsum " * 10,
+                "language": "en",
+                "emotion_intensity": 0.5,
+                "created_at": start + timedelta(seconds=i),
+            }
+            for i in range(conversations * messages)
+        ])
+        conn.execute(update(Conversation).values(message_count=messages))
+    return ids
+
+
+def save_turn(engine, conversation_id: int, n: int) -> None:
+    with Session(engine) as session:
+        session.add(Message(conversation_id=conversation_id, role="user", content=f"turn {n}"))
+        session.add(Message(conversation_id=conversation_id, role="assistant", content=f"reply {n} " + "lorem ipsum " * 20))
+        session.exec(update(Conversation).where(Conversation.id == conversation_id).values(message_count=Conversation.message_count + 2))
+        session.commit()
+
+
+def read_page(engine, conversation_id: int, n: int) -> None:
+    with Session(engine) as session:
+        session.exec(
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(desc(Message.created_at), desc(Message.id))
+            .limit(50)
+        ).all()
+
+
+def worker(fn, engine, ids: List[int], offset: int, deadline: float, latencies: List[float], errors: List[str]) -> None:
+    n = offset
+    while time.perf_counter() < deadline:
+        n += 1
+        start = time.perf_counter()
+        try:
+            fn(engine, ids[n % len(ids)], n)
+        except OperationalError as e:
+            errors.append(str(e.orig))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+def run_case(name: str, options: Dict, args) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        options = dict(options)
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", options.pop("pragmas", None), **options)
+        SQLModel.metadata.create_all(engine)
+        ids = populate(engine, args.conversations, args.messages)
+
+        writes: List[float] = []
+        reads: List[float] = []
+        errors: List[str] = []
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=worker, args=(save_turn, engine, ids, i * 1000, deadline, writes, errors)) for i in range(args.writers)]
+        threads += [threading.Thread(target=worker, args=(read_page, engine, ids, i, deadline, reads, errors)) for i in range(args.readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        "case": name,
+        "writes/s": len(writes) / args.seconds,
+        "reads/s": len(reads) / args.seconds,
+        "write p50": statistics.median(writes) * 1000 if writes else None,
+        "write p99": percentile(writes, 0.99),
+        "read p50": statistics.median(reads) * 1000 if reads else None,
+        "read p99": percentile(reads, 0.99),
+        "locked": sum("locked" in e for e in errors),
+    }
+
+
+def run(args) -> None:
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds}s per case, "
+          f"{args.conversations} conversations x {args.messages} messages")
+    results = [run_case("legacy (rollback journal)", LEGACY, args), run_case("tuned (WAL)", TUNED, args)]
+
+    columns = ["writes/s", "reads/s", "write p50", "write p99", "read p50", "read p99", "locked"]
+    print(f"\n{'CASE':<28}" + "".join(f"{c:>11}" for c in columns))
+    print("=" * (28 + 11 * len(columns)))
+    for result in results:
+        cells = "".join(f"{'-':>11}" if result[c] is None else f"{result[c]:>11.1f}" if isinstance(result[c], float) else f"{result[c]:>11}" for c in columns)
+        print(f"{result['case']:<28}{cells}")
+    print("\nLatencies in ms.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4, help="Threads saving chat turns")
+    parser.add_argument("--readers", type=int, default=16, help="Threads reading history pages")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each case")
+    parser.add_argument("--conversations", type=int, default=20, help="Conversations in the database")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per conversation")
+    run(parser.parse_args())
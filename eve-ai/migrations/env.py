@@ -29,6 +29,11 @@ from app.models import schemas
 
 target_metadata = SQLModel.metadata
 
+
+def include_name(name, type_, parent_names):
+    """Skip FTS5 tables and their shadow tables in autogenerate, they are created by raw DDL."""
+    return not (type_ == "table" and name.startswith(schemas.SEARCH_TABLES))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -51,6 +56,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -74,7 +80,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
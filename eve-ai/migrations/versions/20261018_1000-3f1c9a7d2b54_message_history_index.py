@@ -0,0 +1,28 @@
+"""message history index
+
+Revision ID: 3f1c9a7d2b54
+Revises: e88e6a6da0ff
+Create Date: 2026-10-18 10:00:12.481305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b54'
+down_revision: Union[str, Sequence[str], None] = 'e88e6a6da0ff'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_message_conversation_created', 'message', ['conversation_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_message_conversation_created', table_name='message')
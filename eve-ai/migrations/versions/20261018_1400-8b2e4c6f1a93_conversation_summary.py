@@ -0,0 +1,32 @@
+"""conversation summary
+
+Revision ID: 8b2e4c6f1a93
+Revises: 3f1c9a7d2b54
+Create Date: 2026-10-18 14:00:41.902317
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4c6f1a93'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('conversation') as batch_op:
+        batch_op.add_column(sa.Column('summary', sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default=''))
+        batch_op.add_column(sa.Column('summary_until_id', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('conversation') as batch_op:
+        batch_op.drop_column('summary_until_id')
+        batch_op.drop_column('summary')
@@ -0,0 +1,91 @@
+"""analytics rollups
+
+Revision ID: c47d9e2a8f15
+Revises: 8b2e4c6f1a93
+Create Date: 2026-10-18 16:00:27.516094
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d9e2a8f15'
+down_revision: Union[str, Sequence[str], None] = '8b2e4c6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Copy of app.services.analytics_service.ROLLUP_LATENCY_BUCKETS_MS at this revision
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000, 120000)
+# Same text as stored DateTime values, truncated to the hour
+HOUR = "strftime('%Y-%m-%d %H:00:00.000000', m.created_at)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('generation_rollup',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('model_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('generation_ms_sum', sa.Integer(), nullable=False),
+    sa.Column('tokens_sum', sa.Integer(), nullable=False),
+    sa.Column('token_generation_ms_sum', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'character_id', 'model_name')
+    )
+    op.create_index('idx_generation_rollup_character', 'generation_rollup', ['character_id', 'hour'], unique=False)
+    op.create_table('latency_rollup',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('model_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'character_id', 'model_name', 'bucket')
+    )
+    op.create_table('emotion_rollup',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('role', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('emotion', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('intensity_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'character_id', 'role', 'emotion')
+    )
+
+    # Backfill from existing messages. The model of old messages is not known.
+    bucket = "CASE " + " ".join(
+        f"WHEN COALESCE(m.generation_time_ms, 0) <= {bound} THEN {index}" for index, bound in enumerate(LATENCY_BUCKETS_MS)
+    ) + f" ELSE {len(LATENCY_BUCKETS_MS)} END"
+    op.execute(f"""
+        INSERT INTO generation_rollup (hour, character_id, model_name, messages, generation_ms_sum, tokens_sum, token_generation_ms_sum)
+        SELECT {HOUR}, c.character_id, 'unknown', COUNT(*), COALESCE(SUM(m.generation_time_ms), 0),
+               COALESCE(SUM(CASE WHEN m.token_count > 0 THEN m.token_count END), 0),
+               COALESCE(SUM(CASE WHEN m.token_count > 0 THEN m.generation_time_ms END), 0)
+        FROM message m JOIN conversation c ON c.id = m.conversation_id
+        WHERE m.role = 'assistant'
+        GROUP BY 1, 2
+    """)
+    op.execute(f"""
+        INSERT INTO latency_rollup (hour, character_id, model_name, bucket, messages)
+        SELECT {HOUR}, c.character_id, 'unknown', {bucket}, COUNT(*)
+        FROM message m JOIN conversation c ON c.id = m.conversation_id
+        WHERE m.role = 'assistant'
+        GROUP BY 1, 2, 4
+    """)
+    op.execute(f"""
+        INSERT INTO emotion_rollup (hour, character_id, role, emotion, messages, intensity_sum)
+        SELECT {HOUR}, c.character_id, m.role, m.emotion, COUNT(*), SUM(m.emotion_intensity)
+        FROM message m JOIN conversation c ON c.id = m.conversation_id
+        WHERE m.emotion IS NOT NULL AND m.role IN ('user', 'assistant')
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('emotion_rollup')
+    op.drop_table('latency_rollup')
+    op.drop_index('idx_generation_rollup_character', table_name='generation_rollup')
+    op.drop_table('generation_rollup')
@@ -0,0 +1,63 @@
+"""message search
+
+Revision ID: 5d3a7e91c0b2
+Revises: c47d9e2a8f15
+Create Date: 2026-10-18 18:00:12.204517
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3a7e91c0b2'
+down_revision: Union[str, Sequence[str], None] = 'c47d9e2a8f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Copy of app.models.schemas.SEARCH_DDL / SEARCH_DROP_DDL at this revision
+SEARCH_DDL = [
+    "CREATE VIEW IF NOT EXISTS message_fts_source AS SELECT m.id, m.content, 'ch' || c.character_id || ' ch' || c.character_id || m.role || ' cv' || m.conversation_id || ' cv' || m.conversation_id || m.role AS scope FROM message m JOIN conversation c ON c.id = m.conversation_id",
+    "CREATE VIEW IF NOT EXISTS memorynote_fts_source AS SELECT n.id, n.content, 'ch' || n.character_id || ' cv' || n.conversation_id AS scope FROM memorynote n",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content, scope, content='message_fts_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memorynote_fts USING fts5(content, scope, content='memorynote_fts_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO message_fts(message_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    "INSERT INTO memorynote_fts(memorynote_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN INSERT INTO message_fts(rowid, content, scope) SELECT new.id, new.content, 'ch' || c.character_id || ' ch' || c.character_id || new.role || ' cv' || new.conversation_id || ' cv' || new.conversation_id || new.role FROM conversation c WHERE c.id = new.conversation_id; END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN INSERT INTO message_fts(message_fts, rowid, content, scope) SELECT 'delete', old.id, old.content, 'ch' || c.character_id || ' ch' || c.character_id || old.role || ' cv' || old.conversation_id || ' cv' || old.conversation_id || old.role FROM conversation c WHERE c.id = old.conversation_id; END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF content, role, conversation_id ON message BEGIN INSERT INTO message_fts(message_fts, rowid, content, scope) SELECT 'delete', old.id, old.content, 'ch' || c.character_id || ' ch' || c.character_id || old.role || ' cv' || old.conversation_id || ' cv' || old.conversation_id || old.role FROM conversation c WHERE c.id = old.conversation_id; INSERT INTO message_fts(rowid, content, scope) SELECT new.id, new.content, 'ch' || c.character_id || ' ch' || c.character_id || new.role || ' cv' || new.conversation_id || ' cv' || new.conversation_id || new.role FROM conversation c WHERE c.id = new.conversation_id; END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_fts_delete BEFORE DELETE ON conversation BEGIN INSERT INTO message_fts(message_fts, rowid, content, scope) SELECT 'delete', m.id, m.content, 'ch' || old.character_id || ' ch' || old.character_id || m.role || ' cv' || m.conversation_id || ' cv' || m.conversation_id || m.role FROM message m WHERE m.conversation_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS conversation_fts_update AFTER UPDATE OF character_id ON conversation BEGIN INSERT INTO message_fts(message_fts, rowid, content, scope) SELECT 'delete', m.id, m.content, 'ch' || old.character_id || ' ch' || old.character_id || m.role || ' cv' || m.conversation_id || ' cv' || m.conversation_id || m.role FROM message m WHERE m.conversation_id = old.id; INSERT INTO message_fts(rowid, content, scope) SELECT m.id, m.content, 'ch' || new.character_id || ' ch' || new.character_id || m.role || ' cv' || m.conversation_id || ' cv' || m.conversation_id || m.role FROM message m WHERE m.conversation_id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS memorynote_fts_insert AFTER INSERT ON memorynote BEGIN INSERT INTO memorynote_fts(rowid, content, scope) VALUES (new.id, new.content, 'ch' || new.character_id || ' cv' || new.conversation_id); END",
+    "CREATE TRIGGER IF NOT EXISTS memorynote_fts_delete AFTER DELETE ON memorynote BEGIN INSERT INTO memorynote_fts(memorynote_fts, rowid, content, scope) VALUES ('delete', old.id, old.content, 'ch' || old.character_id || ' cv' || old.conversation_id); END",
+    "CREATE TRIGGER IF NOT EXISTS memorynote_fts_update AFTER UPDATE OF content, character_id, conversation_id ON memorynote BEGIN INSERT INTO memorynote_fts(memorynote_fts, rowid, content, scope) VALUES ('delete', old.id, old.content, 'ch' || old.character_id || ' cv' || old.conversation_id); INSERT INTO memorynote_fts(rowid, content, scope) VALUES (new.id, new.content, 'ch' || new.character_id || ' cv' || new.conversation_id); END",
+]
+SEARCH_DROP_DDL = [
+    'DROP TRIGGER IF EXISTS message_fts_insert',
+    'DROP TRIGGER IF EXISTS message_fts_delete',
+    'DROP TRIGGER IF EXISTS message_fts_update',
+    'DROP TRIGGER IF EXISTS conversation_fts_delete',
+    'DROP TRIGGER IF EXISTS conversation_fts_update',
+    'DROP TRIGGER IF EXISTS memorynote_fts_insert',
+    'DROP TRIGGER IF EXISTS memorynote_fts_delete',
+    'DROP TRIGGER IF EXISTS memorynote_fts_update',
+    'DROP TABLE IF EXISTS message_fts',
+    'DROP TABLE IF EXISTS memorynote_fts',
+    'DROP VIEW IF EXISTS message_fts_source',
+    'DROP VIEW IF EXISTS memorynote_fts_source',
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    # Index existing rows, read back through the source views
+    op.execute("INSERT INTO message_fts(message_fts) VALUES ('rebuild')")
+    op.execute("INSERT INTO memorynote_fts(memorynote_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for statement in SEARCH_DROP_DDL:
+        op.execute(statement)
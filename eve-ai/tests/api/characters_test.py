@@ -0,0 +1,71 @@
+import asyncio
+import httpx
+import pytest
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import API_VERSION
+from app.main import app
+from app.models.database import get_async_session
+from app.models.schemas import MemoryNote, Message
+
+BASE = f"/api/{API_VERSION}/characters"
+
+
+@pytest.fixture
+def api(seeded_engine, async_engine):
+    with Session(seeded_engine) as session:
+        session.add_all([Message(conversation_id=1 + i % 2, role="assistant", content=f"Rainy day number {i}, perfect for tea.") for i in range(5)])
+        session.flush()
+        session.add(MemoryNote(conversation_id=1, character_id=1, content="Alice loves rainy evenings", importance_score=0.9))
+        session.commit()
+
+    async def override_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    yield seeded_engine
+    app.dependency_overrides.clear()
+
+
+def get(path: str, **params) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(BASE + path, params=params)
+    return asyncio.run(send())
+
+
+def test_search_pages_through_hits(api):
+    first = get("/1/search", q="rainy tea", limit=3)
+    
+    assert first.status_code == 200
+    body = first.json()
+    assert body["has_more"] is True
+    assert len(body["hits"]) == 3
+    assert "<mark>Rainy</mark>" in body["hits"][0]["snippet"]
+    assert "importance_score" not in body["hits"][0]
+    
+    rest = get("/1/search", q="rainy tea", limit=3, offset=3).json()
+    assert rest["has_more"] is False
+    assert {hit["id"] for hit in body["hits"] + rest["hits"]} == {1, 2, 3, 4, 5}
+    
+    scoped = get("/1/search", q="rainy", conversation_id=2).json()
+    assert {hit["conversation_id"] for hit in scoped["hits"]} == {2}
+    
+    recent = get("/1/search", q="rainy", sort="recent", limit=2).json()
+    assert [hit["id"] for hit in recent["hits"]] == [5, 4]
+    assert "score" not in recent["hits"][0]
+
+
+def test_search_memory_notes(api):
+    hits = get("/1/search", q="rain*", kind="memory_notes").json()["hits"]
+    
+    assert [hit["importance_score"] for hit in hits] == [0.9]
+
+
+def test_search_errors(api):
+    assert get("/99/search", q="rainy").status_code == 404
+    assert get("/1/search", q="rainy", conversation_id=99).status_code == 404
+    assert get("/1/search", q="???").status_code == 400
+    assert get("/1/search", q="rainy", kind="everything").status_code == 422
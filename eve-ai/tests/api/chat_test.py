@@ -0,0 +1,505 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+import pytest
+import httpx
+from ollama import ChatResponse, Message as OllamaMessage
+from sqlalchemy import event
+from sqlmodel import Session, select
+from app.api import chat
+from app.core.config import API_VERSION
+from app.main import app
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.database import get_async_session
+from app.models.schemas import Conversation, Message
+from app.services.config_service import config_service
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.llm_providers import OllamaProvider, ProviderRegistry
+from app.services.tracing import Tracer
+
+
+LLM_DELAY_S = 0.3
+
+
+class SlowFakeClient:
+    """Fake ollama.AsyncClient that sleeps like a real generation and tracks overlap."""
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+    
+    async def chat(self, **kwargs) -> ChatResponse:
+        self.calls += 1
+        self.last_request = kwargs
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        content = json.dumps({"response": "Hello!", "ai_emotion": "neutral", "ai_emotion_confidence": 0.9})
+        return ChatResponse(model="test-model", message=OllamaMessage(role="assistant", content=content), eval_count=3)
+
+
+def use_scheduler(monkeypatch, **kwargs):
+    """Give the service a fresh scheduler with the given limits."""
+    scheduler = GenerationScheduler(**kwargs)
+    monkeypatch.setattr(chat.ai_service, "scheduler", scheduler)
+    return scheduler
+
+
+def use_client(monkeypatch, client):
+    """Route local generations to a fake ollama client."""
+    monkeypatch.setattr(chat.ai_service, "providers", ProviderRegistry({"local": OllamaProvider(client=client)}))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = SlowFakeClient(LLM_DELAY_S)
+    use_client(monkeypatch, client)
+    return client
+
+
+@pytest.fixture
+def api(seeded_engine, async_engine):
+    async def override_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    
+    with Session(seeded_engine) as session:
+        config_service.load_from_db(session)
+    
+    app.dependency_overrides[get_async_session] = override_session
+    yield seeded_engine
+    app.dependency_overrides.clear()
+
+
+async def _send_concurrently(conversation_ids, bodies=None):
+    bodies = bodies or [{"content": "Hi!"}] * len(conversation_ids)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[
+            client.post(f"/api/{API_VERSION}/chat/1/{conversation_id}", json=body)
+            for conversation_id, body in zip(conversation_ids, bodies)
+        ])
+
+
+class TestSendMessageConcurrency:
+    """Load tests for the async generation path."""
+    
+    def test_concurrent_requests_overlap(self, api, fake_client, monkeypatch):
+        """Generations for different conversations run at the same time on one worker."""
+        conversation_ids = [1, 2, 3, 4, 5]
+        use_scheduler(monkeypatch, max_concurrent=len(conversation_ids))
+        
+        start = time.perf_counter()
+        responses = asyncio.run(_send_concurrently(conversation_ids))
+        elapsed = time.perf_counter() - start
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert fake_client.max_in_flight == len(conversation_ids)
+        # Serialized generations would take len * delay
+        assert elapsed < LLM_DELAY_S * 2
+    
+    def test_health_check_not_blocked_by_generation(self, api, fake_client):
+        """Health check answers while a generation is still running."""
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                send = asyncio.create_task(client.post(f"/api/{API_VERSION}/chat/1/1", json={"content": "Hi!"}))
+                await asyncio.sleep(LLM_DELAY_S / 3)
+                
+                start = time.perf_counter()
+                health = await client.get(f"/api/{API_VERSION}/analytics/health")
+                health_latency = time.perf_counter() - start
+                
+                return health, health_latency, await send
+        
+        health, health_latency, sent = asyncio.run(scenario())
+        
+        assert health.status_code == 200
+        assert sent.status_code == 200
+        assert health_latency < LLM_DELAY_S / 2
+    
+    def test_turn_is_persisted(self, api, fake_client):
+        """Both messages are saved and the counter is updated."""
+        responses = asyncio.run(_send_concurrently([1]))
+        
+        assert responses[0].status_code == 200
+        assert responses[0].json()["content"] == "Hello!"
+        with Session(api) as session:
+            messages = session.exec(select(Message).where(Message.conversation_id == 1)).all()
+            conversation = session.get(Conversation, 1)
+        assert [m.role for m in messages] == ["user", "assistant"]
+        assert conversation.message_count == 2
+    
+    def test_reply_is_schema_constrained(self, api, fake_client):
+        """Ollama gets the reply schema with the character's emotions, the model's emotion is kept."""
+        asyncio.run(_send_concurrently([1]))
+        
+        schema = fake_client.last_request["format"]
+        assert "neutral" in schema["properties"]["ai_emotion"]["enum"]
+        assert schema["required"][0] == "response"
+        with Session(api) as session:
+            ai_msg = session.exec(select(Message).where(Message.role == "assistant")).one()
+        assert ai_msg.emotion == "neutral" and ai_msg.emotion_confidence == 0.9
+    
+    def test_turn_stages_are_traced(self, api, fake_client, monkeypatch):
+        """Every stage of a turn lands in the latency histograms."""
+        monkeypatch.setattr(chat.ai_service, "tracer", Tracer(sample_rate=0))
+        asyncio.run(_send_concurrently([1]))
+        
+        async def fetch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(f"/api/{API_VERSION}/analytics/latency")
+        
+        stages = asyncio.run(fetch()).json()["traces"]["turn"]
+        for stage in ("total", "turn_wait", "context_load", "memory_retrieval", "prompt_build", "queue_wait", "llm", "parse", "commit"):
+            assert stages[stage]["count"] == 1
+        assert stages["llm"]["p50_ms"] >= LLM_DELAY_S * 1000
+    
+    def test_metrics_endpoint(self, api, fake_client):
+        """Prometheus scrape has per-route requests, turn stages, tokens and runtime gauges."""
+        asyncio.run(_send_concurrently([1]))
+        
+        async def fetch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(f"/api/{API_VERSION}/analytics/metrics")
+        
+        response = asyncio.run(fetch())
+        text = response.text
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert f'eve_http_requests_total{{method="POST",route="/api/{API_VERSION}/chat/{{character_id}}/{{conversation_id}}",status="200"}}' in text
+        assert 'eve_turn_stage_duration_seconds_count{stage="llm"}' in text
+        assert 'eve_llm_generated_tokens_total{source="turn"}' in text
+        assert 'eve_generations{state="queued"} 0' in text
+        assert 'eve_cache_hit_ratio{cache="context"}' in text
+    
+    def test_turns_feed_analytics_rollups(self, api, fake_client):
+        """Saved turns are counted in the hourly rollups behind /analytics/stats."""
+        asyncio.run(_send_concurrently([1, 2]))
+        
+        async def fetch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                latency = await client.get(f"/api/{API_VERSION}/analytics/stats/latency", params={"group_by": "model"})
+                emotions = await client.get(f"/api/{API_VERSION}/analytics/stats/emotions")
+                activity = await client.get(f"/api/{API_VERSION}/analytics/stats/activity", params={"interval": "day"})
+                invalid = await client.get(f"/api/{API_VERSION}/analytics/stats/activity", params={"interval": "week"})
+                return latency, emotions, activity, invalid
+        
+        latency, emotions, activity, invalid = asyncio.run(fetch())
+        
+        [group] = latency.json()["groups"]
+        assert group["model_name"] == config_service.get_runtime_config().model_name
+        assert group["messages"] == 2 and group["tokens"] == 6
+        assert group["p50_ms"] is not None
+        assert sum(e["messages"] for e in emotions.json()["emotions"]) == 2
+        assert [p["messages"] for p in activity.json()["periods"]] == [2]
+        assert invalid.status_code == 422
+
+
+class TestGenerationScheduler:
+    """Admission control for concurrent generations."""
+    
+    def test_concurrency_is_capped(self, api, fake_client, monkeypatch):
+        scheduler = use_scheduler(monkeypatch, max_concurrent=2, max_queue=10)
+        
+        responses = asyncio.run(_send_concurrently([1, 2, 3, 4, 5]))
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert fake_client.max_in_flight == 2
+        stats = scheduler.stats()
+        assert stats["completed"] == 5 and stats["running"] == 0 and stats["queued"] == 0
+        assert stats["wait_time"]["max_ms"] >= LLM_DELAY_S * 1000
+    
+    def test_full_queue_is_rejected_with_retry_after(self, api, fake_client, monkeypatch):
+        use_scheduler(monkeypatch, max_concurrent=1, max_queue=1)
+        
+        responses = asyncio.run(_send_concurrently([1, 2, 3]))
+        
+        assert sorted(r.status_code for r in responses) == [200, 200, 429]
+        rejected = next(r for r in responses if r.status_code == 429)
+        assert int(rejected.headers["Retry-After"]) >= 1
+        with Session(api) as session:
+            assert sum(session.get(Conversation, i).message_count for i in (1, 2, 3)) == 4
+    
+    def test_queue_timeout_is_503(self, api, fake_client, monkeypatch):
+        use_scheduler(monkeypatch, max_concurrent=1, max_queue=5, max_wait=LLM_DELAY_S / 3)
+        
+        responses = asyncio.run(_send_concurrently([1, 2]))
+        
+        assert sorted(r.status_code for r in responses) == [200, 503]
+        assert "Retry-After" in next(r for r in responses if r.status_code == 503).headers
+    
+    def test_stats_are_exposed_in_analytics(self, api, fake_client, monkeypatch):
+        use_scheduler(monkeypatch, max_concurrent=3)
+        asyncio.run(_send_concurrently([1]))
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(f"/api/{API_VERSION}/analytics/generation")
+        
+        stats = asyncio.run(scenario()).json()
+        
+        assert stats["max_concurrent"] == 3
+        assert stats["completed"] == 1
+        assert stats["run_time"]["p50_ms"] >= LLM_DELAY_S * 1000
+
+
+class TestSameConversationSends:
+    """Concurrent sends to one conversation: serialized, retries deduplicated."""
+    
+    def _saved(self, engine, conversation_id=1):
+        with Session(engine) as session:
+            messages = session.exec(select(Message).where(Message.conversation_id == conversation_id).order_by(Message.id)).all()
+            return messages, session.get(Conversation, conversation_id).message_count
+    
+    def test_different_messages_run_one_at_a_time(self, api, fake_client):
+        """Second turn starts after the first is saved, no update is lost."""
+        responses = asyncio.run(_send_concurrently([1, 1], [{"content": "First"}, {"content": "Second"}]))
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert fake_client.calls == 2
+        assert fake_client.max_in_flight == 1
+        messages, message_count = self._saved(api)
+        assert [m.role for m in messages] == ["user", "assistant", "user", "assistant"]
+        assert message_count == 4
+    
+    def test_retries_share_one_generation(self, api, fake_client):
+        """Sends with the same idempotency key get the same message from one LLM call."""
+        body = {"content": "Hi!", "idempotency_key": "abc"}
+        responses = asyncio.run(_send_concurrently([1, 1, 1], [body] * 3))
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert len({r.json()["id"] for r in responses}) == 1
+        assert fake_client.calls == 1
+        messages, message_count = self._saved(api)
+        assert len(messages) == 2
+        assert message_count == 2
+    
+    def test_late_retry_returns_finished_turn(self, api, fake_client):
+        """Retry after the turn finished does not generate again."""
+        body = {"content": "Hi!", "idempotency_key": "abc"}
+        first = asyncio.run(_send_concurrently([1], [body]))[0]
+        retry = asyncio.run(_send_concurrently([1], [body]))[0]
+        
+        assert retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+        assert fake_client.calls == 1
+    
+    def test_key_reused_for_other_message_is_rejected(self, api, fake_client):
+        first = asyncio.run(_send_concurrently([1], [{"content": "Hi!", "idempotency_key": "abc"}]))[0]
+        other = asyncio.run(_send_concurrently([1], [{"content": "Bye!", "idempotency_key": "abc"}]))[0]
+        
+        assert first.status_code == 200
+        assert other.status_code == 400
+        assert fake_client.calls == 1
+    
+    def test_keys_are_scoped_to_conversation(self, api, fake_client):
+        body = {"content": "Hi!", "idempotency_key": "abc"}
+        responses = asyncio.run(_send_concurrently([1, 2], [body, body]))
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert fake_client.calls == 2
+        assert fake_client.max_in_flight == 2
+
+
+class StreamingFakeClient:
+    """Fake ollama.AsyncClient that streams a JSON envelope (or raw text) in small chunks."""
+    
+    def __init__(self, envelope, chunk_size: int = 4):
+        self.document = envelope if isinstance(envelope, str) else json.dumps(envelope)
+        self.chunk_size = chunk_size
+    
+    async def chat(self, stream: bool = False, **kwargs):
+        assert stream
+        
+        async def parts():
+            for i in range(0, len(self.document), self.chunk_size):
+                await asyncio.sleep(0)
+                yield ChatResponse(model="test-model", message=OllamaMessage(role="assistant", content=self.document[i:i + self.chunk_size]), done=False)
+            yield ChatResponse(model="test-model", message=OllamaMessage(role="assistant", content=""), done=True, eval_count=12)
+        
+        return parts()
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStreamMessage:
+    """Tests for the SSE streaming endpoint."""
+    
+    def test_stream_tokens_then_done(self, api, monkeypatch):
+        """Response text streams as tokens, emotion and memory arrive with the final event."""
+        envelope = {"response": "Nice to see you again!", "ai_emotion": "neutral", "memory_note": "User came back", "memory_note_importance": 0.9}
+        use_client(monkeypatch, StreamingFakeClient(envelope))
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(f"/api/{API_VERSION}/chat/1/1/stream", json={"content": "Hi!"})
+        
+        response = asyncio.run(scenario())
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        tokens = [data["text"] for event, data in events if event == "token"]
+        assert len(tokens) > 1
+        assert "".join(tokens) == envelope["response"]
+        
+        event, done = events[-1]
+        assert event == "done"
+        assert done["content"] == envelope["response"]
+        assert done["memory_note"] == "User came back"
+        
+        with Session(api) as session:
+            messages = session.exec(select(Message).where(Message.conversation_id == 1)).all()
+            conversation = session.get(Conversation, 1)
+            assert [m.role for m in messages] == ["user", "assistant"]
+            assert messages[1].id == done["id"]
+            assert messages[1].memory_note.content == "User came back"
+            assert conversation.message_count == 2
+    
+    def test_invalid_escape_is_still_saved(self, api, monkeypatch):
+        """A reply that is not valid JSON streams and is saved like a non-streamed one."""
+        use_client(monkeypatch, StreamingFakeClient('{"response": "Caf\\x41 \\uZZZZ ok", "ai_emotion": "neutral"}'))
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(f"/api/{API_VERSION}/chat/1/1/stream", json={"content": "Hi!"})
+        
+        events = parse_sse(asyncio.run(scenario()).text)
+        
+        assert "".join(data["text"] for event, data in events if event == "token") == "Caf\\x41 \\uZZZZ ok"
+        event, done = events[-1]
+        assert event == "done"
+        with Session(api) as session:
+            messages = session.exec(select(Message).where(Message.conversation_id == 1)).all()
+            assert [m.role for m in messages] == ["user", "assistant"]
+            assert messages[1].id == done["id"]
+            assert messages[1].content == done["content"]
+
+
+class TestHistoryCursor:
+    """Tests for keyset pagination of the history endpoint."""
+    
+    @pytest.fixture
+    def history(self, api):
+        with Session(api) as session:
+            # Same timestamp on purpose - id breaks ties
+            created_at = datetime.now(timezone.utc)
+            messages = [Message(conversation_id=1, role="user", content=f"m{i}", created_at=created_at) for i in range(7)]
+            session.add_all(messages)
+            conversation = session.get(Conversation, 1)
+            conversation.message_count = 7
+            session.commit()
+            return [m.id for m in messages]
+    
+    def get(self, **params):
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(f"/api/{API_VERSION}/chat/1/1/messages", params=params)
+        return asyncio.run(scenario())
+    
+    def test_walk_back_with_before_id(self, history):
+        """Pages walk back from the newest message without gaps or repeats."""
+        first = self.get(limit=3, sort_desc=True).json()
+        assert [m["id"] for m in first["messages"]] == history[:-4:-1]
+        
+        second = self.get(limit=3, sort_desc=True, before_id=first["next_before_id"]).json()
+        assert [m["id"] for m in second["messages"]] == history[-4:-7:-1]
+        assert second["has_more"] is True
+        assert second["total"] == 7
+        
+        last = self.get(limit=3, sort_desc=True, before_id=second["next_before_id"]).json()
+        assert [m["id"] for m in last["messages"]] == history[:1]
+        assert last["has_more"] is False
+    
+    def test_after_id_ascending(self, history):
+        """after_id returns newer messages in ascending order."""
+        page = self.get(limit=2, after_id=history[2]).json()
+        assert [m["id"] for m in page["messages"]] == history[3:5]
+        assert page["next_after_id"] == history[4]
+    
+    def test_cursor_from_other_conversation(self, history, api):
+        """Cursor must belong to the conversation."""
+        with Session(api) as session:
+            other = Message(conversation_id=2, role="user", content="elsewhere")
+            session.add(other)
+            session.commit()
+            other_id = other.id
+        assert self.get(before_id=other_id).status_code == 404
+    
+    def test_both_cursors_rejected(self, history):
+        assert self.get(before_id=history[3], after_id=history[1]).status_code == 400
+
+
+class TestTurnQueries:
+    """Query count regression test for the chat turn."""
+    
+    @pytest.fixture
+    def statements(self, async_engine):
+        executed = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+        
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        yield executed
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    
+    @staticmethod
+    def selects(statements):
+        return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    
+    def test_cold_turn_reads_context_in_two_statements(self, api, fake_client, statements):
+        """Conversation + character + user in one statement, messages + notes in another."""
+        asyncio.run(_send_concurrently([1]))
+        
+        selects = self.selects(statements)
+        assert "JOIN character" in selects[0] and "JOIN user" in selects[0]
+        assert "UNION ALL" in selects[1]
+        # Plus one catch-up read when the memory index is first loaded
+        assert len(selects) == 3
+        assert "FROM memorynote" in selects[2]
+    
+    def test_warm_turn_reads_in_one_statement(self, api, fake_client, statements):
+        """Cached context and memory index: only the validated conversation is read."""
+        asyncio.run(_send_concurrently([1]))
+        statements.clear()
+        asyncio.run(_send_concurrently([1]))
+        
+        assert len(self.selects(statements)) == 1
+
+
+class TestDeleteConversation:
+    
+    def test_delete_removes_messages(self, api, fake_client):
+        asyncio.run(_send_concurrently([1]))
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.delete(f"/api/{API_VERSION}/chat/1/1")
+        
+        assert asyncio.run(scenario()).status_code == 204
+        with Session(api) as session:
+            assert session.get(Conversation, 1) is None
+            assert session.exec(select(Message).where(Message.conversation_id == 1)).all() == []
@@ -0,0 +1,58 @@
+import asyncio
+import httpx
+import pytest
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import API_VERSION
+from app.main import app
+from app.models.database import get_async_session
+from app.models.schemas import Config
+from app.services.config_service import config_service
+
+
+@pytest.fixture
+def api(seeded_engine, async_engine):
+    async def override_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    
+    with Session(seeded_engine) as session:
+        config_service.load_from_db(session)
+    
+    app.dependency_overrides[get_async_session] = override_session
+    yield seeded_engine
+    app.dependency_overrides.clear()
+
+
+def request(method, path, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, f"/api/{API_VERSION}/config{path}", **kwargs)
+    return asyncio.run(scenario())
+
+
+def test_patch_updates_row_and_snapshot(api):
+    version = config_service.version
+    
+    response = request("PATCH", "", json={"temperature": 1.1})
+    
+    assert response.status_code == 200
+    assert response.json()["temperature"] == 1.1
+    assert config_service.get_runtime_config().temperature == 1.1
+    assert config_service.version == version + 1
+    with Session(api) as session:
+        assert session.get(Config, 1).temperature == 1.1
+
+
+def test_empty_patch_is_rejected(api):
+    assert request("PATCH", "", json={}).status_code == 400
+
+
+def test_reset_restores_defaults(api):
+    request("PATCH", "", json={"model_name": "other"})
+    
+    response = request("POST", "")
+    
+    assert response.status_code == 200
+    assert response.json()["model_name"] == "gemma3:latest"
@@ -0,0 +1,84 @@
+import asyncio
+import httpx
+import pytest
+from sqlmodel import Session, func, select
+from app.core.config import API_VERSION
+from app.api.conversations import ClosingStreamingResponse, iterate_closing
+from app.main import app
+from app.models.database import get_engine
+from app.models.schemas import Conversation, Message
+
+BASE = f"/api/{API_VERSION}/conversations"
+
+
+@pytest.fixture
+def api(seeded_engine):
+    with Session(seeded_engine) as session:
+        session.add_all([Message(conversation_id=2, role="user", content=f"m{i}") for i in range(3)])
+        session.commit()
+    app.dependency_overrides[get_engine] = lambda: seeded_engine
+    yield seeded_engine
+    app.dependency_overrides.clear()
+
+
+def request(method: str, path: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, BASE + path, **kwargs)
+    return asyncio.run(send())
+
+
+def test_export_then_import(api):
+    exported = request("GET", "/export", params={"conversation_id": [2, 3]})
+    
+    assert exported.status_code == 200
+    assert exported.headers["content-type"] == "application/x-ndjson"
+    assert exported.text.count('"type": "conversation"') == 2
+    
+    imported = request("POST", "/import", content=exported.content)
+    
+    assert imported.status_code == 200
+    assert imported.json() == {"conversations": 2, "messages": 3, "memory_notes": 0}
+    with Session(api) as session:
+        assert session.exec(select(func.count(Conversation.id))).one() == 7
+        assert session.exec(select(func.count(Message.id))).one() == 6
+
+
+def test_export_stream_is_closed_when_client_disconnects():
+    closed = []
+    
+    def chunks():
+        try:
+            while True:
+                yield "line\n"
+        finally:
+            closed.append(True)
+    
+    async def scenario():
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+            if message.get("body"):
+                raise OSError("client went away")
+        
+        async def receive():
+            return {"type": "http.disconnect"}
+        
+        response = ClosingStreamingResponse(iterate_closing(chunks()), media_type="application/x-ndjson")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(Exception):
+            await response(scope, receive, send)
+        # Closed by the response itself, not when the loop finalizes leftover generators
+        assert closed == [True]
+        return sent
+    
+    assert asyncio.run(scenario())[0]["type"] == "http.response.start"
+
+
+def test_invalid_import_is_400(api):
+    response = request("POST", "/import", content=b'{"type": "conversation", "id": 1, "character_id": 99, "user_id": 1}\n')
+    
+    assert response.status_code == 400
+    assert "unknown character" in response.json()["detail"]
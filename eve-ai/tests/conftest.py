@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel
+from app.models.database import make_async_engine, make_engine
+from app.models.schemas import Character, Config, Conversation, User
+from app.api import chat
+from app.services.context_cache import context_cache
+from app.services.memory_service import HashingEmbedder, MemoryService
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Create a fresh file-backed SQLite database for each test, tuned like the app database."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(engine):
+    """aiosqlite engine on the same database file as `engine`.
+    
+    No pool - tests run each scenario in its own asyncio.run() loop and
+    aiosqlite connections cannot move between loops.
+    """
+    async_engine = make_async_engine(engine.url.set(drivername="sqlite+aiosqlite"), poolclass=NullPool)
+    yield async_engine
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def seeded_engine(engine):
+    """Database with config, one user, one character and a few conversations."""
+    with Session(engine) as session:
+        session.add(Config(id=1, mode="local", model_name="test-model"))
+        user = User(name="Alice")
+        character = Character(name="Luna", description="test character")
+        session.add_all([user, character])
+        session.flush()
+        for i in range(5):
+            session.add(Conversation(character_id=character.id, user_id=user.id, title=f"Conversation {i}"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture(autouse=True)
+def clear_context_cache():
+    """In-process caches are global - do not leak entries between test databases."""
+    context_cache.clear()
+    chat.ai_service.turns.clear()
+    yield
+    context_cache.clear()
+    chat.ai_service.turns.clear()
+
+
+@pytest.fixture(autouse=True)
+def memory_service(tmp_path, monkeypatch):
+    """Local embedder and a per-test index directory - no Ollama, no files in the app folder."""
+    service = MemoryService(HashingEmbedder(), index_dir=str(tmp_path / "memory_index"))
+    monkeypatch.setattr(chat.ai_service, "memory", service)
+    return service
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+from sqlmodel import create_engine
+from app.models.database import SQLITE_PRAGMAS, make_engine
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_pragmas_are_applied(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    try:
+        assert pragma(engine, "journal_mode") == "wal"
+        assert pragma(engine, "synchronous") == 1  # NORMAL
+        assert pragma(engine, "foreign_keys") == 1
+        assert pragma(engine, "busy_timeout") == int(SQLITE_PRAGMAS["busy_timeout"])
+        assert pragma(engine, "cache_size") == int(SQLITE_PRAGMAS["cache_size"])
+    finally:
+        engine.dispose()
+
+
+def test_pragmas_do_not_leak_to_other_engines(tmp_path):
+    make_engine(f"sqlite:///{tmp_path / 'tuned.db'}").dispose()
+    plain = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    try:
+        assert pragma(plain, "journal_mode") == "delete"
+        assert pragma(plain, "foreign_keys") == 0
+    finally:
+        plain.dispose()
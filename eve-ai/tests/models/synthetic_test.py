@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from sqlalchemy import func, select, text
+from sqlmodel import Session
+from app.models.schemas import SEARCH_TRIGGERS, Character, Conversation, GenerationRollup, LatencyRollup, MemoryNote, Message, User
+from app.models.synthetic import SyntheticGenerator, SyntheticSpec, main
+
+
+def _spec(**overrides) -> SyntheticSpec:
+    return SyntheticSpec(**{"characters": 3, "users": 2, "conversations": 12, "messages": 40, "note_rate": 0.2, "batch_rows": 50, **overrides})
+
+
+def test_generates_consistent_histories(seeded_engine):
+    result = SyntheticGenerator(seeded_engine, _spec()).run()
+
+    assert (result.characters, result.users, result.conversations) == (3, 2, 12)
+    with Session(seeded_engine) as session:
+        assert session.scalar(select(func.count()).select_from(Character)) == 4
+        assert session.scalar(select(func.count()).select_from(User)) == 3
+        assert session.scalar(select(func.count()).select_from(Message)) == result.messages
+        assert session.scalar(select(func.count()).select_from(MemoryNote)) == result.memory_notes > 0
+
+        # Flushed in batches mid-conversation, counts and last activity still match the messages
+        rows = session.execute(
+            select(Conversation.message_count, Conversation.last_activity, func.count(Message.id), func.max(Message.created_at))
+            .join(Message).where(Conversation.title.like("Synthetic%")).group_by(Conversation.id)
+        ).all()
+        assert len(rows) == 12
+        for message_count, last_activity, messages, newest in rows:
+            assert message_count == messages
+            assert last_activity == newest <= datetime.now(timezone.utc)
+
+        roles = session.scalars(select(Message.role).join(MemoryNote, MemoryNote.source_message_id == Message.id)).all()
+        assert set(roles) == {"assistant"}
+
+        assistant = session.scalar(select(func.count()).select_from(Message).where(Message.role == "assistant"))
+        assert session.scalar(select(func.sum(GenerationRollup.messages))) == assistant
+        assert session.scalar(select(func.sum(LatencyRollup.messages))) == assistant
+
+        # Loaded without the search triggers, indexed in one rebuild, triggers back
+        assert session.scalar(text("SELECT count(*) FROM message_fts WHERE message_fts MATCH 'scope : ch2'")) > 0
+        session.execute(text("INSERT INTO message_fts(message_fts) VALUES ('integrity-check')"))
+        triggers = session.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+        assert set(SEARCH_TRIGGERS) <= set(triggers)
+
+
+def test_same_seed_same_data(tmp_path):
+    from app.models.database import make_engine
+
+    contents = []
+    for name in ("a", "b"):
+        engine = make_engine(f"sqlite:///{tmp_path / name}.db")
+        SyntheticGenerator(engine, _spec()).run()
+        with Session(engine) as session:
+            contents.append(session.scalars(select(Message.content).order_by(Message.id)).all())
+        engine.dispose()
+    assert contents[0] == contents[1]
+
+
+def test_cli(tmp_path, capsys):
+    assert main(["--db", f"sqlite:///{tmp_path / 'cli.db'}", "--characters", "1", "--users", "1", "--conversations", "3", "--messages", "10"]) == 0
+    assert "3 conversations" in capsys.readouterr().out
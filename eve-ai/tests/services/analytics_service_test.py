@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import GenerationRollup, LatencyRollup
+from app.services import analytics_service
+from app.services.analytics_service import TurnStats, hour_of, latency_bucket, percentile_from_buckets, record_turns
+
+HOUR = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def turn(ms: int, character_id: int = 1, model: str = "gemma3:latest", minute: int = 5, tokens: int = 10, emotion: str = "joyful") -> TurnStats:
+    return TurnStats(
+        character_id=character_id, model_name=model, at=datetime(2026, 1, 1, 12, minute, tzinfo=timezone.utc),
+        generation_time_ms=ms, token_count=tokens, ai_emotion=emotion, ai_emotion_intensity=0.8, user_emotion="curious",
+    )
+
+
+@pytest.fixture
+def record(engine, async_engine):
+    """Record batches of turns the way the write-behind writer does, one transaction each."""
+    def run(*batches):
+        async def scenario():
+            for batch in batches:
+                async with AsyncSession(async_engine) as session:
+                    await record_turns(session, batch)
+                    await session.commit()
+        asyncio.run(scenario())
+    return run
+
+
+@pytest.fixture
+def query(async_engine):
+    def run(function, *args, **kwargs):
+        async def scenario():
+            async with AsyncSession(async_engine) as session:
+                return await function(session, HOUR, HOUR, *args, **kwargs)
+        return asyncio.run(scenario())
+    return run
+
+
+def test_hour_and_bucket_keys():
+    assert hour_of(datetime(2026, 1, 1, 13, 59, 59, tzinfo=timezone.utc)) == datetime(2026, 1, 1, 13, tzinfo=timezone.utc)
+    assert latency_bucket(250) == 0
+    assert latency_bucket(251) == 1
+    assert latency_bucket(10**6) == len(analytics_service.ROLLUP_LATENCY_BUCKETS_MS)
+
+
+def test_percentile_interpolates_inside_buckets():
+    # 10 turns in 1000-2000 ms
+    assert percentile_from_buckets({3: 10}, 0.5) == 1500
+    assert percentile_from_buckets({0: 9, 12: 1}, 0.99) == analytics_service.ROLLUP_LATENCY_BUCKETS_MS[-1]
+    assert percentile_from_buckets({}, 0.5) is None
+
+
+def test_batches_add_up_in_the_same_rows(record, engine):
+    """Repeated batches increment existing rows instead of adding new ones."""
+    record([turn(1200), turn(1800, minute=40)], [turn(1500, tokens=None)])
+    
+    with Session(engine) as session:
+        [row] = session.exec(select(GenerationRollup)).all()
+        buckets = session.exec(select(LatencyRollup)).all()
+    assert row.hour == HOUR
+    assert (row.messages, row.generation_ms_sum, row.tokens_sum, row.token_generation_ms_sum) == (3, 4500, 20, 3000)
+    assert [(b.bucket, b.messages) for b in buckets] == [(3, 3)]
+
+
+def test_latency_grouped_by_model(record, query):
+    record([turn(1000, model="a", tokens=20), turn(3000, model="a", tokens=40), turn(500, model="b", character_id=2)])
+    
+    groups = {g["model_name"]: g for g in query(analytics_service.latency_stats, group_by="model")}
+    
+    assert groups["a"]["messages"] == 2
+    assert groups["a"]["avg_ms"] == 2000
+    assert groups["a"]["tokens_per_second"] == 15
+    assert groups["b"]["p50_ms"] == 375
+    assert [g["character_id"] for g in query(analytics_service.latency_stats, character_id=2)] == [2]
+
+
+def test_emotion_distribution_and_activity(record, query):
+    record([turn(1000), turn(1000), turn(1000, emotion="tired")])
+    
+    emotions = query(analytics_service.emotion_distribution)
+    activity = query(analytics_service.activity, interval="day")
+    
+    assert [(e["emotion"], e["messages"], e["share"]) for e in emotions] == [("joyful", 2, 0.6667), ("tired", 1, 0.3333)]
+    assert emotions[0]["avg_intensity"] == 0.8
+    assert query(analytics_service.emotion_distribution, role="user")[0]["emotion"] == "curious"
+    assert activity == [{"period": "2026-01-01", "messages": 3, "avg_ms": 1000}]
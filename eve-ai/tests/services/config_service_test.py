@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import Mock, MagicMock
 from sqlmodel import Session
-from app.services.config_service import ConfigService
+from pydantic import ValidationError
+from app.services.config_service import ConfigService, ConfigSnapshot
 from app.models.schemas import Config
 
 
@@ -32,6 +33,14 @@ def sample_config():
     )
 
 
+def assert_matches(snapshot, config):
+    """Snapshot holds the same values as the ORM row."""
+    assert isinstance(snapshot, ConfigSnapshot)
+    for field in ConfigSnapshot.model_fields:
+        if field != "version":
+            assert getattr(snapshot, field) == getattr(config, field)
+
+
 class TestLoadFromDb:
     """Tests for load_from_db method."""
     
@@ -46,8 +55,8 @@ class TestLoadFromDb:
         result = config_service.load_from_db(mock_session)
         
         # Assert
-        assert result == sample_config
-        assert config_service._cache == sample_config
+        assert_matches(result, sample_config)
+        assert config_service._cache is result
         mock_session.exec.assert_called_once()
         mock_session.add.assert_not_called()
         mock_session.commit.assert_not_called()
@@ -71,7 +80,7 @@ class TestLoadFromDb:
         assert result.max_tokens == 4096
         assert result.conversation_memory_length == 10
         assert result.emotion_confidence_threshold == 0.6
-        assert config_service._cache == result
+        assert config_service._cache is result
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
         mock_session.refresh.assert_called_once()
@@ -89,7 +98,38 @@ class TestLoadFromDb:
         
         # Assert
         assert config_service._cache is not None
-        assert config_service._cache == sample_config
+        assert_matches(config_service._cache, sample_config)
+    
+    def test_snapshot_is_detached_and_immutable(self, config_service, mock_session, sample_config):
+        """Test that snapshot cannot be changed and does not follow the ORM row."""
+        # Arrange
+        mock_result = Mock()
+        mock_result.first.return_value = sample_config
+        mock_session.exec.return_value = mock_result
+        
+        # Act
+        snapshot = config_service.load_from_db(mock_session)
+        sample_config.temperature = 1.5
+        
+        # Assert
+        assert snapshot.temperature == 0.7
+        with pytest.raises(ValidationError):
+            snapshot.temperature = 0.1
+    
+    def test_version_increases_on_every_load(self, config_service, mock_session, sample_config):
+        """Test that each published snapshot gets a new version."""
+        # Arrange
+        mock_result = Mock()
+        mock_result.first.return_value = sample_config
+        mock_session.exec.return_value = mock_result
+        
+        # Act
+        first = config_service.load_from_db(mock_session)
+        second = config_service.load_from_db(mock_session)
+        
+        # Assert
+        assert second.version == first.version + 1
+        assert config_service.version == second.version
 
 
 class TestGetRuntimeConfig:
@@ -98,13 +138,14 @@ class TestGetRuntimeConfig:
     def test_get_config_from_cache(self, config_service, sample_config):
         """Test retrieving config from cache."""
         # Arrange
-        config_service._cache = sample_config
+        snapshot = ConfigSnapshot.model_validate(sample_config)
+        config_service._cache = snapshot
         
         # Act
         result = config_service.get_runtime_config()
         
         # Assert
-        assert result == sample_config
+        assert result is snapshot
     
     def test_raise_error_when_cache_empty(self, config_service):
         """Test that RuntimeError is raised when cache is not loaded."""
@@ -116,13 +157,20 @@ class TestGetRuntimeConfig:
 class TestUpdateRuntimeConfig:
     """Tests for update_runtime_config method."""
     
-    def test_update_single_field(self, config_service, mock_session, sample_config):
+    @pytest.fixture
+    def loaded(self, config_service, mock_session, sample_config):
+        """Service with config loaded and the row available via session.get."""
+        mock_result = Mock()
+        mock_result.first.return_value = sample_config
+        mock_session.exec.return_value = mock_result
+        mock_session.get.return_value = sample_config
+        config_service.load_from_db(mock_session)
+        return config_service
+    
+    def test_update_single_field(self, loaded, mock_session, sample_config):
         """Test updating a single config field."""
-        # Arrange
-        config_service._cache = sample_config
-        
         # Act
-        result = config_service.update_runtime_config(mock_session, temperature=0.9)
+        result = loaded.update_runtime_config(mock_session, temperature=0.9)
         
         # Assert
         assert result.temperature == 0.9
@@ -130,13 +178,10 @@ class TestUpdateRuntimeConfig:
         mock_session.commit.assert_called_once()
         mock_session.refresh.assert_called_once_with(sample_config)
     
-    def test_update_multiple_fields(self, config_service, mock_session, sample_config):
+    def test_update_multiple_fields(self, loaded, mock_session, sample_config):
         """Test updating multiple config fields."""
-        # Arrange
-        config_service._cache = sample_config
-        
         # Act
-        result = config_service.update_runtime_config(
+        result = loaded.update_runtime_config(
             mock_session,
             temperature=0.8,
             max_tokens=2048,
@@ -156,27 +201,50 @@ class TestUpdateRuntimeConfig:
         with pytest.raises(RuntimeError, match="Config not loaded. Call load_from_db\\(\\) first."):
             config_service.update_runtime_config(mock_session, temperature=0.9)
     
-    def test_raise_error_for_invalid_field(self, config_service, mock_session, sample_config):
+    def test_raise_error_for_invalid_field(self, loaded, mock_session, sample_config):
         """Test that ValueError is raised for invalid config fields."""
-        # Arrange
-        config_service._cache = sample_config
-        
         # Act & Assert
         with pytest.raises(ValueError, match="Invalid config field: invalid_field"):
-            config_service.update_runtime_config(mock_session, invalid_field="value")
+            loaded.update_runtime_config(mock_session, invalid_field="value")
+        mock_session.commit.assert_not_called()
     
-    def test_cache_is_updated_after_update(self, config_service, mock_session, sample_config):
+    def test_cache_is_updated_after_update(self, loaded, mock_session, sample_config):
         """Test that cache reflects the updated values."""
         # Arrange
-        config_service._cache = sample_config
-        original_temp = sample_config.temperature
+        old_snapshot = loaded.get_runtime_config()
+        
+        # Act
+        loaded.update_runtime_config(mock_session, temperature=0.95)
+        
+        # Assert
+        assert loaded._cache.temperature == 0.95
+        assert loaded._cache.version == old_snapshot.version + 1
+        # Snapshots handed out earlier are never modified
+        assert old_snapshot.temperature == 0.7
+    
+    def test_failed_commit_keeps_old_snapshot(self, loaded, mock_session):
+        """Test that a failed write does not publish a new snapshot."""
+        # Arrange
+        old_snapshot = loaded.get_runtime_config()
+        mock_session.commit.side_effect = RuntimeError("disk full")
+        
+        # Act & Assert
+        with pytest.raises(RuntimeError, match="disk full"):
+            loaded.update_runtime_config(mock_session, temperature=0.95)
+        mock_session.rollback.assert_called_once()
+        assert loaded.get_runtime_config() is old_snapshot
+    
+    def test_reset_restores_defaults(self, loaded, mock_session):
+        """Test that reset writes default values."""
+        # Arrange
+        loaded.update_runtime_config(mock_session, temperature=1.2, model_name="other")
         
         # Act
-        config_service.update_runtime_config(mock_session, temperature=0.95)
+        result = loaded.reset_runtime_config(mock_session)
         
         # Assert
-        assert config_service._cache.temperature == 0.95
-        assert config_service._cache.temperature != original_temp
+        assert result.temperature == 0.7
+        assert result.model_name == "gemma3:latest"
 
 
 class TestReloadFromDb:
@@ -205,9 +273,9 @@ class TestReloadFromDb:
         result = config_service.reload_from_db(mock_session)
         
         # Assert
-        assert result == sample_config
-        assert config_service._cache == sample_config
-        assert config_service._cache != old_config
+        assert_matches(result, sample_config)
+        assert config_service._cache is result
+        assert config_service._cache.mode != old_config.mode
     
     def test_reload_creates_default_if_none_exists(self, config_service, mock_session):
         """Test that reload creates default config if database is empty."""
@@ -224,7 +292,7 @@ class TestReloadFromDb:
         # Assert
         assert result is not None
         assert result.mode == "local"
-        assert config_service._cache == result
+        assert config_service._cache is result
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
 
@@ -238,12 +306,13 @@ class TestIntegration:
         mock_result = Mock()
         mock_result.first.return_value = sample_config
         mock_session.exec.return_value = mock_result
+        mock_session.get.return_value = sample_config
         
         config_service.load_from_db(mock_session)
         
         # Get
         config = config_service.get_runtime_config()
-        assert config == sample_config
+        assert_matches(config, sample_config)
         
         # Update
         updated = config_service.update_runtime_config(mock_session, temperature=0.85)
@@ -251,7 +320,7 @@ class TestIntegration:
         
         # Reload
         reloaded = config_service.reload_from_db(mock_session)
-        assert reloaded == sample_config
+        assert_matches(reloaded, sample_config)
     
     def test_cannot_update_before_load(self, config_service, mock_session):
         """Test that update fails if load was not called first."""
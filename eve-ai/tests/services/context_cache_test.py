@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+from app.models.schemas import MemoryNote, Message
+from app.services.context_cache import ConversationContextCache, MemoryRecord, MessageRecord
+
+
+@pytest.fixture
+def history(seeded_engine):
+    """Conversation 1 with six messages and three memory notes."""
+    with Session(seeded_engine) as session:
+        for i in range(6):
+            session.add(Message(conversation_id=1, role="user" if i % 2 == 0 else "assistant", content=f"m{i}"))
+        for importance in (0.2, 0.9, 0.5):
+            session.add(MemoryNote(conversation_id=1, character_id=1, content=f"note {importance}", importance_score=importance))
+        session.commit()
+    return seeded_engine
+
+
+@pytest.fixture
+def statements(history):
+    """Collects SQL statements executed on the engine."""
+    executed = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    
+    event.listen(history, "before_cursor_execute", record)
+    yield executed
+    event.remove(history, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def cache():
+    return ConversationContextCache(maxsize=2)
+
+
+class TestGetOrLoad:
+    """Tests for get_or_load method."""
+    
+    def test_miss_loads_window_and_top_notes(self, cache, history):
+        """Miss loads last messages oldest first and top notes least important first."""
+        with Session(history) as session:
+            messages, notes = cache.get_or_load(session, 1, window=4, notes_limit=2)
+        
+        assert [m.content for m in messages] == ["m2", "m3", "m4", "m5"]
+        assert [n.importance_score for n in notes] == [0.5, 0.9]
+        assert isinstance(messages[0], MessageRecord)
+    
+    def test_hit_does_not_query(self, cache, history, statements):
+        """Second read is served from memory."""
+        with Session(history) as session:
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+            loaded = len(statements)
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+        
+        assert loaded == 1
+        assert len(statements) == loaded
+        assert cache.stats.hits == 1
+    
+    def test_window_change_reloads(self, cache, history, statements):
+        """Config change of memory length reloads the entry."""
+        with Session(history) as session:
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+            messages, _ = cache.get_or_load(session, 1, window=2, notes_limit=1)
+        
+        assert [m.content for m in messages] == ["m4", "m5"]
+        # One statement per load
+        assert len(statements) == 2
+    
+    def test_lru_eviction(self, cache, history):
+        """Least recently used conversation is dropped when full."""
+        with Session(history) as session:
+            for conversation_id in (1, 2, 3):
+                cache.get_or_load(session, conversation_id, window=4, notes_limit=2)
+        
+        assert 1 not in cache.stats
+        assert 3 in cache.stats
+
+
+class TestAppendTurn:
+    """Tests for incremental updates."""
+    
+    def test_append_slides_window(self, cache, history):
+        """New messages push out the oldest ones."""
+        with Session(history) as session:
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+            cache.append_turn(1, [MessageRecord(100, "user", "new q", None, 0.5), MessageRecord(101, "assistant", "new a", "joyful", 0.7)])
+            messages, _ = cache.get_or_load(session, 1, window=4, notes_limit=2)
+        
+        assert [m.content for m in messages] == ["m4", "m5", "new q", "new a"]
+        assert messages[-1].full_emotion == "very_joyful"
+    
+    def test_append_note_keeps_top_notes(self, cache, history):
+        """A new important note replaces the least important cached one."""
+        with Session(history) as session:
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+            cache.append_turn(1, [], MemoryRecord(50, "fresh", 0.95))
+            _, notes = cache.get_or_load(session, 1, window=4, notes_limit=2)
+        
+        assert [n.content for n in notes] == ["note 0.9", "fresh"]
+    
+    def test_append_to_uncached_is_ignored(self, cache):
+        cache.append_turn(1, [MessageRecord(1, "user", "x", None, 0.5)])
+        assert len(cache.stats) == 0
+    
+    def test_invalidate(self, cache, history, statements):
+        """Invalidated conversation is loaded again."""
+        with Session(history) as session:
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+            cache.invalidate(1)
+            cache.get_or_load(session, 1, window=4, notes_limit=2)
+        
+        # One statement per load
+        assert len(statements) == 2
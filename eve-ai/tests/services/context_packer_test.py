@@ -0,0 +1,84 @@
+import pytest
+from app.services.context_cache import MemoryRecord, MessageRecord
+from app.services.context_packer import ContextPacker
+from app.utils.token_counter import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens
+
+
+def make_history(count: int) -> list:
+    """Messages m0..m{count-1}, oldest first, 10 words + overhead each."""
+    return [MessageRecord(i, "user" if i % 2 == 0 else "assistant", f"m{i} " + "word " * 9, None, 0.5) for i in range(count)]
+
+
+def message_cost(message: MessageRecord) -> int:
+    return message.tokens + MESSAGE_OVERHEAD_TOKENS
+
+
+@pytest.fixture
+def packer():
+    return ContextPacker(context_window=1000, memory_share=0.25)
+
+
+class TestBudget:
+    """Tests for the prompt budget."""
+    
+    def test_reserves_reply_tokens(self, packer):
+        assert packer.budget(max_tokens=300) == 700
+    
+    def test_keeps_minimum_prompt(self, packer):
+        """A max_tokens close to the window still leaves a quarter for the prompt."""
+        assert packer.budget(max_tokens=990) == 250
+
+
+class TestPack:
+    """Tests for filling the budget."""
+    
+    def test_everything_fits(self, packer):
+        history = make_history(4)
+        notes = [MemoryRecord(1, "likes tea", 0.9)]
+        packed = packer.pack(700, ["system", "hello"], notes, history)
+        
+        assert packed.messages == history
+        assert packed.memory_notes == notes
+        assert packed.dropped_messages == 0
+        assert packed.fits
+    
+    def test_keeps_newest_messages(self, packer):
+        """History is cut from the oldest end and stays contiguous."""
+        history = make_history(20)
+        fixed = ["system"]
+        budget = estimate_message_tokens("system") + 5 * message_cost(history[0])
+        packed = packer.pack(budget, fixed, [], history)
+        
+        assert [m.id for m in packed.messages] == [15, 16, 17, 18, 19]
+        assert packed.dropped_messages == 15
+        assert packed.total_tokens <= budget
+    
+    def test_notes_limited_to_share(self, packer):
+        """Notes take at most memory_share of the budget, best first."""
+        notes = [MemoryRecord(i, "note " * 20, 0.5) for i in range(10)]
+        packed = packer.pack(400, [], notes, make_history(50))
+        
+        assert packed.memory_tokens <= 100
+        assert [n.id for n in packed.memory_notes] == list(range(len(packed.memory_notes)))
+        assert packed.dropped_notes == 10 - len(packed.memory_notes)
+        # History gets the rest
+        assert packed.history_tokens > 200
+        assert packed.total_tokens <= 400
+    
+    def test_fixed_parts_always_included(self, packer):
+        """An oversized new message still goes in, history and notes are dropped."""
+        packed = packer.pack(50, ["word " * 100], [MemoryRecord(1, "note", 0.5)], make_history(3))
+        
+        assert packed.messages == []
+        assert packed.memory_notes == []
+        assert not packed.fits
+        assert packer.stats()["over_budget"] == 1
+    
+    def test_stats(self, packer):
+        packer.pack(700, ["system"], [], make_history(2))
+        packer.pack(40, ["system"], [], make_history(10))
+        stats = packer.stats()
+        
+        assert stats["packs"] == 2
+        assert stats["truncated"] == 1
+        assert stats["last"]["messages"] < 10
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from app.services.generation_scheduler import GenerationRejected, GenerationScheduler
+
+
+async def _run(scheduler, key, order, hold=0.01):
+    async with scheduler.slot(key):
+        order.append(key)
+        await asyncio.sleep(hold)
+
+
+def test_slots_rotate_between_conversations():
+    """A conversation with many queued generations does not starve the others."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=10)
+    order = []
+    
+    async def scenario():
+        tasks = [asyncio.create_task(_run(scheduler, key, order)) for key in ["a", "a", "a", "b", "c"]]
+        await asyncio.gather(*tasks)
+    
+    asyncio.run(scenario())
+    
+    assert order == ["a", "a", "b", "c", "a"]
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=10)
+    order = []
+    
+    async def scenario():
+        first = asyncio.create_task(_run(scheduler, "a", order, hold=0.05))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_run(scheduler, "b", order))
+        await asyncio.sleep(0.01)
+        assert scheduler.queued == 1
+        waiting.cancel()
+        await asyncio.gather(first, waiting, return_exceptions=True)
+    
+    asyncio.run(scenario())
+    
+    assert order == ["a"]
+    assert scheduler.running == 0 and scheduler.queued == 0
+
+
+def test_rejects_when_queue_is_full():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=0)
+    
+    async def scenario():
+        first = asyncio.create_task(_run(scheduler, "a", [], hold=0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(GenerationRejected) as rejected:
+            async with scheduler.slot("b"):
+                pass
+        await first
+        return rejected.value
+    
+    rejected = asyncio.run(scenario())
+    
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_background_keeps_a_slot_for_users():
+    """Background work waits while only one slot is free, user turns do not wait for it."""
+    scheduler = GenerationScheduler(max_concurrent=2, max_queue=10)
+    order = []
+    
+    async def background():
+        async with scheduler.background_slot(poll_interval=0.005):
+            order.append("background")
+    
+    async def scenario():
+        user = asyncio.create_task(_run(scheduler, "a", order, hold=0.05))
+        await asyncio.sleep(0)
+        task = asyncio.create_task(background())
+        await asyncio.sleep(0.02)
+        assert order == ["a"]
+        await asyncio.gather(user, task)
+    
+    asyncio.run(scenario())
+    
+    assert order == ["a", "background"]
+    stats = scheduler.stats()
+    assert stats["background_completed"] == 1
+    assert stats["completed"] == 1
+    assert scheduler.running == 0
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+import httpx
+import pytest
+from ollama import ChatResponse, Message as OllamaMessage
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaSettings
+from app.services.config_service import ConfigSnapshot
+from app.core.config import LLM_CONTEXT_WINDOW
+from app.services.llm_providers import OllamaProvider, OpenAICompatibleProvider, ProviderRegistry, RetryableError
+
+MESSAGES = [{"role": "system", "content": "You are Luna."}, {"role": "user", "content": "Hi!"}]
+
+
+def make_config(**overrides) -> ConfigSnapshot:
+    now = datetime.now(timezone.utc)
+    fields = dict(
+        id=1, mode="remote", model_name="gpt-test", gpu_layers=0, temperature=0.7, max_tokens=256,
+        openai_api_key="sk-test", conversation_memory_length=10, emotion_confidence_threshold=0.6,
+        created_at=now, updated_at=now,
+    )
+    fields.update(overrides)
+    return ConfigSnapshot(**fields)
+
+
+@pytest.fixture
+def fake():
+    return FakeOllama(FakeOllamaSettings(time_scale=0, api_key="sk-test"))
+
+
+def make_provider(fake: FakeOllama, **kwargs) -> OpenAICompatibleProvider:
+    return OpenAICompatibleProvider(
+        base_url="http://fake/v1", transport=httpx.ASGITransport(app=fake.app), retry_base_delay=0, **kwargs
+    )
+
+
+def test_ollama_options_use_ollama_names():
+    """Ollama ignores unknown option keys, a wrong name silently drops the setting."""
+    class ChatClient:
+        async def chat(self, **kwargs):
+            self.kwargs = kwargs
+            return ChatResponse(model="test-model", message=OllamaMessage(role="assistant", content="Hello!"))
+    
+    client = ChatClient()
+    asyncio.run(OllamaProvider(client=client).chat(MESSAGES, make_config(mode="local", gpu_layers=33)))
+    
+    assert client.kwargs["options"] == {"temperature": 0.7, "num_predict": 256, "num_ctx": LLM_CONTEXT_WINDOW, "num_gpu": 33}
+
+
+def test_chat_returns_content_and_usage(fake):
+    async def run():
+        provider = make_provider(fake)
+        try:
+            return await provider.chat(MESSAGES, make_config())
+        finally:
+            await provider.aclose()
+
+    result = asyncio.run(run())
+
+    assert json.loads(result.content) == fake.settings.reply
+    assert result.prompt_eval_count == fake.requests[0]["prompt_tokens"]
+    assert result.eval_count == fake.requests[0]["eval_count"]
+
+
+def test_stream_chat_yields_tokens_then_done(fake):
+    async def run():
+        provider = make_provider(fake)
+        try:
+            return [chunk async for chunk in provider.stream_chat(MESSAGES, make_config(), json_format=False)]
+        finally:
+            await provider.aclose()
+
+    chunks = asyncio.run(run())
+
+    assert "".join(c.content for c in chunks) == fake.settings.reply["response"]
+    assert [c.done for c in chunks].count(True) == 1 and chunks[-1].done
+    assert chunks[-1].result.eval_count == fake.requests[0]["eval_count"]
+
+
+def test_retries_transient_errors(fake):
+    fake.settings.fail_next = 2
+
+    async def run():
+        provider = make_provider(fake, max_retries=3)
+        try:
+            return await provider.chat(MESSAGES, make_config())
+        finally:
+            await provider.aclose()
+
+    result = asyncio.run(run())
+
+    assert result.content
+    assert [r.get("failed") for r in fake.requests] == [503, 503, None]
+
+
+def test_gives_up_after_max_retries(fake):
+    fake.settings.fail_next = 5
+
+    async def run():
+        provider = make_provider(fake, max_retries=1)
+        try:
+            await provider.chat(MESSAGES, make_config())
+        finally:
+            await provider.aclose()
+
+    with pytest.raises(RetryableError):
+        asyncio.run(run())
+    assert len(fake.requests) == 2
+
+
+def test_client_errors_are_not_retried(fake):
+    async def run():
+        provider = make_provider(fake)
+        try:
+            await provider.chat(MESSAGES, make_config(openai_api_key="sk-wrong"))
+        finally:
+            await provider.aclose()
+
+    with pytest.raises(ValueError, match="401"):
+        asyncio.run(run())
+    assert fake.requests == []
+
+
+def test_missing_api_key_is_rejected(fake):
+    async def run():
+        provider = make_provider(fake)
+        try:
+            await provider.chat(MESSAGES, make_config(openai_api_key=None))
+        finally:
+            await provider.aclose()
+
+    with pytest.raises(ValueError, match="openai_api_key"):
+        asyncio.run(run())
+
+
+def test_backoff_honours_retry_after_and_caps_jitter():
+    provider = OpenAICompatibleProvider(retry_base_delay=1.0)
+    try:
+        assert provider.backoff_delay(0, retry_after=2.0) == 2.0
+        assert provider.backoff_delay(10, retry_after=600.0) == 10.0
+        assert all(0 <= provider.backoff_delay(attempt) <= min(10.0, 2 ** attempt) for attempt in range(8))
+    finally:
+        asyncio.run(provider.aclose())
+
+
+def test_registry_rejects_unknown_mode():
+    registry = ProviderRegistry({})
+    with pytest.raises(ValueError, match="Invalid AI mode"):
+        registry.get("cloud")
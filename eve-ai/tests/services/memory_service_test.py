@@ -0,0 +1,202 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from sqlmodel import Session, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import Conversation, MemoryNote
+from app.services.context_cache import MemoryRecord
+from app.services.memory_service import HashingEmbedder, MemoryIndex, MemoryService, OllamaEmbedder, ScoringWeights
+
+NOTES = [
+    ("User's sister Anna lives in Berlin", 0.9),
+    ("User is repairing an old road bike", 0.6),
+    ("User drinks green tea every morning", 0.5),
+]
+
+
+class CountingEmbedder(HashingEmbedder):
+    """Hashing embedder that counts embedded texts."""
+    
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+    
+    async def embed(self, texts):
+        self.embedded += len(texts)
+        return await super().embed(texts)
+
+
+@pytest.fixture
+def notes(seeded_engine):
+    with Session(seeded_engine) as session:
+        for content, importance in NOTES:
+            session.add(MemoryNote(conversation_id=1, character_id=1, content=content, importance_score=importance))
+        session.commit()
+    return seeded_engine
+
+
+def retrieve(service, async_engine, query, k=1):
+    async def scenario():
+        async with AsyncSession(async_engine) as session:
+            return await service.retrieve(session, 1, query, k)
+    return asyncio.run(scenario())
+
+
+class TestHashingEmbedder:
+    
+    def test_deterministic_and_normalized(self):
+        embedder = HashingEmbedder(dim=64)
+        first = asyncio.run(embedder.embed(["fixing my bike", "green tea"]))
+        second = asyncio.run(HashingEmbedder(dim=64).embed(["fixing my bike", "green tea"]))
+        
+        assert first.shape == (2, 64) and first.dtype == np.float32
+        np.testing.assert_array_equal(first, second)
+        np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-6)
+
+
+class TestOllamaEmbedder:
+    
+    def test_keeps_model_loaded_like_chat(self):
+        class EmbedClient:
+            async def embed(self, **kwargs):
+                self.kwargs = kwargs
+                return type("EmbedResponse", (), {"embeddings": [[3.0, 4.0]]})()
+        
+        client = EmbedClient()
+        vectors = asyncio.run(OllamaEmbedder(client=client, keep_alive="30m").embed(["hi"]))
+        
+        assert client.kwargs["keep_alive"] == "30m"
+        np.testing.assert_allclose(vectors, [[0.6, 0.8]])
+
+
+class TestMemoryIndex:
+    
+    def _index(self, count):
+        embedder = HashingEmbedder(dim=32)
+        records = [MemoryRecord(i + 1, f"note number {i}", 0.5) for i in range(count)]
+        index = MemoryIndex(dim=32, capacity=4)
+        index.add(records, asyncio.run(embedder.embed([r.content for r in records])), [time.time()] * count)
+        return index, embedder
+    
+    def test_grows_past_capacity(self):
+        index, _ = self._index(37)
+        
+        assert len(index) == 37
+        assert index.max_id == 37
+    
+    def test_similarity_beats_importance_when_weighted(self):
+        embedder = HashingEmbedder()
+        records = [MemoryRecord(1, "likes green tea", 0.2), MemoryRecord(2, "sister lives in Berlin", 0.9)]
+        index = MemoryIndex(dim=embedder.dim)
+        index.add(records, asyncio.run(embedder.embed([r.content for r in records])), [time.time()] * 2)
+        query = asyncio.run(embedder.embed(["what tea do I like"]))[0]
+        
+        by_similarity = index.search(query, 1, ScoringWeights(similarity=1.0, importance=0.0, recency=0.0))
+        by_importance = index.search(query, 1, ScoringWeights(similarity=0.0, importance=1.0, recency=0.0))
+        
+        assert by_similarity[0][0].id == 1
+        assert by_importance[0][0].id == 2
+    
+    def test_recency_prefers_newer_notes(self):
+        embedder = HashingEmbedder()
+        records = [MemoryRecord(1, "old", 0.5), MemoryRecord(2, "new", 0.5)]
+        index = MemoryIndex(dim=embedder.dim)
+        now = time.time()
+        index.add(records, asyncio.run(embedder.embed(["same", "same"])), [now - 90 * 86400, now])
+        
+        ranked = index.search(asyncio.run(embedder.embed(["same"]))[0], 2, ScoringWeights(), now=now)
+        
+        assert [r.id for r, _ in ranked] == [2, 1]
+    
+    def test_save_and_load_round_trip(self, tmp_path):
+        index, embedder = self._index(5)
+        path = tmp_path / "1.npz"
+        index.save(path)
+        
+        loaded = MemoryIndex.load(path)
+        query = asyncio.run(embedder.embed(["note number 3"]))[0]
+        
+        assert len(loaded) == 5
+        assert loaded.contents == index.contents
+        now = time.time()
+        assert loaded.search(query, 2, ScoringWeights(), now) == index.search(query, 2, ScoringWeights(), now)
+
+
+class TestMemoryService:
+    
+    def test_retrieves_note_relevant_to_message(self, notes, async_engine, tmp_path):
+        service = MemoryService(HashingEmbedder(), index_dir=str(tmp_path))
+        
+        assert [n.content for n in retrieve(service, async_engine, "How is the road bike going?")] == [NOTES[1][0]]
+        assert [n.content for n in retrieve(service, async_engine, "Do you remember where Anna lives?")] == [NOTES[0][0]]
+    
+    def test_index_is_persisted_and_not_rebuilt(self, notes, async_engine, tmp_path):
+        retrieve(MemoryService(HashingEmbedder(), index_dir=str(tmp_path)), async_engine, "bike")
+        
+        embedder = CountingEmbedder()
+        restarted = MemoryService(embedder, index_dir=str(tmp_path))
+        result = retrieve(restarted, async_engine, "bike")
+        
+        assert result[0].content == NOTES[1][0]
+        # Only the query was embedded, notes came from disk
+        assert embedder.embedded == 1
+    
+    def test_new_notes_are_added_incrementally(self, notes, async_engine, tmp_path):
+        embedder = CountingEmbedder()
+        service = MemoryService(embedder, index_dir=str(tmp_path))
+        retrieve(service, async_engine, "hello")
+        embedded = embedder.embedded
+        
+        asyncio.run(service.add_note(1, MemoryRecord(99, "User adopted a cat named Miso", 0.9)))
+        result = retrieve(service, async_engine, "how is Miso the cat")
+        
+        assert result[0].id == 99
+        # The new note and the query - nothing re-embedded
+        assert embedder.embedded == embedded + 2
+        assert MemoryIndex.load(service.index_path(1)).max_id == 99
+    
+    def test_catches_up_with_notes_missing_from_disk(self, notes, async_engine, tmp_path):
+        retrieve(MemoryService(HashingEmbedder(), index_dir=str(tmp_path)), async_engine, "bike")
+        with Session(notes) as session:
+            session.add(MemoryNote(conversation_id=1, character_id=1, content="User moved to Lisbon", importance_score=0.7))
+            session.commit()
+        
+        embedder = CountingEmbedder()
+        result = retrieve(MemoryService(embedder, index_dir=str(tmp_path)), async_engine, "moved to Lisbon")
+        
+        assert result[0].content == "User moved to Lisbon"
+        assert embedder.embedded == 2
+    
+    def test_forget_removes_index_file(self, notes, async_engine, tmp_path):
+        service = MemoryService(HashingEmbedder(), index_dir=str(tmp_path))
+        retrieve(service, async_engine, "bike")
+        assert service.index_path(1).exists()
+        
+        service.forget(1)
+        
+        assert not service.index_path(1).exists()
+
+    def test_index_of_another_database_is_rebuilt(self, notes, async_engine, tmp_path):
+        retrieve(MemoryService(HashingEmbedder(), index_dir=str(tmp_path)), async_engine, "bike")
+        # Reseeded database - same conversation ID, a different conversation
+        with Session(notes) as session:
+            session.exec(update(Conversation).where(Conversation.id == 1).values(created_at=datetime(2030, 1, 1, tzinfo=timezone.utc)))
+            session.commit()
+        
+        embedder = CountingEmbedder()
+        retrieve(MemoryService(embedder, index_dir=str(tmp_path)), async_engine, "bike")
+        
+        # All notes and the query
+        assert embedder.embedded == 4
+    
+    def test_index_with_deleted_notes_is_rebuilt(self, notes, async_engine, tmp_path):
+        retrieve(MemoryService(HashingEmbedder(), index_dir=str(tmp_path)), async_engine, "bike")
+        with Session(notes) as session:
+            session.exec(delete(MemoryNote).where(MemoryNote.content == NOTES[1][0]))
+            session.commit()
+        
+        result = retrieve(MemoryService(HashingEmbedder(), index_dir=str(tmp_path)), async_engine, "bike", k=3)
+        
+        assert len(result) == 2
@@ -0,0 +1,63 @@
+from app.services.metrics import Counter, CounterCallback, GaugeCallback, Histogram, MetricsRegistry, llm_generated_tokens, observe_generation
+
+
+def test_counter_renders_per_label_set():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    requests.inc(labels=("/a",))
+    requests.inc(2, ("/b",))
+    
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 1' in text
+    assert 'requests_total{route="/b"} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1)))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value)
+    
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 6.05" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_callbacks_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"value": 1}
+    registry.register(GaugeCallback("queue_depth", "Queue depth.", lambda: {(): depth["value"]}))
+    registry.register(CounterCallback("hits_total", "Hits.", lambda: {("prompt",): 7}, ("cache",)))
+    depth["value"] = 4
+    
+    text = registry.render()
+    assert "queue_depth 4" in text
+    assert 'hits_total{cache="prompt"} 7' in text
+
+
+def test_broken_callback_is_skipped():
+    registry = MetricsRegistry()
+    registry.register(GaugeCallback("broken", "Broken.", lambda: 1 / 0))
+    registry.register(GaugeCallback("fine", "Fine.", lambda: {(): 1}))
+    
+    text = registry.render()
+    assert "broken" not in text
+    assert "fine 1" in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.register(Counter("paths_total", "Paths.", ("path",))).inc(labels=('a"b\\c',))
+    assert 'paths_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_observe_generation():
+    before = llm_generated_tokens.value(("test",))
+    observe_generation(50, 2_000_000_000, source="test")
+    observe_generation(None, None, source="test")
+    
+    assert llm_generated_tokens.value(("test",)) == before + 50
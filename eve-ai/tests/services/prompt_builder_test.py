@@ -0,0 +1,143 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.models.schemas import Character, Conversation, MemoryNote, Message, User
+from app.services.ai_service import PromptBuilder
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty compiled prompt cache."""
+    PromptBuilder._static_cache.clear()
+    PromptBuilder._static_cache.hits = PromptBuilder._static_cache.misses = 0
+    yield
+    PromptBuilder._static_cache.clear()
+
+
+@pytest.fixture
+def character():
+    return Character(
+        id=1,
+        name="Luna",
+        description="A cheerful AI",
+        favorite_phrases_json=json.dumps(["How interesting!"]),
+        enabled_emotions_json=json.dumps(["smug", "joyful", "neutral", "joyful"]),
+    )
+
+
+@pytest.fixture
+def user():
+    return User(id=1, name="Alice", profile_json=json.dumps({"likes": ["cats", "anime"], "dislikes": ["spiders"]}))
+
+
+@pytest.fixture
+def conversation():
+    return Conversation(id=1, character_id=1, user_id=1, world_state="Rainy evening")
+
+
+class TestCompileStaticPrompt:
+    """Tests for the compiled static part of the system prompt."""
+    
+    def test_static_part_is_cached(self, character, user, conversation):
+        """Second build for the same versions is served from cache."""
+        first = PromptBuilder.compile_static_prompt(character, user, conversation)
+        second = PromptBuilder.compile_static_prompt(character, user, conversation)
+        
+        assert first is second
+        assert PromptBuilder._static_cache.hits == 1
+        assert PromptBuilder._static_cache.misses == 1
+    
+    def test_character_update_invalidates(self, character, user, conversation):
+        """Changing character.updated_at compiles a new prompt."""
+        PromptBuilder.compile_static_prompt(character, user, conversation)
+        character.personality = "Grumpy"
+        character.updated_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+        
+        prompt = PromptBuilder.compile_static_prompt(character, user, conversation)
+        
+        assert "Personality: Grumpy" in prompt
+        assert PromptBuilder._static_cache.misses == 2
+    
+    def test_user_intent_is_part_of_key(self, character, user, conversation):
+        """Conversation settings used by the static part are in the key."""
+        PromptBuilder.compile_static_prompt(character, user, conversation)
+        conversation.user_intent = "roleplay"
+        
+        prompt = PromptBuilder.compile_static_prompt(character, user, conversation)
+        
+        assert "Interaction goal: roleplay" in prompt
+    
+    def test_content(self, character, user, conversation):
+        """Profile and emotions are rendered once, in configured order."""
+        prompt = PromptBuilder.compile_static_prompt(character, user, conversation)
+        
+        assert "- User preferences: cats, anime" in prompt
+        assert "- User dislikes: spiders" in prompt
+        assert 'Choose EXACTLY ONE emotion from: "smug", "joyful", "neutral"\n' in prompt
+        assert "CURRENT CONTEXT" not in prompt
+
+
+class TestBuildSystemPrompt:
+    """Tests for the full system prompt."""
+    
+    def test_prefix_is_byte_stable_between_turns(self, character, user, conversation):
+        """Only the context tail changes when history grows."""
+        notes = [MemoryNote(character_id=1, conversation_id=1, content="Likes cats", importance_score=0.9)]
+        first = PromptBuilder.build_system_prompt(character, user, conversation, [], notes)
+        history = [Message(conversation_id=1, role="user", content="Hello there")]
+        second = PromptBuilder.build_system_prompt(character, user, conversation, history, notes)
+        
+        static = PromptBuilder.compile_static_prompt(character, user, conversation)
+        assert first.startswith(static) and second.startswith(static)
+        assert "No recent history" in first
+        assert "- user: Hello there... (emotion: neutral)" in second
+        assert "- Likes cats (importance: 0.90)" in second
+        assert second.endswith("World state: Rainy evening\n\nNow engage naturally.")
+
+
+class TestBuildMessages:
+    """Tests for chat message layout."""
+    
+    def test_stable_prefix_layout(self, character, user, conversation):
+        """Persona first, history as messages, per-turn context right before the new message."""
+        history = [
+            Message(conversation_id=1, role="user", content="Hi"),
+            Message(conversation_id=1, role="assistant", content="Hello!"),
+        ]
+        messages = PromptBuilder.build_messages(character, user, conversation, history, [], "How are you?", mode="stable_prefix")
+        
+        assert messages[0] == {"role": "system", "content": PromptBuilder.compile_static_prompt(character, user, conversation)}
+        assert messages[1:3] == [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}]
+        assert messages[3]["role"] == "system"
+        assert "Recent events" not in messages[3]["content"]
+        assert "World state: Rainy evening" in messages[3]["content"]
+        assert messages[4] == {"role": "user", "content": "How are you?"}
+    
+    def test_next_turn_extends_previous_prefix(self, character, user, conversation):
+        """Everything before the context message is reused by the next turn."""
+        turn1 = PromptBuilder.build_messages(character, user, conversation, [], [], "Hi", mode="stable_prefix")
+        history = [Message(conversation_id=1, role="user", content="Hi"), Message(conversation_id=1, role="assistant", content="Hello!")]
+        turn2 = PromptBuilder.build_messages(character, user, conversation, history, [], "How are you?", mode="stable_prefix")
+        
+        assert turn2[:1] == turn1[:1]
+        assert turn2[1] == turn1[-1]
+    
+    def test_summary_layout(self, character, user, conversation):
+        """Legacy layout keeps recent events in the system prompt."""
+        history = [Message(conversation_id=1, role="user", content="Hi")]
+        messages = PromptBuilder.build_messages(character, user, conversation, history, [], "How are you?", mode="summary")
+        
+        assert len(messages) == 3
+        assert "Recent events:\n- user: Hi..." in messages[0]["content"]
+    
+    def test_rolling_summary_in_context(self, character, user, conversation):
+        """Stored summary goes into the per-turn context, not the cached prefix."""
+        conversation.summary = "Alice told Luna about her cat."
+        messages = PromptBuilder.build_messages(character, user, conversation, [], [], "Hi", mode="stable_prefix")
+        
+        assert "Story so far:\nAlice told Luna about her cat." in messages[1]["content"]
+        assert "Story so far" not in messages[0]["content"]
+    
+    def test_invalid_mode(self, character, user, conversation):
+        with pytest.raises(ValueError, match="Invalid prompt mode"):
+            PromptBuilder.build_messages(character, user, conversation, [], [], "Hi", mode="other")
@@ -0,0 +1,71 @@
+import json
+from app.services.response_contract import FALLBACK_RESPONSE, MEMORY_NOTE_MAX_LENGTH, parse_stats, parse_turn_response, response_schema
+
+
+def reply(**fields) -> str:
+    return json.dumps({"response": "Hi!", "ai_emotion": "joyful", "ai_emotion_confidence": 0.9, **fields})
+
+
+def test_valid_reply():
+    result, outcome = parse_turn_response(reply(memory_note="likes tea", memory_note_importance=0.9))
+    
+    assert outcome == "ok"
+    assert result.ai_emotion == "joyful"
+    assert result.memory_note == "likes tea"
+
+
+def test_legacy_emotion_key_is_accepted():
+    result, _ = parse_turn_response('{"response": "Hi", "emotion": "Curious"}')
+    
+    assert result.ai_emotion == "curious"
+
+
+def test_out_of_range_values_are_clamped_not_rejected():
+    result, outcome = parse_turn_response(reply(ai_emotion_intensity=3, user_emotion_confidence="high", memory_note="x" * 600))
+    
+    assert outcome == "ok"
+    assert result.ai_emotion_intensity == 1.0
+    assert result.user_emotion_confidence == 0.5
+    assert len(result.memory_note) == MEMORY_NOTE_MAX_LENGTH
+
+
+def test_truncated_reply_is_salvaged():
+    result, outcome = parse_turn_response('{"response": "I was just about to')
+    
+    assert outcome == "salvaged"
+    assert result.response == "I was just about to"
+
+
+def test_plain_text_reply_is_kept():
+    result, outcome = parse_turn_response("Hello there!")
+    
+    assert outcome == "salvaged"
+    assert result.response == "Hello there!"
+
+
+def test_unusable_reply_falls_back_and_is_counted():
+    before = parse_stats()["failed"]
+    
+    result, outcome = parse_turn_response('{"ai_emotion": "joyful"')
+    
+    assert outcome == "failed"
+    assert result.response == FALLBACK_RESPONSE
+    assert result.ai_emotion == "joyful"
+    assert parse_stats()["failed"] == before + 1
+
+
+def test_schema_lists_character_emotions():
+    schema = response_schema(("neutral", "joyful"))
+    
+    assert schema["properties"]["ai_emotion"]["enum"] == ["neutral", "joyful"]
+    assert set(schema["required"]) == set(schema["properties"])
+
+
+def test_schema_changes_do_not_leak_into_later_calls():
+    schema = response_schema(("neutral", "joyful"))
+    schema["properties"]["ai_emotion"]["enum"].append("angry")
+    schema["required"].clear()
+    
+    fresh = response_schema(("neutral", "joyful"))
+    assert fresh["properties"]["ai_emotion"]["enum"] == ["neutral", "joyful"]
+    assert set(fresh["required"]) == set(fresh["properties"])
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel, delete, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import SEARCH_DROP_DDL, Character, Conversation, MemoryNote, Message
+from app.services.search_service import match_expression, search_memory_notes, search_messages
+
+
+@pytest.fixture
+def history(seeded_engine):
+    """Luna (1) with conversations 1 and 2, Sol (2) with conversation 6."""
+    with Session(seeded_engine) as session:
+        session.add(Character(name="Sol"))
+        session.flush()
+        session.add(Conversation(id=6, character_id=2, user_id=1))
+        session.add_all([
+            Message(id=1, conversation_id=1, role="user", content="Do you like coffee?"),
+            Message(id=2, conversation_id=1, role="assistant", content="I love coffee, especially a strong café au lait in the morning."),
+            Message(id=3, conversation_id=2, role="assistant", content="Tea is nice too, but coffee coffee coffee!"),
+            Message(id=4, conversation_id=6, role="assistant", content="Coffee keeps me awake."),
+        ])
+        session.add(MemoryNote(conversation_id=1, character_id=1, content="Alice drinks black coffee", importance_score=0.9, source_message_id=2))
+        session.commit()
+    return seeded_engine
+
+
+def search(async_engine, fn, *args, **kwargs):
+    async def run():
+        async with AsyncSession(async_engine) as session:
+            return await fn(session, *args, **kwargs)
+    return asyncio.run(run())
+
+
+def fts_ids(engine, table: str, match: str):
+    with Session(engine) as session:
+        return sorted(session.exec(text(f"SELECT rowid FROM {table} WHERE {table} MATCH :match"), params={"match": match}).scalars())
+
+
+def test_match_expression_quotes_everything():
+    assert match_expression('coffee "au lait" mor*', 1) == 'content : ("coffee" "au lait" "mor"*) AND scope : ch1'
+    assert match_expression('NEAR(a b) OR content:x', 1, 2, "assistant") == 'content : ("NEAR(a" "b)" "OR" "content:x") AND scope : cv2assistant'
+    assert match_expression('say "unclosed', 1, role="user") == 'content : ("say" """unclosed") AND scope : ch1user'
+
+
+def test_match_expression_rejects_empty_query():
+    with pytest.raises(ValueError):
+        match_expression('!!! "" *', 1)
+
+
+def test_search_is_ranked_scoped_and_highlighted(history, async_engine):
+    hits, has_more = search(async_engine, search_messages, "coffee", 1)
+    
+    # Sol's message is out of scope, the repeated word ranks first, then the shorter text
+    assert [hit["id"] for hit in hits] == [3, 1, 2]
+    assert not has_more
+    assert hits[0]["score"] > hits[1]["score"] > hits[2]["score"] > 0
+    assert hits[2]["snippet"].startswith("I love <mark>coffee</mark>, especially")
+    assert hits[2]["created_at"].tzinfo is not None
+    
+    hits, has_more = search(async_engine, search_messages, "coffee", 1, conversation_id=1, role="assistant", limit=1)
+    assert [hit["id"] for hit in hits] == [2]
+    assert not has_more
+    
+    hits, has_more = search(async_engine, search_messages, "coffee", 1, limit=2, offset=0)
+    assert len(hits) == 2 and has_more
+
+
+def test_search_by_recent(history, async_engine):
+    hits, has_more = search(async_engine, search_messages, "coffee", 1, limit=2, sort="recent")
+    
+    assert [hit["id"] for hit in hits] == [3, 2]
+    assert has_more
+    assert hits[0]["score"] is None
+    
+    hits, _ = search(async_engine, search_messages, "coffee", 1, role="assistant", offset=1, sort="recent")
+    assert [hit["id"] for hit in hits] == [2]
+    
+    with pytest.raises(ValueError):
+        search(async_engine, search_messages, "coffee", 1, sort="oldest")
+
+
+def test_search_ignores_diacritics_and_matches_prefixes(history, async_engine):
+    hits, _ = search(async_engine, search_messages, "cafe morn*", 1)
+    
+    assert [hit["id"] for hit in hits] == [2]
+    assert "<mark>café</mark>" in hits[0]["snippet"]
+
+
+def test_operators_in_query_are_words(history, async_engine):
+    assert search(async_engine, search_messages, 'NEAR(coffee "unclosed OR', 1) == ([], False)
+
+
+def test_search_memory_notes(history, async_engine):
+    hits, _ = search(async_engine, search_memory_notes, "black coffee", 1)
+    
+    assert [hit["importance_score"] for hit in hits] == [0.9]
+    assert search(async_engine, search_memory_notes, "black coffee", 2) == ([], False)
+
+
+def test_index_follows_updates_and_deletes(history):
+    with Session(history) as session:
+        session.exec(update(Message).where(Message.id == 4).values(content="Espresso keeps me awake."))
+        session.exec(update(Conversation).where(Conversation.id == 2).values(character_id=2))
+        session.exec(delete(Message).where(Message.id == 1))
+        session.commit()
+    
+    assert fts_ids(history, "message_fts", "coffee") == [2, 3]
+    assert fts_ids(history, "message_fts", "espresso") == [4]
+    assert fts_ids(history, "message_fts", "scope : ch2") == [3, 4]
+    assert fts_ids(history, "message_fts", "scope : ch2assistant") == [3, 4]
+    
+    # Cascade from the conversation, the messages were unindexed before they went
+    with Session(history) as session:
+        session.exec(text("DELETE FROM conversation WHERE id = 1"))
+        session.commit()
+    
+    assert fts_ids(history, "message_fts", "coffee") == [3]
+    assert fts_ids(history, "memorynote_fts", "coffee") == []
+    with Session(history) as session:
+        session.exec(text("INSERT INTO message_fts(message_fts) VALUES ('integrity-check')"))
+        session.exec(text("INSERT INTO memorynote_fts(memorynote_fts) VALUES ('integrity-check')"))
+
+
+def test_create_all_indexes_existing_rows(history):
+    """A database that had its tables before the search index gets its history indexed."""
+    with Session(history) as session:
+        for statement in SEARCH_DROP_DDL:
+            session.exec(text(statement))
+        session.commit()
+    
+    SQLModel.metadata.create_all(history)
+    
+    assert fts_ids(history, "message_fts", "coffee") == [1, 2, 3, 4]
+    assert fts_ids(history, "memorynote_fts", "coffee") == [1]
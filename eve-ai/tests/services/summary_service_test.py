@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from ollama import ChatResponse, Message as OllamaMessage
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import Conversation, Message
+from app.services.config_service import config_service
+from app.services.generation_scheduler import GenerationScheduler
+from app.services.llm_providers import OllamaProvider, ProviderRegistry
+from app.services.summary_service import ConversationSummarizer
+from app.utils.token_counter import estimate_message_tokens
+
+
+class SummaryClient:
+    """Fake ollama.AsyncClient that returns a numbered summary and keeps the prompts."""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    async def chat(self, **kwargs) -> ChatResponse:
+        self.prompts.append(kwargs["messages"])
+        content = f"Summary {len(self.prompts)}"
+        return ChatResponse(model="test-model", message=OllamaMessage(role="assistant", content=content))
+
+
+@pytest.fixture
+def history(seeded_engine):
+    """Conversation 1 with 25 messages, memory length 10."""
+    with Session(seeded_engine) as session:
+        for i in range(25):
+            session.add(Message(conversation_id=1, role="user" if i % 2 == 0 else "assistant", content=f"m{i}"))
+        session.commit()
+        config_service.load_from_db(session)
+    return seeded_engine
+
+
+@pytest.fixture
+def client():
+    return SummaryClient()
+
+
+@pytest.fixture
+def summarizer(history, async_engine, client):
+    return ConversationSummarizer(
+        ProviderRegistry({"local": OllamaProvider(client=client)}),
+        GenerationScheduler(),
+        session_factory=lambda: AsyncSession(async_engine, expire_on_commit=False),
+        batch=5,
+    )
+
+
+def stored(engine, conversation_id: int = 1) -> Conversation:
+    with Session(engine) as session:
+        return session.exec(select(Conversation).where(Conversation.id == conversation_id)).one()
+
+
+def test_folds_all_but_recent_messages(summarizer, client, history):
+    assert asyncio.run(summarizer.summarize(1))
+    
+    conversation = stored(history)
+    assert conversation.summary == "Summary 1"
+    # 25 messages, the last 10 stay raw
+    assert conversation.summary_until_id == 15
+    transcript = client.prompts[0][-1]["content"]
+    assert "Alice: m0" in transcript and "Alice: m14" in transcript
+    assert "m15" not in transcript
+
+
+def test_waits_for_a_full_batch(summarizer, client, history):
+    """Nothing happens until batch messages past the window piled up."""
+    asyncio.run(summarizer.summarize(1))
+    assert not asyncio.run(summarizer.summarize(1))
+    assert len(client.prompts) == 1
+
+
+def test_next_pass_extends_previous_summary(summarizer, client, history):
+    asyncio.run(summarizer.summarize(1))
+    with Session(history) as session:
+        for i in range(25, 30):
+            session.add(Message(conversation_id=1, role="user", content=f"m{i}"))
+        session.commit()
+    
+    assert asyncio.run(summarizer.summarize(1))
+    
+    assert "Previous summary:\nSummary 1" in client.prompts[1][-1]["content"]
+    assert stored(history).summary_until_id == 20
+
+
+def test_worker_runs_scheduled_conversations(summarizer, history):
+    async def scenario():
+        summarizer.start()
+        summarizer.schedule(1)
+        summarizer.schedule(1)
+        assert summarizer.stats()["pending"] == 1
+        for _ in range(100):
+            if summarizer.summarized:
+                break
+            await asyncio.sleep(0.01)
+        await summarizer.aclose()
+    
+    asyncio.run(scenario())
+    
+    assert summarizer.summarized == 1
+    assert stored(history).summary == "Summary 1"
+
+
+def test_long_backlog_is_folded_in_passes(history, async_engine, client):
+    summarizer = ConversationSummarizer(
+        ProviderRegistry({"local": OllamaProvider(client=client)}),
+        GenerationScheduler(),
+        session_factory=lambda: AsyncSession(async_engine, expire_on_commit=False),
+        batch=5,
+        pass_messages=6,
+    )
+    
+    assert asyncio.run(summarizer.summarize(1))
+    
+    # 1-6, then 7-12 - the 13 left are fewer than memory length + batch
+    assert len(client.prompts) == 2
+    assert "Luna: m5" in client.prompts[0][-1]["content"] and "m6" not in client.prompts[0][-1]["content"]
+    assert "Previous summary:\nSummary 1" in client.prompts[1][-1]["content"]
+    assert stored(history).summary_until_id == 12
+
+
+def test_pass_is_kept_to_prompt_budget(history, async_engine, client):
+    with Session(history) as session:
+        session.add_all([Message(conversation_id=2, role="user", content=" ".join(["word"] * 40)) for _ in range(25)])
+        session.commit()
+    summarizer = ConversationSummarizer(
+        ProviderRegistry({"local": OllamaProvider(client=client)}),
+        GenerationScheduler(),
+        session_factory=lambda: AsyncSession(async_engine, expire_on_commit=False),
+        batch=5,
+        # Smaller than max_tokens, the prompt gets a quarter - 300 tokens
+        context_window=1200,
+    )
+    
+    assert asyncio.run(summarizer.summarize(2))
+    
+    assert len(client.prompts) > 1
+    for prompt in client.prompts:
+        assert sum(estimate_message_tokens(m["content"]) for m in prompt) <= 300
+    # Everything but the last 10 folded in the end
+    assert stored(history, 2).summary_until_id == 40
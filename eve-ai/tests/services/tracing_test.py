@@ -0,0 +1,74 @@
+import json
+import logging
+import pytest
+from app.core.log import JsonFormatter
+from app.services.llm_providers import LLMResult
+from app.services.tracing import LatencyHistogram, Trace, Tracer
+
+
+@pytest.fixture
+def records():
+    """Log records of the trace logger."""
+    captured = []
+    handler = logging.Handler()
+    handler.emit = captured.append
+    logger = logging.getLogger("eve.trace")
+    logger.addHandler(handler)
+    previous = logger.level
+    logger.setLevel(logging.INFO)
+    yield captured
+    logger.removeHandler(handler)
+    logger.setLevel(previous)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.add(float(ms))
+    
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]) == (51.0, 96.0, 100.0, 100.0)
+
+
+def test_trace_stages_add_up():
+    trace = Trace("turn")
+    trace.record("llm", 10)
+    trace.record("llm", 5)
+    trace.record_llm(LLMResult("x", eval_count=3, prompt_eval_count=7, prompt_eval_duration=2_000_000, eval_duration=8_000_000))
+    
+    assert trace.stages == {"llm": 15, "llm_prompt_eval": 2.0, "llm_eval": 8.0}
+    assert trace.fields == {"prompt_tokens": 7, "eval_tokens": 3}
+
+
+def test_every_trace_goes_to_histograms_only_sample_is_logged(records):
+    tracer = Tracer(sample_rate=0.5, slow_ms=10_000, sampler=iter([0.9, 0.1]).__next__)
+    for _ in range(2):
+        with tracer.trace("turn", conversation_id=1) as trace:
+            trace.record("commit", 1.0)
+    
+    assert tracer.stats()["traces"]["turn"]["commit"]["count"] == 2
+    assert len(records) == 1
+    assert records[0].stages_ms == {"commit": 1.0}
+    assert records[0].conversation_id == 1
+
+
+def test_failed_trace_is_always_logged(records):
+    tracer = Tracer(sample_rate=0.0)
+    with pytest.raises(ValueError):
+        with tracer.trace("turn"):
+            raise ValueError("boom")
+    
+    assert tracer.errors == 1
+    assert records[0].levelno == logging.WARNING
+    assert "boom" in records[0].error
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("eve.trace", logging.INFO, __file__, 1, "turn", None, None)
+    record.total_ms = 12.5
+    line = json.loads(JsonFormatter().format(record))
+    
+    assert line["msg"] == "turn"
+    assert line["level"] == "info"
+    assert line["total_ms"] == 12.5
@@ -0,0 +1,90 @@
+import io
+import json
+import pytest
+from sqlmodel import Session, func, select
+from app.models.schemas import Conversation, EmotionRollup, GenerationRollup, LatencyRollup, MemoryNote, Message
+from app.services.transfer_service import export_ndjson, import_ndjson
+
+
+@pytest.fixture
+def history(seeded_engine):
+    """Conversation 1 with messages, a note and a summary pointing at its messages."""
+    with Session(seeded_engine) as session:
+        messages = [Message(conversation_id=1, role="user" if i % 2 == 0 else "assistant", content=f"m{i}", emotion="joyful") for i in range(7)]
+        session.add_all(messages)
+        session.flush()
+        session.add(MemoryNote(conversation_id=1, character_id=1, content="likes tea", importance_score=0.9, source_message_id=messages[3].id))
+        conversation = session.get(Conversation, 1)
+        conversation.summary, conversation.summary_until_id, conversation.message_count = "Story", messages[2].id, 7
+        session.commit()
+    return seeded_engine
+
+
+def dump(engine, **kwargs) -> str:
+    return "".join(export_ndjson(engine, **kwargs))
+
+
+def test_export_writes_header_then_rows_per_conversation(history, monkeypatch):
+    monkeypatch.setattr("app.services.transfer_service.EXPORT_CHUNK_LINES", 3)
+    
+    chunks = list(export_ndjson(history, conversation_ids=[1]))
+    records = [json.loads(line) for line in "".join(chunks).splitlines()]
+    
+    assert len(chunks) > 1 and all(chunk.endswith("\n") for chunk in chunks)
+    assert [r["type"] for r in records] == ["header", "conversation"] + ["message"] * 7 + ["memory_note"]
+    assert records[2]["content"] == "m0" and records[2]["created_at"].endswith("+00:00")
+
+
+def test_import_round_trip_remaps_ids(history):
+    text = dump(history, conversation_ids=[1])
+    
+    result = import_ndjson(history, io.BytesIO(text.encode()), batch_rows=2)
+    
+    assert (result.conversations, result.messages, result.memory_notes) == (1, 7, 1)
+    with Session(history) as session:
+        copy = session.exec(select(Conversation).order_by(Conversation.id.desc())).first()
+        messages = session.exec(select(Message).where(Message.conversation_id == copy.id).order_by(Message.id)).all()
+        note = session.exec(select(MemoryNote).where(MemoryNote.conversation_id == copy.id)).one()
+    assert copy.id == 6 and copy.summary == "Story" and copy.message_count == 7
+    assert [m.content for m in messages] == [f"m{i}" for i in range(7)]
+    assert copy.summary_until_id == messages[2].id
+    assert note.source_message_id == messages[3].id
+
+
+def test_import_adds_messages_to_rollups(history):
+    text = dump(history, conversation_ids=[1])
+    
+    def totals():
+        with Session(history) as session:
+            return tuple(session.scalar(select(func.sum(model.messages))) for model in (GenerationRollup, LatencyRollup, EmotionRollup))
+    
+    import_ndjson(history, io.BytesIO(text.encode()))
+    # 3 of the 7 are replies, all 7 have an emotion
+    assert totals() == (3, 3, 7)
+    
+    # Same hours again - added to the existing rollup rows
+    import_ndjson(history, io.BytesIO(text.encode()))
+    assert totals() == (6, 6, 14)
+    with Session(history) as session:
+        assert session.exec(select(GenerationRollup.model_name)).all() == ["unknown"]
+
+
+def test_invalid_dump_imports_nothing(history):
+    lines = dump(history, conversation_ids=[1]).splitlines()
+    lines.insert(5, '{"type": "message", "id": 1, "conversation_id": 42, "role": "user", "content": "orphan"}')
+    
+    with pytest.raises(ValueError, match="Line 6"):
+        import_ndjson(history, lines, batch_rows=2)
+    
+    with Session(history) as session:
+        assert session.exec(select(func.count(Conversation.id))).one() == 5
+        assert session.exec(select(func.count(Message.id))).one() == 7
+
+
+def test_unknown_character_is_rejected(history):
+    lines = dump(history, conversation_ids=[1]).splitlines()
+    conversation = json.loads(lines[1])
+    lines[1] = json.dumps({**conversation, "character_id": 99})
+    
+    with pytest.raises(ValueError, match="unknown character 99"):
+        import_ndjson(history, lines)
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from app.services.turn_coordinator import TurnCoordinator
+
+
+def test_failed_turn_is_shared_then_forgotten():
+    """Waiting retries get the error, a later retry runs again."""
+    turns = TurnCoordinator()
+    
+    async def scenario():
+        async def owner():
+            async with turns.exclusive(1, "key", "Hi!"):
+                await asyncio.sleep(0.01)
+                raise ValueError("LLM failed")
+        
+        task = asyncio.create_task(owner())
+        await asyncio.sleep(0)
+        shared = turns.existing(1, "key", "Hi!")
+        assert shared is not None
+        
+        with pytest.raises(ValueError, match="LLM failed"):
+            await task
+        with pytest.raises(ValueError, match="LLM failed"):
+            await shared
+        return turns.existing(1, "key", "Hi!")
+    
+    assert asyncio.run(scenario()) is None
+
+
+def test_locks_are_released_when_idle():
+    turns = TurnCoordinator()
+    
+    async def scenario():
+        async with turns.exclusive(1) as turn:
+            assert turns.is_busy(1)
+            assert not turns.is_busy(2)
+            turn.set_result("done")
+        return turns.is_busy(1)
+    
+    assert asyncio.run(scenario()) is False
+
+
+def test_interrupted_turn_does_not_leave_waiters_hanging():
+    turns = TurnCoordinator()
+    
+    async def scenario():
+        async def owner():
+            async with turns.exclusive(1, "key", "Hi!"):
+                await asyncio.sleep(10)
+        
+        task = asyncio.create_task(owner())
+        await asyncio.sleep(0)
+        shared = turns.existing(1, "key", "Hi!")
+        task.cancel()
+        with pytest.raises(RuntimeError, match="interrupted"):
+            await asyncio.wait_for(shared, 1)
+    
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.schemas import Character, Conversation, MemoryNote, Message
+from app.services.write_behind import TurnEffects, WriteBehindWriter
+
+
+@pytest.fixture
+def source_message(seeded_engine):
+    """An assistant message the notes can point to."""
+    with Session(seeded_engine) as session:
+        message = Message(conversation_id=1, role="assistant", content="Hello!")
+        session.add(message)
+        session.commit()
+        return message.id
+
+
+@pytest.fixture
+def writer(async_engine):
+    committed = []
+    
+    async def on_notes(notes):
+        committed.extend(notes)
+    
+    writer = WriteBehindWriter(
+        session_factory=lambda: AsyncSession(async_engine, expire_on_commit=False),
+        flush_interval=0.05,
+        on_notes=on_notes,
+    )
+    writer.committed = committed
+    return writer
+
+
+def effects(conversation_id: int, source_message_id: int, note: str = None, importance: float = 0.9) -> TurnEffects:
+    return TurnEffects(
+        conversation_id=conversation_id, character_id=1, source_message_id=source_message_id,
+        at=datetime(2026, 1, 1, tzinfo=timezone.utc), memory_note_content=note, memory_note_importance=importance,
+    )
+
+
+def test_batches_turns_of_many_conversations(writer, seeded_engine, source_message):
+    """Turns submitted together are committed in one flush."""
+    async def scenario():
+        writer.start()
+        await writer.submit(effects(1, source_message, "likes tea"), None)
+        await writer.submit(effects(2, source_message, "minor detail", importance=0.3), None)
+        await writer.submit(effects(3, source_message), None)
+        await writer.aclose()
+    
+    asyncio.run(scenario())
+    
+    assert writer.stats()["flushes"] == 1
+    assert writer.stats()["written"] == 3
+    with Session(seeded_engine) as session:
+        notes = session.exec(select(MemoryNote)).all()
+        assert [n.content for n in notes] == ["likes tea"]
+        assert session.get(Conversation, 3).last_activity.year == 2026
+        assert session.get(Character, 1).last_interaction_at is not None
+    assert [n.content for n in writer.committed] == ["likes tea"]
+
+
+def test_failing_turn_does_not_drop_the_batch(writer, seeded_engine, source_message):
+    """A note of a deleted conversation fails alone, the rest is written."""
+    async def scenario():
+        writer.start()
+        await writer.submit(effects(999, source_message, "orphan"), None)
+        await writer.submit(effects(1, source_message, "kept"), None)
+        await writer.aclose()
+    
+    asyncio.run(scenario())
+    
+    assert writer.stats()["failed"] == 1
+    with Session(seeded_engine) as session:
+        assert [n.content for n in session.exec(select(MemoryNote)).all()] == ["kept"]
+
+
+def test_inline_without_worker(writer, seeded_engine, async_engine, source_message):
+    """Without a worker the effects go through the caller's session right away."""
+    async def scenario():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            await writer.submit(effects(1, source_message, "inline"), session)
+    
+    asyncio.run(scenario())
+    
+    with Session(seeded_engine) as session:
+        assert [n.content for n in session.exec(select(MemoryNote)).all()] == ["inline"]
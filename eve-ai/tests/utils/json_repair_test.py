@@ -0,0 +1,37 @@
+from app.utils.json_repair import close_truncated, loads_tolerant
+
+
+class TestLoadsTolerant:
+    """Tests for salvaging JSON written by a model."""
+    
+    def test_valid_json_is_not_salvaged(self):
+        assert loads_tolerant('{"response": "Hi"}') == ({"response": "Hi"}, False)
+    
+    def test_code_fence(self):
+        assert loads_tolerant('```json\n{"response": "Hi"}\n```') == ({"response": "Hi"}, True)
+    
+    def test_text_around_object(self):
+        assert loads_tolerant('Sure! {"response": "Hi"} Hope that helps.') == ({"response": "Hi"}, True)
+    
+    def test_truncated_string_keeps_partial_text(self):
+        assert loads_tolerant('{"response": "Hello, how ar') == ({"response": "Hello, how ar"}, True)
+    
+    def test_truncated_key_is_dropped(self):
+        assert loads_tolerant('{"response": "Hi", "ai_emo') == ({"response": "Hi"}, True)
+    
+    def test_truncated_number_is_dropped(self):
+        assert loads_tolerant('{"response": "Hi", "ai_emotion_intensity": 0.') == ({"response": "Hi"}, True)
+    
+    def test_not_json(self):
+        assert loads_tolerant("Just a plain reply") == (None, False)
+
+
+class TestCloseTruncated:
+    def test_nested_containers_are_closed_in_order(self):
+        assert close_truncated('{"a": [1, {"b": "c') == '{"a": [1, {"b": "c"}]}'
+    
+    def test_complete_document_is_left_alone(self):
+        assert close_truncated('{"a": 1}') is None
+    
+    def test_cut_escape_is_dropped(self):
+        assert close_truncated('{"a": "line\\') == '{"a": "line"}'
@@ -0,0 +1,70 @@
+import json
+import pytest
+from app.utils.json_stream import JsonFieldStreamer
+
+
+ENVELOPE = {
+    "ai_emotion": "joyful",
+    "response": "Hi \"friend\" \\ café \U0001F600\nnext line",
+    "memory_note": "response: not this one",
+}
+
+
+def feed_in_chunks(document: str, size: int) -> str:
+    streamer = JsonFieldStreamer("response")
+    pieces = [streamer.feed(document[i:i + size]) for i in range(0, len(document), size)]
+    assert streamer.done
+    assert "".join(pieces) == streamer.text
+    return streamer.text
+
+
+class TestJsonFieldStreamer:
+    """Tests for incremental extraction of the response field."""
+    
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+    def test_matches_json_loads_for_any_chunking(self, size):
+        """Decoded text is the same no matter how the document is split."""
+        document = json.dumps(ENVELOPE)  # escapes non-ASCII as \\uXXXX surrogate pairs
+        assert feed_in_chunks(document, size) == ENVELOPE["response"]
+    
+    def test_unescaped_unicode(self):
+        """Raw UTF-8 text is passed through."""
+        document = json.dumps(ENVELOPE, ensure_ascii=False)
+        assert feed_in_chunks(document, 2) == ENVELOPE["response"]
+    
+    def test_text_is_emitted_before_document_ends(self):
+        """Text streams out while the value is still open."""
+        streamer = JsonFieldStreamer("response")
+        assert streamer.feed('{"response": "Hel') == "Hel"
+        assert streamer.feed('lo') == "lo"
+        assert not streamer.done
+    
+    def test_nested_keys_are_ignored(self):
+        """Only the top-level field is streamed."""
+        document = '{"meta": {"response": "nested"}, "response": "top"}'
+        assert feed_in_chunks(document, 4) == "top"
+    
+    def test_non_string_value(self):
+        """A null field streams nothing."""
+        streamer = JsonFieldStreamer("response")
+        assert streamer.feed('{"response": null, "x": "y"}') == ""
+        assert streamer.done
+    
+    @pytest.mark.parametrize("size", [1, 3, 1000])
+    @pytest.mark.parametrize("raw, expected", [
+        (r"A \x41 B", r"A \x41 B"),
+        (r"A \uZZZZ B", r"A \uZZZZ B"),
+        (r"A \u12 B", r"A \u12 B"),
+        (r"A \ud83d B", "A \ufffd B"),
+        (r"A \ud83d\u0041 B", "A \ufffdA B"),
+        (r"A \ude00 B", "A \ufffd B"),
+    ])
+    def test_invalid_escapes_pass_through(self, raw, expected, size):
+        """Invalid JSON escapes from the model never stop the stream."""
+        assert feed_in_chunks('{"response": "' + raw + '", "x": 1}', size) == expected
+    
+    def test_lone_high_surrogate_is_not_held_back(self):
+        """Text after an unpaired high surrogate streams as soon as it arrives."""
+        streamer = JsonFieldStreamer("response")
+        assert streamer.feed('{"response": "\\ud83d') == ""
+        assert streamer.feed("ok") == "\ufffdok"
@@ -0,0 +1,23 @@
+from app.utils.token_counter import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_tokens
+
+
+class TestEstimateTokens:
+    """Tests for the token count approximation."""
+    
+    def test_empty(self):
+        assert estimate_tokens("") == 0
+    
+    def test_words_and_punctuation(self):
+        """Short words and punctuation marks are one token each."""
+        assert estimate_tokens("Hi, how are you?") == 6
+    
+    def test_long_words_count_more(self):
+        """Long words count one extra token per 8 characters."""
+        assert estimate_tokens("internationalization") == 3
+    
+    def test_grows_with_text(self):
+        text = "The quick brown fox jumps over the lazy dog. "
+        assert estimate_tokens(text * 10) == 10 * estimate_tokens(text)
+    
+    def test_message_overhead(self):
+        assert estimate_message_tokens("Hi") == 1 + MESSAGE_OVERHEAD_TOKENS